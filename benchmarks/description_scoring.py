@@ -0,0 +1,172 @@
+"""
+Benchmark the selection of attribute descriptions from provider documentation.
+
+Compares the previous implementation, which ran one regex over the page per attribute and
+ranked ambiguous matches with the matrix Levenshtein distance and difflib, against
+get_attribute_descriptions. Both must select the same descriptions.
+
+Usage:
+    python benchmarks/description_scoring.py [markdown files or directories]
+
+Defaults to the documentation cache in .terraflow/documentation, which can be filled
+with `terraflow docs prefetch` or `terraflow docs import`. A synthetic page is used if no
+documentation is found.
+"""
+import os
+import re
+import sys
+import time
+import difflib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from terraflow.libraries.constants import DOCUMENTATION_DIR
+from terraflow.libraries.helpers import (
+    ATTRIBUTE_DESCRIPTION_CACHE,
+    build_attribute_description_index,
+    calculate_levenshtein_distance,
+    get_attribute_descriptions,
+)
+
+BLOCK_PATTERN = re.compile(r"^An? `(\w+)` block (?:supports|exports)", re.MULTILINE)
+
+
+def reference_description(documentation_text, attribute, block_hierarchy=None):
+    """
+    The previous implementation of get_resource_attribute_description.
+    """
+    pattern = rf"^`({attribute})`\s+-\s+(\(.*?\))?\s*(.*)"
+    attribute_matches = re.findall(pattern=pattern, string=documentation_text, flags=re.MULTILINE)
+    attribute_matches = [str(x[2]) for x in attribute_matches]
+
+    if len(attribute_matches) > 1:
+        if block_hierarchy:
+            levenshtein_distances = []
+            for match in attribute_matches:
+                normalized_block_text = " ".join(block_hierarchy).replace("_", " ")
+                normalized_distance = calculate_levenshtein_distance(match, normalized_block_text)
+                current_block = block_hierarchy[-1]
+                if current_block in match:
+                    normalized_distance = normalized_distance - 0.1
+                else:
+                    for keyword in block_hierarchy:
+                        for word in match.split(" "):
+                            similarity_score = difflib.SequenceMatcher(
+                                None, keyword.lower().replace("_", " "), word.lower()
+                            ).ratio()
+                            if similarity_score > 0.8:
+                                normalized_distance = normalized_distance - 0.1
+                levenshtein_distances.append(normalized_distance)
+
+            levenshtein_distances, descriptions = zip(
+                *sorted(zip(levenshtein_distances, attribute_matches))
+            )
+            return descriptions[0]
+
+        return attribute_matches[0]
+    elif len(attribute_matches) == 1:
+        return attribute_matches[0]
+
+    return ""
+
+
+def synthetic_page():
+    lines = ["# example_resource", "## Arguments Reference"]
+    blocks = ["network_profile", "default_node_pool", "identity", "linux_profile", "auto_scaler_profile"]
+
+    for i in range(60):
+        lines.append(f"* `attribute_{i}` - (Optional) The value of attribute {i} for the resource.")
+
+    for block in blocks:
+        lines.append(f"A `{block}` block supports the following:")
+        for i in range(25):
+            lines.append(f"`attribute_{i}` - (Optional) The attribute {i} of the {block.replace('_', ' ')} block.")
+            lines.append(f"`name` - (Required) The name of the {block.replace('_', ' ')}.")
+
+    return "\n".join(lines)
+
+
+def load_pages(paths):
+    pages = {}
+
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for file_name in files:
+                    if file_name.endswith(".md"):
+                        filename = os.path.join(root, file_name)
+                        with open(filename, "r") as f:
+                            pages[filename] = f.read()
+        elif os.path.exists(path):
+            with open(path, "r") as f:
+                pages[path] = f.read()
+
+    return pages
+
+
+def get_requests(text):
+    """
+    Build (attribute, block_hierarchy) lookups for every attribute of a page, nesting the
+    attributes under the blocks they are documented in.
+    """
+    blocks = [(match.start(), match.group(1)) for match in BLOCK_PATTERN.finditer(text)]
+    lookups = []
+
+    for line in re.finditer(r"^`(\w+)`\s+-", text, re.MULTILINE):
+        hierarchy = [name for start, name in blocks if start < line.start()][-1:]
+        lookups.append((line.group(1), hierarchy))
+
+    return lookups
+
+
+def main():
+    pages = load_pages(sys.argv[1:] or [DOCUMENTATION_DIR])
+
+    if not pages:
+        print("No documentation found, using a synthetic page.")
+        pages = {"synthetic": synthetic_page()}
+
+    lookups = {name: get_requests(text) for name, text in pages.items()}
+    total = sum(len(items) for items in lookups.values())
+
+    start = time.perf_counter()
+    reference = {
+        name: [reference_description(pages[name], attribute, hierarchy) for attribute, hierarchy in items]
+        for name, items in lookups.items()
+    }
+    reference_time = time.perf_counter() - start
+
+    ATTRIBUTE_DESCRIPTION_CACHE.clear()
+    start = time.perf_counter()
+    batch = {}
+    for name, items in lookups.items():
+        descriptions = get_attribute_descriptions(
+            pages[name],
+            items,
+            resource=name,
+            description_index=build_attribute_description_index(pages[name]),
+        )
+        batch[name] = [descriptions[(attribute, tuple(hierarchy))] for attribute, hierarchy in items]
+    batch_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for name, items in lookups.items():
+        get_attribute_descriptions(pages[name], items, resource=name)
+    memoized_time = time.perf_counter() - start
+
+    mismatches = sum(
+        a != b for name in lookups for a, b in zip(reference[name], batch[name])
+    )
+
+    print(f"Pages:      {len(pages)}")
+    print(f"Lookups:    {total}")
+    print(f"Reference:  {reference_time * 1000:.1f} ms")
+    print(f"Batch:      {batch_time * 1000:.1f} ms ({reference_time / batch_time:.1f}x)")
+    print(f"Memoized:   {memoized_time * 1000:.1f} ms")
+    print(f"Mismatches: {mismatches}")
+
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+"""
+Benchmark whole-provider scaffolds against SCAFFOLD_TARGET_RATE.
+
+Generates a synthetic provider with as many resources and data sources as azurerm, each
+with nested blocks and a cached documentation page, and scaffolds it twice in a temporary
+directory. The first run computes the attribute metadata of every component, the second
+reads it from the metadata cache.
+
+Usage:
+    python benchmarks/provider_scaffold.py [components] [processes]
+
+Defaults to 1,000 components and one process per CPU.
+"""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from terraflow.libraries.constants import TERRAFORM_REGISTRY_BASE
+from terraflow.libraries.docs import get_documentation_filepath, write_documentation_file
+from terraflow.libraries.scaffold import SCAFFOLD_TARGET_RATE, scaffold_provider
+from terraflow.libraries.schema import Schema
+
+NAMESPACE = "example"
+PROVIDER = "example"
+VERSION = "1.0.0"
+
+
+def synthetic_block(depth=0):
+    block = {
+        "attributes": {
+            f"attribute_{i}": {"type": "string", "optional": i % 3 != 0, "required": i % 3 == 0}
+            for i in range(12)
+        },
+        "block_types": {},
+    }
+    block["attributes"]["id"] = {"type": "string", "computed": True}
+
+    if depth < 2:
+        for name in ["settings", "network_profile", "identity"]:
+            block["block_types"][name] = {
+                "nesting_mode": "list",
+                "max_items": 1,
+                "block": synthetic_block(depth + 1),
+            }
+
+    return block
+
+
+def synthetic_page(name):
+    lines = [f"# {PROVIDER}_{name}", "## Argument Reference"]
+    lines += [f"`attribute_{i}` - (Optional) The attribute {i} of the {name}." for i in range(12)]
+
+    for block in ["settings", "network_profile", "identity"]:
+        lines.append(f"A `{block}` block supports the following:")
+        lines += [f"`attribute_{i}` - (Optional) The attribute {i} of the {block} block." for i in range(12)]
+
+    return "\n".join(lines)
+
+
+def main():
+    components = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    processes = int(sys.argv[2]) if len(sys.argv) > 2 else None
+
+    resources = {f"{PROVIDER}_resource_{i}": {"block": synthetic_block()} for i in range(components * 2 // 3)}
+    data_sources = {f"{PROVIDER}_data_{i}": {"block": synthetic_block()} for i in range(components - len(resources))}
+    schema = Schema.from_mapping(
+        {
+            "provider_schemas": {
+                f"{TERRAFORM_REGISTRY_BASE}/{NAMESPACE}/{PROVIDER}": {
+                    "provider": {"block": synthetic_block(2)},
+                    "resource_schemas": resources,
+                    "data_source_schemas": data_sources,
+                }
+            }
+        }
+    )
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+
+        for type, names in [("resource", resources), ("data", data_sources)]:
+            for name in names:
+                kind = name[len(PROVIDER) + 1:]
+                filepath = get_documentation_filepath(NAMESPACE, PROVIDER, VERSION, type, kind)
+                write_documentation_file(filepath, synthetic_page(kind))
+
+        for run in ["Cold", "Cached"]:
+            results = scaffold_provider(
+                schema=schema,
+                namespace=NAMESPACE,
+                provider=PROVIDER,
+                version=VERSION,
+                directory=os.path.join(directory, "scaffold"),
+                max_workers=processes,
+            )
+            print(
+                f"{run + ':':<8} {results['generated']} components in {results['elapsed']:.2f} s, "
+                f"{results['rate']:.1f} per second ({results['rate'] / SCAFFOLD_TARGET_RATE:.1f}x target)"
+            )
+
+            if results["failed"]:
+                print(f"Failed:  {results['failed'][:5]}")
+                return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 
 import click
+import threading
 from dataclasses import asdict
 
 from .libraries.helpers import *
@@ -10,6 +11,15 @@ from .libraries.terraform import *
 from .libraries.configuration import *
 from .libraries.options import *
 from .libraries.formatting import *
+from .libraries.docs import (
+    get_documentation_targets,
+    import_documentation,
+    prefetch_documentation,
+)
+from .libraries.manifest import generate_manifest, load_manifest
+from .libraries.scaffold import SCAFFOLD_TARGET_RATE, scaffold_provider
+from .libraries.doc_sources import LocalDocumentationSource, RegistryDocumentationSource
+from .libraries.toolchain import get_toolchain_info
 from .version import __version__
 
 CONTEXT_SETTINGS = dict(auto_envvar_prefix="terraflow")
@@ -17,7 +27,8 @@ CONTEXT_SETTINGS = dict(auto_envvar_prefix="terraflow")
 
 @click.group("terraflow", invoke_without_command=True)
 @click.version_option(version=__version__, prog_name="terraflow")
-def terraflow():
+@options["schema_storage"]
+def terraflow(schema_storage):
     """
     \b
     Terraform is an open-source infrastructure as code tool that
@@ -33,6 +44,15 @@ def terraflow():
     pass
 
 
+def load_schema(**kwargs):
+    """
+    Load the provider schema with the storage selected on the terraflow command.
+    """
+    storage = click.get_current_context().find_root().params.get("schema_storage", "shards")
+
+    return Schema(storage=storage, **kwargs)
+
+
 # terraflow provider
 @terraflow.group("provider")
 def provider():
@@ -64,7 +84,7 @@ def provider_get(keyword):
     """
     Get providers in the Terraform configuration.
     """
-    schema = Schema().schema
+    schema = load_schema().manifest
 
     items = list_items(schema=schema, scope="provider", keywords=keyword)
 
@@ -96,7 +116,7 @@ def resource_create(
     """
     Create a Terraform provider.
     """
-    schema = Schema(refresh=refresh)
+    schema = load_schema(refresh=refresh)
     attribute_defaults = convert_strings_to_dict(attribute_default)
 
     configuration = ProviderConfiguration(
@@ -118,11 +138,17 @@ def resource_create(
         configuration=configuration,
     )
 
-    write_terraform_to_file(
+    changed = write_terraform_to_file(
         new_code=component.code,
         filename=terraform_filename if terraform_filename else "providers.tf",
     )
 
+    if not changed:
+        print(
+            f'\n{colors(color="OK_BLUE")}Info:{colors()} The provider "{provider}" is unchanged.\n'
+        )
+        return
+
     print(
         f'\n{colors(color="OK_GREEN")}Success:{colors()} The provider "{provider}" was created.\n'
     )
@@ -130,6 +156,63 @@ def resource_create(
     run_terraform_fmt()
 
 
+# terraflow provider scaffold
+@provider.command("scaffold", context_settings=CONTEXT_SETTINGS)
+@provider_options
+@options["version"]
+@options["scaffold_directory"]
+@options["processes"]
+def provider_scaffold(namespace, provider, version, out, processes):
+    """
+    Generate the code for every resource and data source of a provider.
+
+    Only documentation that is already cached is used, so run
+    `terraflow docs prefetch` first to include descriptions.
+    """
+    if not version:
+        version = get_toolchain_info().get_provider_version(provider, namespace)
+
+    if not version:
+        print(
+            f'\n{colors(color="FAIL")}Error:{colors()} The version of the provider "{namespace}/{provider}" could not be determined. Use --version to set it.\n'
+        )
+        return
+
+    schema = load_schema()
+    schema.add_providers([(namespace, provider, version)])
+
+    targets = get_documentation_targets(schema=schema, namespace=namespace, provider=provider)
+
+    if not targets:
+        print(
+            f'\n{colors(color="FAIL")}Error:{colors()} The schema for the provider "{namespace}/{provider}" could not be found.\n'
+        )
+        return
+
+    with click.progressbar(
+        length=len(targets),
+        label=f"Scaffolding {namespace}/{provider} {version}",
+    ) as bar:
+        results = scaffold_provider(
+            schema=schema,
+            namespace=namespace,
+            provider=provider,
+            version=version,
+            directory=out,
+            max_workers=processes,
+            callback=lambda type, name, error: bar.update(1),
+        )
+
+    print(
+        f'\n{colors(color="OK_GREEN")}Success:{colors()} Generated {results["generated"]} components in {results["elapsed"]:.1f} seconds, {results["rate"]:.1f} per second (target {SCAFFOLD_TARGET_RATE:.1f}).\n'
+    )
+
+    for type, name, error in results["failed"]:
+        print(
+            f'\n{colors(color="WARNING")}Warning:{colors()} The {type} "{name or provider}" could not be generated: {error}\n'
+        )
+
+
 # terraflow resource
 @terraflow.group("resource")
 def resource():
@@ -147,10 +230,11 @@ def resource_list(namespace, provider, keyword):
     """
     List available resources for a provider.
     """
-    schema = Schema()
+    schema = load_schema()
+    schema.add_providers([(namespace, provider, None)])
 
     items = list_items(
-        schema=schema.json,
+        schema=schema.manifest,
         namespace=namespace,
         provider=provider,
         scope="resource",
@@ -188,7 +272,7 @@ def resource_create(
     """
     Create a Terraform resource.
     """
-    schema = Schema(refresh=refresh)
+    schema = load_schema(refresh=refresh)
     attribute_defaults = convert_strings_to_dict(attribute_default)
 
     configuration = ResourceConfiguration(
@@ -212,11 +296,17 @@ def resource_create(
         configuration=configuration,
     )
 
-    write_terraform_to_file(
+    changed = write_terraform_to_file(
         new_code=resource.code,
         filename=terraform_filename if terraform_filename else "main.tf",
     )
 
+    if not changed:
+        print(
+            f'\n{colors(color="OK_BLUE")}Info:{colors()} The resource "{provider}_{kind}" "{name}" is unchanged.\n'
+        )
+        return
+
     print(
         f'\n{colors(color="OK_GREEN")}Success:{colors()} The resource "{provider}_{kind}" "{name}" was created.\n'
     )
@@ -270,10 +360,11 @@ def data_list(namespace, provider, keyword):
     """
     List available data sources for a provider.
     """
-    schema = Schema()
+    schema = load_schema()
+    schema.add_providers([(namespace, provider, None)])
 
     items = list_items(
-        schema=schema.json,
+        schema=schema.manifest,
         namespace=namespace,
         provider=provider,
         scope="data_source",
@@ -310,7 +401,7 @@ def data_create(
     """
     Create a Terraform data source.
     """
-    schema = Schema(refresh=refresh)
+    schema = load_schema(refresh=refresh)
     attribute_defaults = convert_strings_to_dict(attribute_default)
 
     configuration = ResourceConfiguration(
@@ -334,11 +425,17 @@ def data_create(
         configuration=configuration,
     )
 
-    write_terraform_to_file(
+    changed = write_terraform_to_file(
         new_code=component.code,
         filename=terraform_filename if terraform_filename else "data.tf",
     )
 
+    if not changed:
+        print(
+            f'\n{colors(color="OK_BLUE")}Info:{colors()} The data source "{provider}_{kind}" "{name}" is unchanged.\n'
+        )
+        return
+
     print(
         f'\n{colors(color="OK_GREEN")}Success:{colors()} The data source "{provider}_{kind}" "{name}" was created.\n'
     )
@@ -403,7 +500,7 @@ def variable_create(
     """
     Create a Terraform variable.
     """
-    schema = Schema()
+    schema = load_schema()
     configuration = VariableConfiguration()
     component = TerraformVariable(
         schema=schema,
@@ -423,6 +520,191 @@ def variable_create(
     )
 
 
+# terraflow variable prune
+@variable.command("prune", context_settings=CONTEXT_SETTINGS)
+@options["recursive"]
+def variable_prune(recursive):
+    """
+    Remove the variables that are not referenced by their module.
+    """
+    removed = remove_unused_variables(recursive=recursive)
+
+    for filename, name in removed:
+        print(f'\n{colors(color="OK_GREEN")}Success:{colors()} Removed the unused variable "{name}" from {filename}.\n')
+
+    if not removed:
+        print(f'\n{colors(color="OK_BLUE")}Info:{colors()} There are no unused variables.\n')
+
+
+# terraflow generate
+@terraflow.command("generate", context_settings=CONTEXT_SETTINGS)
+@options["manifest_filename"]
+@options["generate_workers"]
+@schema_options
+def generate(file, workers, refresh):
+    """
+    Generate the providers, resources, and data sources listed in a manifest.
+    """
+    try:
+        items = load_manifest(file)
+    except ValueError as e:
+        print(f'\n{colors(color="FAIL")}Error:{colors()} {e}\n')
+        return
+
+    if not items:
+        print(f'\n{colors(color="OK_BLUE")}Info:{colors()} The manifest "{file}" does not list anything to generate.\n')
+        return
+
+    schema = load_schema(refresh=refresh)
+    lock = threading.Lock()
+
+    with click.progressbar(length=len(items), label=f"Generating {file}") as bar:
+
+        def update(item, error):
+            with lock:
+                bar.update(1)
+
+        results = generate_manifest(
+            items, schema=schema, max_workers=workers, callback=update
+        )
+
+    for id, error in results["failed"]:
+        print(f'\n{colors(color="FAIL")}Error:{colors()} The code for "{id}" could not be generated: {error!r}\n')
+
+    for filename, ids in results["files"].items():
+        if filename in results["unchanged"]:
+            print(f'\n{colors(color="OK_BLUE")}Info:{colors()} The {len(ids)} blocks in {filename} are unchanged.\n')
+        else:
+            print(f'\n{colors(color="OK_GREEN")}Success:{colors()} Wrote {len(ids)} blocks to {filename}.\n')
+
+    if set(results["files"]) - set(results["unchanged"]):
+        run_terraform_fmt()
+
+
+# terraflow docs
+@terraflow.group("docs")
+def docs():
+    """
+    Manage the provider documentation cache.
+    """
+    pass
+
+
+# terraflow docs prefetch
+@docs.command("prefetch", context_settings=CONTEXT_SETTINGS)
+@provider_options
+@documentation_options
+def docs_prefetch(namespace, provider, version, workers, source, refresh):
+    """
+    Download the documentation for every resource and data source of a provider.
+    """
+    if not version:
+        version = get_toolchain_info().get_provider_version(provider, namespace)
+
+    if not version:
+        print(
+            f'\n{colors(color="FAIL")}Error:{colors()} The version of the provider "{namespace}/{provider}" could not be determined. Use --version to set it.\n'
+        )
+        return
+
+    schema = load_schema()
+    schema.add_providers([(namespace, provider, version)])
+
+    targets = get_documentation_targets(schema=schema, namespace=namespace, provider=provider)
+
+    if not targets:
+        print(
+            f'\n{colors(color="FAIL")}Error:{colors()} The schema for the provider "{namespace}/{provider}" could not be found.\n'
+        )
+        return
+
+    failed = []
+
+    with click.progressbar(
+        length=len(targets), label=f"Documentation for {namespace}/{provider} {version}"
+    ) as bar:
+
+        def update(type, kind, status):
+            if status == "failed":
+                failed.append(f"{type} {kind}" if kind else type)
+            bar.update(1)
+
+        try:
+            if source == "registry":
+                results = import_documentation(
+                    source=RegistryDocumentationSource(max_workers=workers),
+                    namespace=namespace,
+                    provider=provider,
+                    version=version,
+                    refresh=refresh,
+                    callback=update,
+                )
+                downloaded = results["imported"]
+            else:
+                results = prefetch_documentation(
+                    schema=schema,
+                    namespace=namespace,
+                    provider=provider,
+                    version=version,
+                    refresh=refresh,
+                    max_workers=workers,
+                    callback=update,
+                )
+                downloaded = results["downloaded"]
+        except Exception as e:
+            print(
+                f'\n{colors(color="FAIL")}Error:{colors()} The documentation could not be downloaded: {e}\n'
+            )
+            return
+
+    print(
+        f'\n{colors(color="OK_GREEN")}Success:{colors()} Downloaded {downloaded} documentation pages, {results["cached"]} were already cached.\n'
+    )
+
+    if failed:
+        print(
+            f'\n{colors(color="WARNING")}Warning:{colors()} {len(failed)} pages could not be downloaded and will be retried on the next run: {", ".join(sorted(failed))}\n'
+        )
+
+
+# terraflow docs import
+@docs.command("import", context_settings=CONTEXT_SETTINGS)
+@provider_options
+@options["version"]
+@options["documentation_path"]
+@options["refresh_documentation"]
+def docs_import(namespace, provider, version, path, refresh):
+    """
+    Import the documentation of a provider from a local checkout or release tarball.
+    """
+    # Only the lock file is read, so importing never needs the network
+    if not version:
+        version = get_toolchain_info().get_locked_provider_version(provider, namespace)
+
+    if not version:
+        print(
+            f'\n{colors(color="FAIL")}Error:{colors()} The provider "{namespace}/{provider}" is not in the lock file. Use --version to set the version of the documentation.\n'
+        )
+        return
+
+    results = import_documentation(
+        source=LocalDocumentationSource(path),
+        namespace=namespace,
+        provider=provider,
+        version=version,
+        refresh=refresh,
+    )
+
+    if results["imported"] + results["cached"] == 0:
+        print(
+            f'\n{colors(color="FAIL")}Error:{colors()} No documentation was found in "{path}".\n'
+        )
+    else:
+        print(
+            f'\n{colors(color="OK_GREEN")}Success:{colors()} Imported {results["imported"]} documentation pages for {namespace}/{provider} {version}, {results["cached"]} were already cached.\n'
+        )
+
+
 # # terraflow variable delete
 # @variable.command("delete", context_settings=CONTEXT_SETTINGS)
 # @resource_options
@@ -4,8 +4,29 @@ Constant values used across the CLI.
 import os
 
 ALLOWED_SCOPES = ["data_source", "resource", "provider"]
+# Blocks without labels that a configuration has one of, so new code replaces the existing block
+SINGLETON_BLOCK_TYPES = {"terraform"}
 TERRAFLOW_DIR = ".terraflow"
 DOCUMENTATION_DIR = os.path.join(TERRAFLOW_DIR, "documentation")
+METADATA_DIR = os.path.join(TERRAFLOW_DIR, "metadata")
+SCHEMA_DIR = os.path.join(TERRAFLOW_DIR, "schema")
+SCHEMA_FILE = os.path.join(TERRAFLOW_DIR, "schema.json")
+SCHEMA_STORAGE_TYPES = ["shards", "index"]
+PROVIDERS_CACHE_FILE = os.path.join(TERRAFLOW_DIR, "providers.json")
+TOOLCHAIN_CACHE_FILE = os.path.join(TERRAFLOW_DIR, "toolchain.json")
+CODE_INDEX_FILE = os.path.join(TERRAFLOW_DIR, "code_index.json")
+LOCK_FILE = ".terraform.lock.hcl"
+# Directories that never contain configuration of their own, and files listing paths to skip
+SKIPPED_DIRECTORIES = {".terraform", TERRAFLOW_DIR, ".git"}
+IGNORE_FILES = [".terraflowignore", ".gitignore"]
+GLOBAL_CACHE_DIR = os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+    "terraflow",
+)
+GLOBAL_SCHEMA_DIR = os.path.join(GLOBAL_CACHE_DIR, "schemas")
+GLOBAL_PLUGIN_DIR = os.path.join(GLOBAL_CACHE_DIR, "plugins")
+HTTP_CACHE_DIR = os.path.join(GLOBAL_CACHE_DIR, "http")
 TERRAFORM_REGISTRY_BASE = "registry.terraform.io"
 GITHUB_BASE = "github.com"
+DOCUMENTATION_SOURCES = ["registry", "github"]
 VALID_TYPES = {"string", "number", "bool", "list", "map", "set", "object", "tuple", "any"}
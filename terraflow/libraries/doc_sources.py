@@ -0,0 +1,339 @@
+import os
+import re
+import tarfile
+from concurrent.futures import ThreadPoolExecutor
+
+from requests.exceptions import RequestException
+
+from .constants import GITHUB_BASE, TERRAFORM_REGISTRY_BASE
+from .helpers import get_http_client, scrape_website
+
+# Documentation layouts used by provider repositories with their priority. The legacy
+# layout keeps the pages in website/docs, the registry layout in docs. When a repository
+# has both, the page with the higher priority is used.
+DOCUMENT_PATTERNS = [
+    (re.compile(r"(?:^|/)website/docs/index\.html\.markdown$"), "provider", 1),
+    (re.compile(r"(?:^|/)website/docs/r/([^/]+)\.html\.markdown$"), "resource", 1),
+    (re.compile(r"(?:^|/)website/docs/d/([^/]+)\.html\.markdown$"), "data", 1),
+    (re.compile(r"(?:^|/)docs/index\.md$"), "provider", 0),
+    (re.compile(r"(?:^|/)docs/resources/([^/]+)\.md$"), "resource", 0),
+    (re.compile(r"(?:^|/)docs/data-sources/([^/]+)\.md$"), "data", 0),
+]
+# Categories of the registry provider-docs API and the matching documentation types
+REGISTRY_CATEGORIES = {"overview": "provider", "resources": "resource", "data-sources": "data"}
+FRONT_MATTER_PATTERN = re.compile(r"\A---\s*\n.*?\n---\s*\n", re.DOTALL)
+LIST_ITEM_PATTERN = re.compile(r"^[ \t]*[*+-][ \t]+(?=`)", re.MULTILINE)
+
+
+def get_documentation_url(namespace, provider, version, type, kind=None):
+    """
+    Get the URL of the documentation for a provider, resource, or data source.
+
+    Args:
+        namespace: The namespace of the provider.
+        provider: The name of the provider.
+        version: The version of the provider, or 'main'.
+        type: One of 'provider', 'resource', or 'data'.
+        kind: The resource or data source name without the provider prefix.
+
+    Returns:
+        The documentation URL.
+    """
+    base_url = f"https://{GITHUB_BASE}/{namespace}/terraform-provider-{provider}/blob/{'' if version == 'main' else 'v'}{version}/website/docs"
+
+    if type == "provider":
+        return f"{base_url}/index.html.markdown"
+    elif type == "resource":
+        return f"{base_url}/r/{kind}.html.markdown"
+    elif type == "data":
+        return f"{base_url}/d/{kind}.html.markdown"
+    else:
+        raise ValueError(
+            "Invalid scope. Must be one of 'provider', 'resource', or 'data'."
+        )
+
+
+def normalize_markdown(text: str) -> str:
+    """
+    Convert a raw documentation page to the format of the documentation cache.
+
+    The front matter is removed and list bullets in front of attribute names are dropped,
+    so attributes start their line with the name in backticks like scraped pages do.
+
+    Args:
+        text: The raw markdown.
+
+    Returns:
+        The normalized markdown.
+    """
+    text = FRONT_MATTER_PATTERN.sub("", text.replace("\r\n", "\n"), count=1)
+    return LIST_ITEM_PATTERN.sub("", text)
+
+
+def match_document_path(path: str, provider: str = None):
+    """
+    Match a path in a provider repository to a documentation page.
+
+    Args:
+        path: The path of the file, using forward slashes.
+        provider: The name of the provider, which is removed from the start of page names.
+
+    Returns:
+        A (type, kind) tuple, or None if the path is not a documentation page.
+    """
+    match = _match_document_path(path, provider)
+
+    return match[0] if match else None
+
+
+def _match_document_path(path: str, provider: str = None):
+    """
+    Like `match_document_path`, but returns a ((type, kind), priority) tuple.
+    """
+    for pattern, type, priority in DOCUMENT_PATTERNS:
+        match = pattern.search(path)
+
+        if match:
+            kind = match.group(1) if match.groups() else None
+
+            if kind and provider and kind.startswith(f"{provider}_"):
+                kind = kind[len(provider) + 1:]
+
+            return (type, kind), priority
+
+    return None
+
+
+def _read_bytes(filename: str) -> bytes:
+    with open(filename, "rb") as f:
+        return f.read()
+
+
+class DocumentationSource:
+    """
+    Base class for the places provider documentation can be read from.
+
+    Subclasses implement `get_text` for single pages. Sources that can read a whole
+    provider version at once also implement `iter_documents`.
+    """
+
+    def get_text(self, namespace, provider, version, type, kind=None):
+        """
+        Get the text of one documentation page, or None if it could not be read.
+        """
+        raise NotImplementedError
+
+    def iter_documents(self, namespace, provider, version, exclude=None):
+        """
+        Yield (type, kind, text) for every documentation page of a provider version.
+
+        Args:
+            namespace: The namespace of the provider.
+            provider: The name of the provider.
+            version: The version of the provider.
+            exclude: Optional; a callable that receives (type, kind) and returns True for
+                pages that should be skipped.
+
+        The text is None for pages that could not be read.
+        """
+        raise NotImplementedError
+
+
+class GitHubDocumentationSource(DocumentationSource):
+    """
+    Scrapes the documentation pages from the provider repository on GitHub.
+    """
+
+    def get_text(self, namespace, provider, version, type, kind=None):
+        url = get_documentation_url(namespace, provider, version, type, kind)
+        return scrape_website(url, tag="article")
+
+
+class OfflineDocumentationSource(DocumentationSource):
+    """
+    Never downloads anything, so only the pages in the documentation cache are used.
+
+    Pages that are not cached have no descriptions. Fill the cache with
+    `terraflow docs prefetch` or `terraflow docs import` first.
+    """
+
+    def get_text(self, namespace, provider, version, type, kind=None):
+        return None
+
+    def iter_documents(self, namespace, provider, version, exclude=None):
+        return iter(())
+
+
+class LocalDocumentationSource(DocumentationSource):
+    """
+    Reads the documentation from a local checkout or release tarball of a provider.
+
+    The pages of the whole provider are indexed in one pass over the files, so looking up
+    a page never scans the source again.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._documents = None
+
+    def _iter_files(self):
+        """
+        Yield (path, read) for every file in the source, where read returns the contents.
+        """
+        if os.path.isdir(self.path):
+            for root, dirs, files in os.walk(self.path):
+                dirs[:] = [d for d in dirs if not d.startswith(".")]
+
+                for file_name in files:
+                    filename = os.path.join(root, file_name)
+                    relative_path = os.path.relpath(filename, self.path).replace(os.sep, "/")
+                    yield relative_path, lambda filename=filename: _read_bytes(filename)
+        else:
+            with tarfile.open(self.path, "r:*") as archive:
+                for member in archive:
+                    if member.isfile():
+                        yield member.name, lambda member=member: archive.extractfile(member).read()
+
+    def _index(self, provider: str) -> dict:
+        if self._documents is None:
+            self._documents = {}
+            priorities = {}
+
+            for path, read in self._iter_files():
+                match = _match_document_path(path, provider)
+
+                if match is None:
+                    continue
+
+                document, priority = match
+
+                # Files are visited in any order, so a page only replaces one found
+                # earlier when its layout has a higher priority
+                if priority > priorities.get(document, -1):
+                    self._documents[document] = normalize_markdown(read().decode("utf-8"))
+                    priorities[document] = priority
+
+        return self._documents
+
+    def get_text(self, namespace, provider, version, type, kind=None):
+        return self._index(provider).get((type, kind))
+
+    def iter_documents(self, namespace, provider, version, exclude=None):
+        for (type, kind), text in self._index(provider).items():
+            if not (exclude and exclude(type, kind)):
+                yield type, kind, text
+
+
+class RegistryDocumentationSource(DocumentationSource):
+    """
+    Reads the raw markdown of the documentation from the registry provider-docs API.
+
+    The listing of a provider version is paged through once and the contents of the pages
+    are downloaded in parallel through the shared HTTP client.
+    """
+
+    def __init__(
+        self,
+        base_url: str = f"https://{TERRAFORM_REGISTRY_BASE}",
+        max_workers: int = 8,
+        page_size: int = 100,
+        timeout: int = 30,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.max_workers = max_workers
+        self.page_size = page_size
+        self.timeout = timeout
+        self._version_ids = {}
+
+    def _get_json(self, path: str, params: dict = None) -> dict:
+        response = get_http_client().get(
+            f"{self.base_url}{path}", params=params, timeout=self.timeout
+        )
+        response.raise_for_status()
+        return response.json()
+
+    def _get_version_id(self, namespace, provider, version) -> str:
+        """
+        Get the registry id of a provider version.
+        """
+        key = (namespace, provider, version)
+
+        if key not in self._version_ids:
+            data = self._get_json(
+                f"/v2/providers/{namespace}/{provider}",
+                params={"include": "provider-versions"},
+            )
+
+            for item in data.get("included", []):
+                if (
+                    item.get("type") == "provider-versions"
+                    and item["attributes"].get("version") == version
+                ):
+                    self._version_ids[key] = item["id"]
+                    break
+            else:
+                raise ValueError(
+                    f"The version {version} of {namespace}/{provider} was not found in the registry."
+                )
+
+        return self._version_ids[key]
+
+    def _iter_listing(self, version_id, category, slug=None):
+        """
+        Yield (type, kind, id) for the documentation pages of a category, one page of the
+        listing at a time.
+        """
+        page = 1
+
+        while True:
+            params = {
+                "filter[provider-version]": version_id,
+                "filter[category]": category,
+                "filter[language]": "hcl",
+                "page[number]": page,
+                "page[size]": self.page_size,
+            }
+            if slug:
+                params["filter[slug]"] = slug
+
+            entries = self._get_json("/v2/provider-docs", params=params).get("data", [])
+
+            for entry in entries:
+                kind = entry["attributes"]["slug"]
+                yield REGISTRY_CATEGORIES[category], None if category == "overview" else kind, entry["id"]
+
+            if len(entries) < self.page_size:
+                break
+            page += 1
+
+    def _get_content(self, id):
+        try:
+            data = self._get_json(f"/v2/provider-docs/{id}")
+            return normalize_markdown(data["data"]["attributes"]["content"])
+        except (RequestException, KeyError, ValueError):
+            return None
+
+    def get_text(self, namespace, provider, version, type, kind=None):
+        try:
+            version_id = self._get_version_id(namespace, provider, version)
+            category = {v: k for k, v in REGISTRY_CATEGORIES.items()}[type]
+            entries = list(self._iter_listing(version_id, category, slug=kind or "index"))
+        except (RequestException, KeyError, ValueError):
+            return None
+
+        return self._get_content(entries[0][2]) if entries else None
+
+    def iter_documents(self, namespace, provider, version, exclude=None):
+        version_id = self._get_version_id(namespace, provider, version)
+
+        entries = []
+        for category in REGISTRY_CATEGORIES:
+            for type, kind, id in self._iter_listing(version_id, category):
+                if not (exclude and exclude(type, kind)):
+                    entries.append((type, kind, id))
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            contents = executor.map(lambda entry: self._get_content(entry[2]), entries)
+
+            for (type, kind, _), text in zip(entries, contents):
+                yield type, kind, text
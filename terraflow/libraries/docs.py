@@ -1,10 +1,340 @@
 import os
+import re
+import json
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-from .constants import DOCUMENTATION_DIR, GITHUB_BASE
-from .helpers import scrape_website, get_resource_attribute_description
+from .constants import DOCUMENTATION_DIR, METADATA_DIR, TERRAFORM_REGISTRY_BASE
+from .helpers import (
+    build_attribute_description_index,
+    get_attribute_descriptions,
+    write_file_atomically,
+)
+from .doc_sources import GitHubDocumentationSource, get_documentation_url
 from .schema import Schema
 from .formatting import format_attribute_type
 
+# Version of the attribute metadata format. Bump it when the metadata computation changes
+# so cached metadata is rebuilt.
+METADATA_FORMAT_VERSION = 1
+
+# A line that starts the documentation of a block, such as
+# "A `os_disk` block supports the following:" or "The `identity` block exports the following:"
+BLOCK_SECTION_PATTERN = re.compile(
+    r"^\s*(?:an?|the|each)\s+`(\w+)`\s+(?:nested\s+)?blocks?\b.*\b(?:supports?|exports?|contains?)\b",
+    re.IGNORECASE,
+)
+# A single line attribute description such as "`name` - (Required) The name."
+SECTION_ATTRIBUTE_PATTERN = re.compile(r"^`(\w+)`[ \t]+-[ \t]+(\(.*?\))?[ \t]*(.*)$")
+# A reference to a nested block in a description, such as "A `os_disk` block as defined below."
+BLOCK_REFERENCE_PATTERN = re.compile(r"`(\w+)`\s+blocks?\b")
+HEADER_PATTERN = re.compile(r"^#+\s*(.*?)\s*$")
+
+
+class DocumentationSections:
+    """
+    Attribute descriptions of a documentation page, grouped by the block they document.
+
+    Provider documentation lists the top level attributes under the reference headers and
+    documents every nested block in its own section, for example:
+
+        `os_disk` - (Required) An `os_disk` block as defined below.
+        ...
+        An `os_disk` block supports the following:
+        `caching` - (Required) The Type of Caching which should be used.
+
+    The page is parsed in one pass. The block path of each section is worked out from the
+    attribute that references the block, so descriptions can be looked up exactly by
+    (block_hierarchy, attribute).
+    """
+
+    def __init__(self, text: str):
+        # Descriptions for each block name, None being the top level
+        self.blocks = {None: {}}
+        # The section each block is referenced from
+        self.parents = {}
+        self._parse(text or "")
+        self.paths = self._resolve_paths()
+
+    def _parse(self, text: str) -> None:
+        section = None
+
+        for line in text.split("\n"):
+            header = HEADER_PATTERN.match(line)
+            if header:
+                # Timeouts are documented under their own header, everything else under
+                # a header belongs to the top level
+                section = "timeouts" if header.group(1).lower() == "timeouts" else None
+                if section:
+                    self.parents.setdefault(section, None)
+                self.blocks.setdefault(section, {})
+                continue
+
+            block = BLOCK_SECTION_PATTERN.match(line)
+            if block:
+                section = block.group(1)
+                self.blocks.setdefault(section, {})
+                continue
+
+            attribute = SECTION_ATTRIBUTE_PATTERN.match(line)
+            if not attribute or not attribute.group(3):
+                continue
+
+            name, description = attribute.group(1), attribute.group(3)
+            self.blocks[section].setdefault(name, description)
+
+            # An attribute that is documented as a block of the same name is nested in
+            # the current section
+            if name in BLOCK_REFERENCE_PATTERN.findall(description):
+                self.parents.setdefault(name, section)
+
+    def _resolve_paths(self) -> dict:
+        """
+        Map the block path of every section to its attribute descriptions.
+        """
+        paths = {}
+
+        for block, descriptions in self.blocks.items():
+            path = []
+            current = block
+
+            while current is not None and current not in path:
+                path.insert(0, current)
+                current = self.parents.get(current)
+
+            paths[tuple(path)] = descriptions
+
+        return paths
+
+    def get_description(self, attribute: str, block_hierarchy: list = None):
+        """
+        Get the description of an attribute from the section of the block it is in.
+
+        Args:
+            attribute: The name of the attribute.
+            block_hierarchy: The names of the blocks the attribute is nested in.
+
+        Returns:
+            The description, or None if the page does not document the attribute in the
+            section of its block.
+        """
+        block_hierarchy = block_hierarchy or []
+        descriptions = self.paths.get(tuple(block_hierarchy))
+
+        # Fall back to the section of the innermost block when its path is unknown
+        if descriptions is None and block_hierarchy:
+            descriptions = self.blocks.get(block_hierarchy[-1])
+
+        if descriptions is None:
+            return None
+
+        return descriptions.get(attribute)
+
+
+def get_documentation_filepath(namespace, provider, version, type, kind=None):
+    """
+    Get the path of the cached documentation for a provider, resource, or data source.
+
+    Args:
+        namespace: The namespace of the provider.
+        provider: The name of the provider.
+        version: The version of the provider, or 'main'.
+        type: One of 'provider', 'resource', or 'data'.
+        kind: The resource or data source name without the provider prefix.
+
+    Returns:
+        The path of the cached markdown file.
+    """
+    documentation_dir = os.path.join(DOCUMENTATION_DIR, namespace, provider, version)
+
+    if type == "provider":
+        return os.path.join(documentation_dir, f"{type}.md")
+
+    return os.path.join(documentation_dir, kind, f"{type}.md")
+
+
+def get_metadata_filepath(namespace, provider, version, type, kind=None):
+    """
+    Get the path of the cached attribute metadata for a provider, resource, or data source.
+
+    Args:
+        namespace: The namespace of the provider.
+        provider: The name of the provider.
+        version: The version of the provider, or 'main'.
+        type: One of 'provider', 'resource', or 'data'.
+        kind: The resource or data source name without the provider prefix.
+
+    Returns:
+        The path of the cached JSON file.
+    """
+    metadata_dir = os.path.join(METADATA_DIR, namespace, provider, version)
+
+    if type == "provider":
+        return os.path.join(metadata_dir, f"{type}.json")
+
+    return os.path.join(metadata_dir, kind, f"{type}.json")
+
+
+def write_documentation_file(filepath, text):
+    """
+    Write documentation to the cache.
+
+    The file is written under a temporary name and then moved into place, so an
+    interrupted write never leaves a partial file that looks cached.
+    """
+    os.makedirs(os.path.dirname(filepath), exist_ok=True)
+    write_file_atomically(filepath, text)
+
+
+def get_documentation_targets(schema, namespace, provider):
+    """
+    List the documentation pages of a provider and all of its resources and data sources.
+
+    Args:
+        schema: The Schema used to list the resources and data sources.
+        namespace: The namespace of the provider.
+        provider: The name of the provider.
+
+    Returns:
+        A list of (type, kind) tuples, or an empty list if the provider is not in the schema.
+    """
+    provider_schemas = schema.manifest["provider_schemas"].get(
+        f"{TERRAFORM_REGISTRY_BASE}/{namespace}/{provider}"
+    )
+
+    if provider_schemas is None:
+        return []
+
+    targets = [("provider", None)]
+    for type, scope in [("resource", "resource_schemas"), ("data", "data_source_schemas")]:
+        for name in provider_schemas.get(scope, []):
+            targets.append((type, name.replace(f"{provider}_", "", 1)))
+
+    return targets
+
+
+def prefetch_documentation(
+    schema,
+    namespace,
+    provider,
+    version,
+    refresh=False,
+    max_workers=8,
+    callback=None,
+    source=None,
+):
+    """
+    Download the documentation of a provider and all of its resources and data sources.
+
+    Documentation that is already cached is skipped unless `refresh` is set, so an
+    interrupted prefetch resumes where it stopped.
+
+    Args:
+        schema: The Schema used to list the resources and data sources.
+        namespace: The namespace of the provider.
+        provider: The name of the provider.
+        version: The version of the provider.
+        refresh: Download documentation that is already cached.
+        max_workers: The maximum number of pages to download at the same time.
+        callback: Called with (type, kind, status) after each page, where the status is
+            'cached', 'downloaded', or 'failed'.
+        source: The DocumentationSource to read from. Defaults to GitHub.
+
+    Returns:
+        A dictionary with the number of pages for each status.
+    """
+    source = source if source else GitHubDocumentationSource()
+    targets = get_documentation_targets(schema, namespace, provider)
+    results = {"cached": 0, "downloaded": 0, "failed": 0}
+
+    def report(type, kind, status):
+        results[status] += 1
+        if callback:
+            callback(type, kind, status)
+
+    def fetch(type, kind):
+        text = source.get_text(namespace, provider, version, type, kind)
+
+        if text is None:
+            return "failed"
+
+        write_documentation_file(
+            get_documentation_filepath(namespace, provider, version, type, kind), text
+        )
+        return "downloaded"
+
+    pending = []
+    for type, kind in targets:
+        filepath = get_documentation_filepath(namespace, provider, version, type, kind)
+
+        if not refresh and os.path.exists(filepath):
+            report(type, kind, "cached")
+        else:
+            pending.append((type, kind))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(fetch, type, kind): (type, kind) for type, kind in pending}
+
+        for future in as_completed(futures):
+            type, kind = futures[future]
+            try:
+                status = future.result()
+            except Exception:
+                status = "failed"
+            report(type, kind, status)
+
+    return results
+
+
+def import_documentation(source, namespace, provider, version, refresh=False, callback=None):
+    """
+    Populate the documentation cache with every page of a provider version at once.
+
+    Pages that are already cached are skipped by the source unless `refresh` is set.
+
+    Args:
+        source: A DocumentationSource that implements `iter_documents`.
+        namespace: The namespace of the provider.
+        provider: The name of the provider.
+        version: The version of the provider.
+        refresh: Overwrite documentation that is already cached.
+        callback: Called with (type, kind, status) after each page, where the status is
+            'cached', 'imported', or 'failed'.
+
+    Returns:
+        A dictionary with the number of pages for each status.
+    """
+    results = {"cached": 0, "imported": 0, "failed": 0}
+
+    def report(type, kind, status):
+        results[status] += 1
+        if callback:
+            callback(type, kind, status)
+
+    def is_cached(type, kind):
+        filepath = get_documentation_filepath(namespace, provider, version, type, kind)
+
+        if os.path.exists(filepath):
+            report(type, kind, "cached")
+            return True
+
+        return False
+
+    documents = source.iter_documents(
+        namespace, provider, version, exclude=None if refresh else is_cached
+    )
+
+    for type, kind, text in documents:
+        if text is None:
+            report(type, kind, "failed")
+        else:
+            write_documentation_file(
+                get_documentation_filepath(namespace, provider, version, type, kind), text
+            )
+            report(type, kind, "imported")
+
+    return results
+
 
 class TerraformDocumentation:
     def __init__(
@@ -17,6 +347,7 @@ class TerraformDocumentation:
         type=None,
         use_cache=True,
         refresh=False,
+        source=None,
     ):
         self.schema = schema
         self.namespace = namespace
@@ -26,12 +357,19 @@ class TerraformDocumentation:
         self.type = type
         self.use_cache = use_cache
         self.refresh = refresh
+        self.source = source if source else GitHubDocumentationSource()
 
         self.url = self._get_docs_url()
         self.text = self._get_docs_text()
 
         schema_data = self._get_schema_data()
-        self.metadata = self._get_attribute_metadata(schema_data)
+        self.metadata = self._read_metadata(schema_data)
+
+        if self.metadata is None:
+            self.sections = DocumentationSections(self.text)
+            self.descriptions = self._get_descriptions(schema_data)
+            self.metadata = self._get_attribute_metadata(schema_data)
+            self._write_metadata(schema_data)
 
     def _get_schema_data(self):
         if self.type == "provider":
@@ -48,61 +386,41 @@ class TerraformDocumentation:
             )
 
     def _get_docs_url(self):
-        if self.type == "provider":
-            return f"https://{GITHUB_BASE}/{self.namespace}/terraform-provider-{self.provider}/blob/{'' if self.version == 'main' else 'v'}{self.version}/website/docs/index.html.markdown"
-        elif self.type == "resource":
-            return f"https://{GITHUB_BASE}/{self.namespace}/terraform-provider-{self.provider}/blob/{'' if self.version == 'main' else 'v'}{self.version}/website/docs/r/{self.kind}.html.markdown"
-        elif self.type == "data":
-            return f"https://{GITHUB_BASE}/{self.namespace}/terraform-provider-{self.provider}/blob/{'' if self.version == 'main' else 'v'}{self.version}/website/docs/d/{self.kind}.html.markdown"
-        else:
-            raise ValueError(
-                "Invalid scope. Must be one of 'provider', 'resource', or 'data'."
-            )
+        return get_documentation_url(
+            self.namespace, self.provider, self.version, self.type, self.kind
+        )
+
+    def _read_source(self):
+        return self.source.get_text(
+            self.namespace, self.provider, self.version, self.type, self.kind
+        )
 
     def _get_docs_text(self):
         # Check is the user wants to use cache documentation
         if self.use_cache:
-            # Set the documentation directory
-            documentation_dir = os.path.join(
-                DOCUMENTATION_DIR, self.namespace, self.provider, self.version
+            filepath = get_documentation_filepath(
+                self.namespace, self.provider, self.version, self.type, self.kind
             )
 
-            # Set the filepath
-            if self.type == "provider":
-                filepath = os.path.join(documentation_dir)
-            else:
-                filepath = os.path.join(documentation_dir, self.kind)
-
-            # Determine if the documentation directory exists, and if not, create it
-            if not os.path.exists(filepath):
-                os.makedirs(filepath)
-
-            # If the file exists
-            if os.path.exists(filepath + f"/{self.type}.md"):
-                # If refresh is True
-                if self.refresh:
-                    # Srape the documentation and write it to file
-                    text = scrape_website(self.url, tag="article")
-                    with open(filepath + f"/{self.type}.md", "w") as f:
-                        f.write(text)
-                        return text
-                else:
-                    # Read the existing documentation from file
-                    with open(filepath + f"/{self.type}.md", "r") as f:
-                        text = f.read()
-                        return text
-            else:
-                # Srape the documentation and write it to file
-                text = scrape_website(self.url, tag="article")
-                with open(filepath + f"/{self.type}.md", "w") as f:
-                    f.write(text)
-                    return text
+            # Read the existing documentation from file unless a refresh was requested
+            if os.path.exists(filepath) and not self.refresh:
+                with open(filepath, "r") as f:
+                    return f.read()
 
-        else:
-            # Srape the documentation and write it to file
-            text = scrape_website(self.url, tag="article")
+            # Get the documentation from the source and write it to file. Failed
+            # downloads are not cached, so they are retried on the next run.
+            text = self._read_source()
+            if text is None:
+                return ""
+
+            write_documentation_file(filepath, text)
             return text
 
+        else:
+            # Get the documentation from the source
+            text = self._read_source()
+            return text if text is not None else ""
+
     @property
     def inputs(self):
         # return {k: v for k, v in self.metadata.items() if v['input']}
@@ -113,6 +431,102 @@ class TerraformDocumentation:
         # return {k: v for k, v in self.metadata.items() if v['output']}
         return [k for k, v in self.metadata.items() if v["output"]]
 
+    def _get_metadata_key(self, schema: dict) -> str:
+        """
+        The metadata depends on the documentation text and on the full schema.
+
+        The schema is part of the key because the same documentation path serves several
+        schemas, for example for the 'main' version or a fallback version. All of it is
+        hashed because the metadata also stores the type and schema of each attribute.
+        """
+        digest = hashlib.sha256(f"{METADATA_FORMAT_VERSION}\n".encode("utf-8"))
+        digest.update((self.text or "").encode("utf-8"))
+        digest.update(b"\n")
+        digest.update(json.dumps(schema or {}, sort_keys=True, default=dict).encode("utf-8"))
+
+        return digest.hexdigest()
+
+    def _read_metadata(self, schema: dict):
+        """
+        Read the attribute metadata computed by an earlier run, or None if there is none.
+        """
+        if not self.use_cache or self.refresh:
+            return None
+
+        filepath = get_metadata_filepath(
+            self.namespace, self.provider, self.version, self.type, self.kind
+        )
+
+        try:
+            with open(filepath, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if data.get("key") != self._get_metadata_key(schema):
+            return None
+
+        return data["metadata"]
+
+    def _write_metadata(self, schema: dict) -> None:
+        if not self.use_cache:
+            return
+
+        filepath = get_metadata_filepath(
+            self.namespace, self.provider, self.version, self.type, self.kind
+        )
+
+        try:
+            write_documentation_file(
+                filepath,
+                json.dumps({"key": self._get_metadata_key(schema), "metadata": self.metadata}),
+            )
+        except (OSError, TypeError):
+            pass
+
+    def _get_descriptions(self, schema: dict) -> dict:
+        """
+        Get the description of every attribute in the schema.
+
+        Descriptions are looked up in the section of the block each attribute is in. Only
+        attributes the sections do not cover are matched by name and fuzzy scoring.
+        """
+        descriptions = {}
+        unmatched = []
+
+        for attribute, block_hierarchy in self._list_attributes(schema):
+            description = self.sections.get_description(attribute, block_hierarchy)
+
+            if description is None:
+                unmatched.append((attribute, block_hierarchy))
+            else:
+                descriptions[(attribute, tuple(block_hierarchy))] = description
+
+        if unmatched:
+            descriptions.update(
+                get_attribute_descriptions(
+                    self.text,
+                    unmatched,
+                    resource=f"{self.namespace}/{self.provider}/{self.version}/{self.type}/{self.kind}",
+                    description_index=build_attribute_description_index(self.text),
+                )
+            )
+
+        return descriptions
+
+    def _list_attributes(self, schema: dict, block_hierarchy: list = None):
+        """
+        Yield (attribute, block_hierarchy) for every attribute in the schema.
+        """
+        if block_hierarchy is None:
+            block_hierarchy = []
+
+        for attribute in schema.get("block", {}).get("attributes", {}):
+            yield attribute, block_hierarchy
+
+        for block, block_schema in schema.get("block", {}).get("block_types", {}).items():
+            yield from self._list_attributes(block_schema, block_hierarchy + [block])
+
     def _get_attribute_metadata(
         self,
         schema: dict,
@@ -138,9 +552,7 @@ class TerraformDocumentation:
             id = ".".join(block_hierarchy + [attribute])
 
             # Get the description from the documentation
-            attribute_description = get_resource_attribute_description(
-                self.text, attribute, block_hierarchy
-            )
+            attribute_description = self.descriptions[(attribute, tuple(block_hierarchy))]
 
             # Set variables
             is_required = attribute_schema.get("required", False)
@@ -1,3 +1,6 @@
+from contextlib import contextmanager
+
+
 def format_comments(comments):
     if comments:
         formatted_comments = "\n".join([f"# {comment}" for comment in comments])
@@ -211,3 +214,87 @@ def format_terraform_code(code: str, indentation="  "):
 
     # Join the lines back together and return the result
     return "\n".join(lines)
+
+
+class CodeWriter:
+    """
+    Writes Terraform code line by line with the indentation of the block each line is in.
+
+    The depth of the blocks is tracked while the code is written, so the code never has to
+    be split up and indented again afterwards. Lines are collected in memory, or written
+    straight to a file-like stream when one is given.
+
+    Example:
+        writer = CodeWriter()
+        with writer.block('resource "azurerm_resource_group" "main" {\n', "}\n"):
+            writer.write("name = var.name\n")
+        code = writer.getvalue()
+    """
+
+    def __init__(self, stream=None, indentation: str = "  "):
+        self.stream = stream
+        self.indentation = indentation
+        self.level = 0
+        self._lines = []
+
+    def write(self, text: str) -> None:
+        """
+        Write one or more lines at the current level of indentation.
+
+        Braces opened and closed within the text indent the lines in between, so
+        multi-line values such as objects are indented as well.
+
+        Args:
+            text: The code to write. A final newline is optional.
+        """
+        lines = text.split("\n")
+        if lines[-1] == "":
+            lines.pop()
+
+        depth = self.level
+        for line in lines:
+            line = line.lstrip()
+            opens, closes = "{" in line, "}" in line
+
+            if closes and not opens:
+                depth = max(depth - 1, self.level)
+
+            self._write_line(depth * self.indentation + line if line else "")
+
+            if opens and not closes:
+                depth += 1
+
+    def _write_line(self, line: str) -> None:
+        if self.stream is None:
+            self._lines.append(line)
+        else:
+            self.stream.write(line + "\n")
+
+    def indent(self) -> None:
+        self.level += 1
+
+    def dedent(self) -> None:
+        self.level = max(self.level - 1, 0)
+
+    @contextmanager
+    def block(self, header: str, footer: str):
+        """
+        Write the header and footer of a block around the code written inside the context.
+
+        Args:
+            header: The code that opens the block, including any comments above it.
+            footer: The code that closes the block.
+        """
+        self.write(header)
+        self.indent()
+        try:
+            yield self
+        finally:
+            self.dedent()
+            self.write(footer)
+
+    def getvalue(self) -> str:
+        """
+        Get the code written so far, if no stream was given.
+        """
+        return "".join(f"{line}\n" for line in self._lines)
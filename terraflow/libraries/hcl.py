@@ -0,0 +1,464 @@
+"""
+Linear-time scanner for the blocks of Terraform configuration files.
+
+The text is split into tokens in one pass. Quoted strings, including the expressions
+interpolated in them, heredocs, and comments are single tokens, so the braces inside them
+never affect the nesting of blocks. The tokens are then parsed into blocks and attributes
+that record their offsets in the text, so callers can cut out or replace the exact code of
+a block.
+
+Example:
+    for block in scan_blocks(text):
+        print(block.id, block.start, block.end)
+"""
+import re
+import hashlib
+from collections import namedtuple
+from dataclasses import dataclass, field
+
+# One token, after any whitespace. Expression text such as numbers, operators, and
+# references like `var.name` is matched as a single word. Strings with interpolated
+# expressions, heredocs, and unterminated comments are matched as "other" and scanned
+# separately.
+TOKEN_PATTERN = re.compile(
+    r"[ \t\r\f\v]*(?:"
+    r"(?P<newline>\n)"
+    r"|(?P<comment>#[^\n]*|//[^\n]*|/\*.*?\*/)"
+    r'|(?P<string>"(?:[^"\\\n$%]|\\.|\$\$\{|%%\{|[$%](?!\{))*")'
+    r"|(?P<identifier>[A-Za-z_][\w-]*(?![^\s\"#/<{}\[\]()=,]))"
+    r"|(?P<word>[^\s\"#/<{}\[\]()=,]+)"
+    r"|(?P<punctuation>[^\"</])"
+    r"|(?P<other>.)"
+    r")?",
+    re.DOTALL,
+)
+HEREDOC_PATTERN = re.compile(r"<<-?([A-Za-z_][\w-]*)[ \t]*\r?\n")
+# Characters that end or escape a quoted string, or start an interpolation in it
+STRING_PATTERN = re.compile(r'["\\\n]|\$\$\{|%%\{|[$%]\{')
+# Characters that change the nesting of an interpolated expression
+TEMPLATE_PATTERN = re.compile(r'["{}]')
+VARIABLE_REFERENCE_PATTERN = re.compile(r"(?<![\w.])var\.([A-Za-z_][\w-]*)")
+
+OPENING_BRACKETS = "{[("
+CLOSING_BRACKETS = "}])"
+
+Token = namedtuple("Token", ["type", "value", "start", "end"])
+
+
+@dataclass
+class Attribute:
+    """
+    An attribute in the body of a block, such as `name = var.name`.
+    """
+
+    name: str
+    value: str
+    start: int
+    end: int
+
+
+@dataclass
+class Block:
+    """
+    A block of a configuration with its offsets in the text.
+
+    `start` includes the comment lines directly above the block, `header_start` is the
+    offset of the block type, and `end` is the offset after the closing brace.
+    """
+
+    type: str
+    labels: list
+    start: int
+    header_start: int
+    body_start: int
+    end: int
+    code: str = ""
+    attributes: list = field(default_factory=list)
+    blocks: list = field(default_factory=list)
+
+    @property
+    def kind(self) -> str:
+        return self.labels[0] if len(self.labels) > 1 else None
+
+    @property
+    def name(self) -> str:
+        return self.labels[-1] if self.labels else None
+
+    @property
+    def id(self) -> str:
+        return ".".join([self.type] + self.labels)
+
+
+def _scan_string(text: str, pos: int) -> int:
+    """
+    Find the end of a quoted string that starts before `pos`, skipping escapes and
+    interpolated expressions. Strings cannot span lines, so an unterminated string ends at
+    the end of its line.
+    """
+    while True:
+        match = STRING_PATTERN.search(text, pos)
+
+        if match is None:
+            return len(text)
+
+        value = match.group()
+        if value == '"':
+            return match.end()
+        elif value == "\n":
+            return match.start()
+        elif value == "\\":
+            pos = match.end() + 1
+        elif value in ("$${", "%%{"):
+            pos = match.end()
+        else:
+            pos = _scan_template(text, match.end())
+
+
+def _scan_template(text: str, pos: int) -> int:
+    """
+    Find the end of an interpolated expression that starts before `pos`.
+    """
+    depth = 1
+
+    while True:
+        match = TEMPLATE_PATTERN.search(text, pos)
+
+        if match is None:
+            return len(text)
+
+        value = match.group()
+        if value == '"':
+            pos = _scan_string(text, match.end())
+            continue
+        elif value == "{":
+            depth += 1
+        else:
+            depth -= 1
+            if depth == 0:
+                return match.end()
+
+        pos = match.end()
+
+
+def tokenize(text: str):
+    """
+    Split Terraform code into tokens in a single pass.
+
+    Args:
+        text: The code.
+
+    Yields:
+        Token tuples of (type, value, start, end), where the type is one of 'comment',
+        'string', 'heredoc', 'identifier', 'word', 'newline', or 'punctuation'.
+        Whitespace is skipped.
+    """
+    length = len(text)
+    pos = 0
+
+    while pos < length:
+        for match in TOKEN_PATTERN.finditer(text, pos):
+            type = match.lastgroup
+
+            if type is None:
+                # Only whitespace was left
+                return
+            elif type != "other":
+                yield Token(type, match.group(type), match.start(type), match.end())
+                continue
+
+            start = match.start(type)
+            char = text[start]
+            heredoc = HEREDOC_PATTERN.match(text, start) if char == "<" else None
+
+            if char == '"':
+                # Strings with interpolated expressions
+                type, pos = "string", _scan_string(text, start + 1)
+            elif heredoc:
+                closer = re.compile(
+                    rf"^[ \t]*{re.escape(heredoc.group(1))}[ \t]*\r?$", re.MULTILINE
+                )
+                closing = closer.search(text, heredoc.end())
+                type, pos = "heredoc", closing.end() if closing else length
+            elif text.startswith("/*", start):
+                # Unterminated block comments run to the end of the text
+                type, pos = "comment", length
+            else:
+                yield Token("punctuation", match.group(type), start, match.end())
+                continue
+
+            # Matching continues after the token that was scanned separately
+            yield Token(type, text[start:pos], start, pos)
+            break
+        else:
+            return
+
+
+class _Parser:
+    """
+    Recursive descent over the tokens of a configuration. Anything that is not a block or
+    an attribute is skipped up to the end of its line.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.tokens = list(tokenize(text))
+        self.pos = 0
+
+    def _peek(self, offset: int = 0):
+        index = self.pos + offset
+        return self.tokens[index] if index < len(self.tokens) else None
+
+    def _is_full_line(self, token) -> bool:
+        line_start = self.text.rfind("\n", 0, token.start) + 1
+        return not self.text[line_start:token.start].strip()
+
+    def _skip_statement(self) -> int:
+        """
+        Skip to the end of the current line, or the end of the enclosing block for blocks on
+        a single line, and return the offset after the last token that is not a comment.
+        """
+        nesting = 0
+        end = self.tokens[self.pos - 1].end if self.pos else 0
+
+        while self.pos < len(self.tokens):
+            token = self.tokens[self.pos]
+
+            if token.type == "newline" and nesting == 0:
+                break
+            if token.type == "punctuation":
+                if token.value in OPENING_BRACKETS:
+                    nesting += 1
+                elif token.value in CLOSING_BRACKETS:
+                    if nesting == 0:
+                        break
+                    nesting -= 1
+
+            if token.type != "comment":
+                end = token.end
+            self.pos += 1
+
+        return end
+
+    def parse_body(self, block: Block = None) -> list:
+        """
+        Parse blocks and attributes up to the closing brace of `block`, or the end of the text.
+
+        Returns:
+            The blocks in the body.
+        """
+        blocks = []
+        comment_start = None
+        previous = None
+
+        while self.pos < len(self.tokens):
+            token = self.tokens[self.pos]
+
+            if token.type == "newline":
+                # A blank line separates comments from the next block
+                if previous is None or previous.type == "newline":
+                    comment_start = None
+                previous = token
+                self.pos += 1
+                continue
+
+            if token.type == "comment":
+                if comment_start is None and self._is_full_line(token):
+                    comment_start = self.text.rfind("\n", 0, token.start) + 1
+                previous = token
+                self.pos += 1
+                continue
+
+            if token.type == "punctuation" and token.value == "}" and block is not None:
+                self.pos += 1
+                block.end = token.end
+                return blocks
+
+            start, comment_start = comment_start, None
+            previous = token
+
+            if token.type == "identifier":
+                next_token = self._peek(1)
+
+                if next_token and next_token.type == "punctuation" and next_token.value == "=":
+                    self.pos += 2
+                    value_start = self._peek().start if self._peek() else next_token.end
+                    end = self._skip_statement()
+                    if block is not None:
+                        block.attributes.append(
+                            Attribute(
+                                name=token.value,
+                                value=self.text[value_start:end].strip(),
+                                start=token.start,
+                                end=end,
+                            )
+                        )
+                    continue
+
+                child = self._parse_block(token, start)
+                if child is not None:
+                    blocks.append(child)
+                    continue
+
+            self.pos += 1
+            self._skip_statement()
+
+        return blocks
+
+    def _parse_block(self, token, start):
+        """
+        Parse a block header and body starting at `token`, or return None if the tokens do
+        not form a block header.
+        """
+        labels = []
+        index = self.pos + 1
+
+        while index < len(self.tokens):
+            label = self.tokens[index]
+
+            if label.type == "string" and label.value.endswith('"') and len(label.value) > 1:
+                labels.append(label.value[1:-1])
+            elif label.type == "identifier":
+                labels.append(label.value)
+            elif label.type == "punctuation" and label.value == "{":
+                break
+            else:
+                return None
+            index += 1
+        else:
+            return None
+
+        block = Block(
+            type=token.value,
+            labels=labels,
+            start=token.start if start is None else start,
+            header_start=token.start,
+            body_start=self.tokens[index].end,
+            end=len(self.text),
+        )
+        self.pos = index + 1
+        block.blocks = self.parse_body(block)
+        block.code = self.text[block.start:block.end]
+
+        return block
+
+
+def scan_blocks(text: str) -> list:
+    """
+    Find the top-level blocks of Terraform code in one linear pass.
+
+    Args:
+        text: The code.
+
+    Returns:
+        A list of Block objects in the order of the text. Nested blocks and the attributes
+        of each block are available through `blocks` and `attributes`.
+    """
+    return _Parser(text).parse_body()
+
+
+def find_block(blocks: list, type: str, labels: list):
+    """
+    Find the first block with a type and labels, or None if there is no such block.
+    """
+    for block in blocks:
+        if block.type == type and block.labels == list(labels):
+            return block
+
+    return None
+
+
+def iter_attributes(block: Block, block_hierarchy: list = None):
+    """
+    Yield (block_hierarchy, attribute) for every attribute of a block and its nested blocks.
+
+    The hierarchy lists the types of the nested blocks the attribute is in, without the
+    block itself.
+    """
+    block_hierarchy = block_hierarchy or []
+
+    for attribute in block.attributes:
+        yield block_hierarchy, attribute
+
+    for child in block.blocks:
+        yield from iter_attributes(child, block_hierarchy + [child.type])
+
+
+def remove_blocks(text: str, blocks: list) -> str:
+    """
+    Remove blocks, together with their leading comments and trailing blank lines, from the
+    text they were scanned from.
+    """
+    parts = []
+    pos = 0
+
+    for block in sorted(blocks, key=lambda block: block.start):
+        end = block.end
+        while end < len(text) and text[end] in " \t\r\n":
+            end += 1
+
+        parts.append(text[pos:block.start])
+        pos = end
+
+    parts.append(text[pos:])
+    return "".join(parts)
+
+
+def strip_comments(text: str) -> str:
+    """
+    Replace the comments in Terraform code with spaces, keeping the offsets of everything else.
+    """
+    parts = []
+    pos = 0
+
+    for token in tokenize(text):
+        if token.type == "comment":
+            parts.append(text[pos:token.start])
+            parts.append(re.sub(r"[^\n]", " ", token.value))
+            pos = token.end
+
+    parts.append(text[pos:])
+    return "".join(parts)
+
+
+def find_variable_references(text: str) -> set:
+    """
+    Find the names of all variables referenced outside of comments, including references
+    in interpolated strings.
+    """
+    return set(VARIABLE_REFERENCE_PATTERN.findall(strip_comments(text)))
+
+
+def canonical_hash(text: str) -> str:
+    """
+    Hash Terraform code in a way that ignores its formatting.
+
+    The hash covers the tokens of the code, so the whitespace between tokens, blank lines,
+    and trailing whitespace in comments do not change it. Code that only differs in the
+    alignment added by `terraform fmt` has the same hash.
+
+    Args:
+        text: The code.
+
+    Returns:
+        The hexadecimal SHA-256 digest.
+    """
+    digest = hashlib.sha256()
+    newline = True
+
+    for token in tokenize(text):
+        if token.type == "newline":
+            # Runs of newlines count as one, and newlines at the start are dropped
+            if newline:
+                continue
+            newline = True
+        else:
+            newline = False
+
+        value = token.value.rstrip() if token.type == "comment" else token.value
+        digest.update(f"{token.type}\0{value}\0".encode("utf-8"))
+
+    # A trailing newline is not part of the code
+    if not newline:
+        digest.update(b"newline\0\n\0")
+
+    return digest.hexdigest()
@@ -1,16 +1,36 @@
 import os
 import re
 import json
+import time
+import random
+import shutil
 import requests
+import threading
 import subprocess
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import lru_cache
+from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
 from requests.exceptions import RequestException
 from bs4 import BeautifulSoup, NavigableString
 from typing import List, Tuple, Optional
 import difflib
+import fnmatch
+import hashlib
 import yaml
 
 from .constants import *
 from .formatting import *
+from .lockfile import get_provider_requirements
+from .hcl import (
+    canonical_hash,
+    find_block,
+    find_variable_references,
+    iter_attributes,
+    remove_blocks,
+    scan_blocks,
+)
 
 # File and folder manipulation functions.
 
@@ -153,6 +173,196 @@ def convert_strings_to_dict(text: str, delimiter: str = "=") -> dict:
     return dictionary
 
 
+# HTTP functions.
+
+# Status codes that are worth retrying
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class HttpClient:
+    """
+    HTTP client shared by everything in terraflow that talks to the network.
+
+    Requests go through one pooled session so connections are reused. Failed requests are
+    retried with exponential backoff and jitter, or after the Retry-After delay, up to
+    `max_backoff` seconds. The number of concurrent requests to each host is limited.
+    Responses with an ETag or Last-Modified header are stored on disk, so repeated
+    requests are revalidated with a conditional request and a 304 response is served from
+    the cache.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str = HTTP_CACHE_DIR,
+        retries: int = 3,
+        backoff: float = 0.5,
+        max_backoff: float = 30,
+        max_per_host: int = 8,
+        timeout: int = 30,
+    ):
+        self.cache_dir = cache_dir
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_per_host = max_per_host
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=max_per_host)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._lock = threading.Lock()
+        self._semaphores = {}
+
+    def _get_semaphore(self, url: str) -> threading.Semaphore:
+        host = urlparse(url).netloc
+
+        with self._lock:
+            if host not in self._semaphores:
+                self._semaphores[host] = threading.Semaphore(self.max_per_host)
+
+            return self._semaphores[host]
+
+    def _get_cache_path(self, url: str) -> str:
+        digest = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, digest[:2], digest)
+
+    def _read_cache(self, url: str) -> Optional[tuple]:
+        """
+        Read the stored metadata and body of a response, or None if it is not cached.
+        """
+        path = self._get_cache_path(url)
+
+        try:
+            with open(f"{path}.json", "r") as f:
+                metadata = json.load(f)
+            with open(f"{path}.body", "rb") as f:
+                body = f.read()
+        except (OSError, ValueError):
+            return None
+
+        return metadata, body
+
+    def _write_cache(self, url: str, response: requests.Response) -> None:
+        """
+        Store a response that can be revalidated. Failures to write are ignored.
+        """
+        path = self._get_cache_path(url)
+        metadata = {
+            "url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "content_type": response.headers.get("Content-Type"),
+            "encoding": response.encoding,
+        }
+
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+            # The body is written first so the metadata never points at a missing body
+            write_file_atomically(f"{path}.body", response.content)
+            write_file_atomically(f"{path}.json", json.dumps(metadata))
+        except OSError:
+            pass
+
+    def _get_delay(self, attempt: int, response: requests.Response = None) -> float:
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), self.max_backoff)
+
+        return min(
+            self.backoff * (2 ** attempt) + random.uniform(0, self.backoff), self.max_backoff
+        )
+
+    def get(
+        self,
+        url: str,
+        params: dict = None,
+        headers: dict = None,
+        cache: bool = True,
+        timeout: int = None,
+    ) -> requests.Response:
+        """
+        Send a GET request.
+
+        Args:
+            url: The URL to request.
+            params: Optional; query string parameters.
+            headers: Optional; additional request headers.
+            cache: Optional; whether to revalidate and store the response in the on-disk cache.
+            timeout: Optional; the timeout in seconds. Defaults to the client timeout.
+
+        Returns:
+            The response. Responses revalidated with a 304 are returned with status 200 and
+            the cached body.
+
+        Raises:
+            RequestException: If the request failed after all retries.
+        """
+        url = requests.Request("GET", url, params=params).prepare().url
+        headers = dict(headers) if headers else {}
+        cached = self._read_cache(url) if cache else None
+
+        if cached:
+            metadata, _ = cached
+            if metadata.get("etag"):
+                headers["If-None-Match"] = metadata["etag"]
+            if metadata.get("last_modified"):
+                headers["If-Modified-Since"] = metadata["last_modified"]
+
+        for attempt in range(self.retries + 1):
+            delay = None
+
+            with self._get_semaphore(url):
+                try:
+                    response = self.session.get(
+                        url,
+                        headers=headers,
+                        allow_redirects=True,
+                        timeout=timeout if timeout else self.timeout,
+                    )
+                except (requests.ConnectionError, requests.Timeout):
+                    if attempt == self.retries:
+                        raise
+                    delay = self._get_delay(attempt)
+                else:
+                    if response.status_code in RETRY_STATUS_CODES and attempt < self.retries:
+                        delay = self._get_delay(attempt, response)
+
+            if delay is None:
+                break
+
+            # The slot for the host is released while waiting, so a long Retry-After does
+            # not hold up other requests to the same host
+            time.sleep(delay)
+
+        if cached and response.status_code == 304:
+            metadata, body = cached
+            response.status_code = 200
+            response._content = body
+            response.encoding = metadata.get("encoding")
+            if metadata.get("content_type"):
+                response.headers["Content-Type"] = metadata["content_type"]
+        elif (
+            cache
+            and response.status_code == 200
+            and ("ETag" in response.headers or "Last-Modified" in response.headers)
+        ):
+            self._write_cache(url, response)
+
+        return response
+
+
+@lru_cache(maxsize=None)
+def get_http_client() -> HttpClient:
+    """
+    Return the HttpClient shared by the whole process.
+    """
+    return HttpClient()
+
+
 # def scrape_website(url: str, tag: str = None, selector: str = None, list_output: bool = False) -> str:
 #     """
 #     Scrape content from a URL. If a tag or selector is specified, only content within that tag or selector is scraped.
@@ -222,7 +432,7 @@ def scrape_website(
     }
 
     try:
-        response = requests.get(url, headers=headers, allow_redirects=True, timeout=10)
+        response = get_http_client().get(url, headers=headers, timeout=10)
         response.raise_for_status()  # If the response contains an HTTP error status code, raise an exception
     except RequestException as e:
         print(f"Failed to get the webpage. Error: {e}")
@@ -335,113 +545,305 @@ def write_json_file(filename: str, data: dict) -> None:
         json.dump(data, f)
 
 
-def read_files(file_extensions: list = [".tf"]) -> str:
+def _read_ignore_rules(directory: str) -> list:
+    """
+    Read the patterns of the ignore files in a directory.
+
+    The patterns follow the common subset of the .gitignore syntax: a trailing slash only
+    matches directories, patterns with a slash in them are matched against the path from
+    the directory, and other patterns against the file name. Negated patterns are not
+    supported and are skipped.
+
+    Returns:
+        A list of (directory, pattern, directory_only, anchored) tuples.
+    """
+    rules = []
+
+    for ignore_file in IGNORE_FILES:
+        try:
+            with open(os.path.join(directory, ignore_file), "r") as f:
+                lines = f.read().splitlines()
+        except OSError:
+            continue
+
+        for line in lines:
+            pattern = line.strip()
+
+            if not pattern or pattern.startswith(("#", "!")):
+                continue
+
+            directory_only = pattern.endswith("/")
+            pattern = pattern.rstrip("/")
+            anchored = "/" in pattern
+            rules.append((directory, pattern.lstrip("/"), directory_only, anchored))
+
+    return rules
+
+
+def _is_ignored(path: str, is_directory: bool, rules: list) -> bool:
+    for directory, pattern, directory_only, anchored in rules:
+        if directory_only and not is_directory:
+            continue
+
+        relative_path = os.path.relpath(path, directory).replace(os.sep, "/")
+        name = relative_path if anchored else os.path.basename(path)
+
+        if fnmatch.fnmatchcase(name, pattern):
+            return True
+
+    return False
+
+
+def find_terraform_files(
+    file_extensions: list = [".tf"], recursive: bool = False, root: str = "."
+) -> list:
+    """
+    Find the files with the provided extensions in a directory.
+
+    In recursive mode the subdirectories are searched as well, skipping .terraform and
+    other SKIPPED_DIRECTORIES, and any path matched by a .terraflowignore or .gitignore
+    file in the directory or one of its parents up to the root.
+
+    Args:
+        file_extensions (List[str], optional): List of file extensions to include. Defaults to ['.tf'].
+        recursive (bool, optional): Search the subdirectories. Defaults to False.
+        root (str, optional): The directory to search. Defaults to the current directory.
+
+    Returns:
+        List[str]: The sorted paths of the files relative to the root.
+    """
+    if not recursive:
+        return sorted(
+            file_name
+            for file_name in os.listdir(root)
+            if any(file_name.endswith(extension) for extension in file_extensions)
+            and os.path.isfile(os.path.join(root, file_name))
+        )
+
+    files = []
+    inherited_rules = {root: []}
+
+    for directory, dirs, file_names in os.walk(root):
+        rules = inherited_rules.pop(directory) + _read_ignore_rules(directory)
+
+        dirs[:] = sorted(
+            d
+            for d in dirs
+            if d not in SKIPPED_DIRECTORIES
+            and not _is_ignored(os.path.join(directory, d), True, rules)
+        )
+        for d in dirs:
+            inherited_rules[os.path.join(directory, d)] = rules
+
+        for file_name in file_names:
+            path = os.path.join(directory, file_name)
+
+            if any(
+                file_name.endswith(extension) for extension in file_extensions
+            ) and not _is_ignored(path, False, rules):
+                files.append(os.path.relpath(path, root))
+
+    return sorted(files)
+
+
+def get_module_path(filename: str) -> str:
+    """
+    Get the path of the module a file belongs to, using forward slashes. The root module is '.'.
+    """
+    return os.path.dirname(filename).replace(os.sep, "/") or "."
+
+
+def read_files(file_extensions: list = [".tf"], recursive: bool = False) -> str:
     """
     Loop through all files with the provided extensions in the current directory and return a single string with all code.
 
     Args:
         file_extensions (List[str], optional): List of file extensions to include. Defaults to ['.tf'].
+        recursive (bool, optional): Include the files of nested modules. Defaults to False.
 
     Returns:
         str: A string containing the contents of the files.
     """
     content = ""
-    for file_name in os.listdir(os.getcwd()):
-        if any(file_name.endswith(extension) for extension in file_extensions):
-            with open(file_name, "r") as file:
-                content += file.read() + "\n"
+    for file_name in find_terraform_files(file_extensions, recursive=recursive):
+        with open(file_name, "r") as file:
+            content += file.read() + "\n"
 
     return content
 
 
-def write_terraform_to_file(
-    filename: str, new_code: str
-):  # , provider=None, resource=None):
+@contextmanager
+def atomic_write(filename: str, mode: str = "w"):
     """
-    Write a Terraform provider, resource, data source, variable, or output block to a file based on a regex pattern.
+    Open a file to be written under a temporary name in the same directory. The file is
+    moved into place when the block exits, so readers never see a partially written file,
+    and removed if the block raises. The permissions of an existing file are kept.
+
+    Args:
+        filename: The name of the file to write.
+        mode: The mode the temporary file is opened with, "w" or "wb".
+
+    Yields:
+        The open temporary file.
+    """
+    staging_filename = os.path.join(
+        os.path.dirname(filename),
+        f".{os.path.basename(filename)}.tmp-{os.getpid()}-{threading.get_ident()}",
+    )
+
+    try:
+        with open(staging_filename, mode) as f:
+            yield f
+        if os.path.exists(filename):
+            shutil.copymode(filename, staging_filename)
+        os.replace(staging_filename, filename)
+    except BaseException:
+        if os.path.exists(staging_filename):
+            os.remove(staging_filename)
+        raise
+
+
+def write_file_atomically(filename: str, content) -> None:
+    """
+    Write a file with `atomic_write`.
+
+    Args:
+        filename: The name of the file to write.
+        content: The text or bytes to be written.
+    """
+    with atomic_write(filename, "wb" if isinstance(content, bytes) else "w") as f:
+        f.write(content)
+
+
+def write_terraform_to_file(filename: str, new_code: str) -> bool:
+    """
+    Write Terraform provider, resource, data source, variable, or output blocks to a file, replacing the blocks with the same type and labels.
+
+    The existing blocks are located by their offsets in the file and only their code is
+    replaced, so everything else in the file, such as comments and blocks without labels,
+    is kept as it is. Blocks without labels match by type if there can only be one of
+    them, such as the terraform block, and by their code otherwise. Blocks that are not in
+    the file yet are appended. The file is replaced atomically.
+
+    Blocks whose code only differs in formatting from the code in the file are left as
+    they are, and the file is not written at all if nothing changed, so its modification
+    time stays the same.
 
     Args:
         filename (str): The name of the file where the Terraform block will be written.
         new_code (str): The new Terraform code to be written to the file.
+
+    Returns:
+        bool: Whether the file was written.
     """
     # Try to read the existing contents of the file
     try:
-        with open(filename, "r+") as f:
+        with open(filename, "r") as f:
             contents = f.read()
     except FileNotFoundError:
         contents = ""
 
-    # If the file isn't empty and doesn't end with a newline, append a newline
-    if contents and not contents.endswith("\n"):
-        contents += "\n\n"
+    # Index the existing blocks by id. Other blocks without labels, such as locals, can
+    # appear more than once and are only appended if the same block, not counting the
+    # comments above it, is not in the file yet.
+    old_blocks = {}
+    old_unlabeled_hashes = set()
+    for block in scan_blocks(contents):
+        if block.labels or block.type in SINGLETON_BLOCK_TYPES:
+            old_blocks.setdefault(block.id, block)
+        else:
+            old_unlabeled_hashes.add(canonical_hash(contents[block.header_start:block.end]))
 
-    # Define regex pattern that can be used to collect all objects, regardless of type
-    pattern = r'((?:#.*\n)*?(^(.*?)\s+(?:"(.*?)"\s+)?\s?"(.*?)"\s+{)[\s\S]*?^}$)'
+    # A block that appears more than once in the new code is written once, with its last code
+    new_blocks = {}
+    for block in scan_blocks(new_code):
+        if block.labels or block.type in SINGLETON_BLOCK_TYPES:
+            new_blocks[block.id] = block
+        else:
+            new_blocks[(block.id, block.start)] = block
 
-    # Split new_code into blocks
-    old_code_blocks = re.findall(pattern, contents, flags=re.MULTILINE)
-    new_code_blocks = re.findall(pattern, new_code, flags=re.MULTILINE)
+    replacements = []
+    appended = []
+    for key, block in new_blocks.items():
+        if key in old_blocks:
+            if canonical_hash(block.code) != canonical_hash(old_blocks[key].code):
+                replacements.append((old_blocks[key], block.code))
+        elif (
+            block.labels
+            or block.type in SINGLETON_BLOCK_TYPES
+            or canonical_hash(new_code[block.header_start:block.end]) not in old_unlabeled_hashes
+        ):
+            appended.append(block.code)
 
-    # Construct dictionaries for old and new blocks using block type and name as keys
-    old_blocks_dict = {
-        block_id: code
-        for code, block_id, block_type, resource_type, name in old_code_blocks
-    }
-    new_blocks_dict = {
-        block_id: code
-        for code, block_id, block_type, resource_type, name in new_code_blocks
-    }
+    if not replacements and not appended:
+        return False
 
-    # Merge old and new blocks dictionaries
-    merged_blocks_dict = {**old_blocks_dict, **new_blocks_dict}
+    # Splice the replaced blocks into the existing contents in the order of the file
+    parts = []
+    pos = 0
+    for block, code in sorted(replacements, key=lambda replacement: replacement[0].start):
+        parts += [contents[pos:block.start], code]
+        pos = block.end
+    parts.append(contents[pos:])
+    merged_code = "".join(parts)
 
-    # Construct the final contents by joining all the blocks in merged_blocks_dict
-    merged_code = "\n\n".join(block for block in merged_blocks_dict.values())
+    if appended:
+        merged_code = "\n\n".join(
+            ([merged_code.rstrip()] if merged_code.strip() else []) + appended
+        ) + "\n"
 
-    # Write the new contents back to the file
-    with open(filename, "w+") as f:
-        f.write(merged_code.strip())
+    write_file_atomically(filename, merged_code)
 
-    return merged_code
+    return True
 
 
-def remove_unused_variables():
+def remove_unused_variables(recursive: bool = False):
     """
     This function collects all code, collects all variables, determines which ones to delete, and deletes them.
+
+    Args:
+        recursive (bool, optional): Also clean up nested modules. The variables of each
+            module are only checked against the references in the same module. Defaults to False.
+
+    Returns:
+        List[Tuple[str, str]]: The file name and name of each variable that was removed.
     """
-    # Get the current code from Terraform files in the current working directory
-    file_extensions = [".tf"]
-    code = read_files(file_extensions)
+    removed = []
+    modules = {}
+    for file_name in find_terraform_files([".tf"], recursive=recursive):
+        modules.setdefault(get_module_path(file_name), []).append(file_name)
 
-    # Collect all variables from the configuration
-    pattern = r".*?\s+=\s+var.(.*?)(?:\s|#)"
-    variables_list = re.findall(pattern, code, re.MULTILINE)
+    for file_names in modules.values():
+        contents = {}
+        for file_name in file_names:
+            with open(file_name, "r") as file:
+                contents[file_name] = file.read()
+
+        # Collect all variables referenced outside of the variable declarations
+        blocks = {file_name: scan_blocks(content) for file_name, content in contents.items()}
+        variables_list = set()
+        for file_name, content in contents.items():
+            variables_list |= find_variable_references(
+                remove_blocks(
+                    content,
+                    [block for block in blocks[file_name] if block.type == "variable"],
+                )
+            )
 
-    # Establish a pattern for collecting all variable declarations
-    pattern = r'((?:#.*\n)*?^variable\s+(?:".*?"\s+)?\s?"(.*?)"\s+{[\s\S]*?^}$)'
-    variable_declarations = re.findall(pattern, code, re.MULTILINE)
-    variable_declarations_dict = {
-        variable: code for code, variable in variable_declarations
-    }
+        # Remove the declarations of unused variables from each file
+        for file_name, content in contents.items():
+            unused_variables = [
+                block
+                for block in blocks[file_name]
+                if block.type == "variable" and block.name not in variables_list
+            ]
 
-    # Create a list of items that are in variable_declarations_dict that are not in variables_list
-    unused_variables = [
-        var for var in variable_declarations_dict.keys() if var not in variables_list
-    ]
+            if unused_variables:
+                with open(file_name, "w") as file:
+                    file.write(remove_blocks(content, unused_variables))
+                removed += [(file_name, block.name) for block in unused_variables]
 
-    # Now we'll write the modified code back into the Terraform files
-    for file_name in os.listdir(os.getcwd()):
-        if any(file_name.endswith(extension) for extension in file_extensions):
-            with open(file_name, "r") as file:
-                file_content = file.read()
-            for var in unused_variables:
-                # replace the unused variables in each file's content
-                file_content = file_content.replace(variable_declarations_dict[var], "")
-            # Now remove all excessive newlines, but keep one newline between items
-            file_content = re.sub("\n{2,}", "\n\n", file_content)
-            # Now write the modified content back into the file
-            with open(file_name, "w") as file:
-                file.write(file_content)
+    return removed
 
 
 # remove_unused_variables()
@@ -451,14 +853,10 @@ def load_terraform_code(type: str, name: str, code: str, kind: str = None):
     """
     Extracts code snippet of the relevant Terraform object from the code.
     """
-    if kind is None:
-        pattern = rf'((?:#.*\n)*?(^({type})\s+\s?"({name})"\s+{{)[\s\S]*?^}}$)'
-    else:
-        pattern = rf'((?:#.*\n)*?(^({type})\s+(?:"({kind})"\s+)?\s?"({name})"\s+{{)[\s\S]*?^}}$)'
+    block = find_block(scan_blocks(code), type, [name] if kind is None else [kind, name])
 
-    matches = re.findall(pattern, code, re.MULTILINE)
-    if matches:
-        return matches[0][0] + "\n"
+    if block:
+        return block.code + "\n"
     else:
         message = (
             f'\n{colors("OK_BLUE")}Info:{colors()} The {type} {name} was not found'
@@ -714,69 +1112,300 @@ def get_component_attributes_list(documentation_text):
 # print(attributes)
 
 
+# An attribute description line such as "`name` - (Required) The name of the resource."
+ATTRIBUTE_DESCRIPTION_PATTERN = re.compile(r"`([^`\n]+)`\s+-\s+(\(.*?\))?\s*(.*)")
+ATTRIBUTE_LINE_PATTERN = re.compile(r"^`", re.MULTILINE)
+SECTION_HEADER_PATTERN = re.compile(r"^#+\s*(.*?)\s*$", re.MULTILINE)
+
+
+def build_attribute_description_index(documentation_text: str) -> dict:
+    """
+    Parse the attribute descriptions of a documentation page in a single pass.
+
+    Args:
+        documentation_text: The documentation text.
+
+    Returns:
+        A dictionary mapping each attribute name to a list of (section, description)
+        tuples in the order they appear, where the section is the closest header above
+        the description.
+    """
+    index = {}
+    # End of the previous description of each attribute. A description can run onto the
+    # next line, which then does not count as another description of the same attribute.
+    ends = {}
+
+    if not documentation_text:
+        return index
+
+    sections = [
+        (match.start(), match.group(1))
+        for match in SECTION_HEADER_PATTERN.finditer(documentation_text)
+    ]
+    section = None
+    section_position = 0
+
+    for line in ATTRIBUTE_LINE_PATTERN.finditer(documentation_text):
+        match = ATTRIBUTE_DESCRIPTION_PATTERN.match(documentation_text, line.start())
+        if not match or match.start() < ends.get(match.group(1), 0):
+            continue
+        ends[match.group(1)] = match.end()
+
+        while (
+            section_position < len(sections)
+            and sections[section_position][0] < match.start()
+        ):
+            section = sections[section_position][1]
+            section_position += 1
+
+        index.setdefault(match.group(1), []).append((section, match.group(3)))
+
+    return index
+
+
 def get_resource_attribute_description(
-    documentation_text, attribute, block_hierarchy=None
+    documentation_text, attribute, block_hierarchy=None, description_index=None
 ):
-    # Extract the attribute descriptions from the text
-    pattern = rf"^`({attribute})`\s+-\s+(\(.*?\))?\s*(.*)"
-    attribute_matches = re.findall(
-        pattern=pattern, string=documentation_text, flags=re.MULTILINE
-    )
-    attribute_matches = [str(x[2]) for x in attribute_matches]
-
-    # if there is more than one match on an attribute name
-    if len(attribute_matches) > 1:
-        # Check is there is a list of blocks
-        if block_hierarchy:
-            # Then for each match rank them based on a normalized distance algorithm
-            levenshtein_distances = []
-            for match in attribute_matches:
-                normalized_block_text = " ".join(block_hierarchy).replace("_", " ")
-                # Calculate the normalized distance
-                normalized_distance = calculate_levenshtein_distance(
-                    match, normalized_block_text
-                )
-                current_block = block_hierarchy[-1]
-                # If the current block name is in the match
-                if current_block in match:
-                    # Add a multiplier if the exact block name is in the string
-                    normalized_distance = normalized_distance - 0.1
-                else:
-                    # For each key word in the block list
-                    for keyword in block_hierarchy:
-                        # Go through each word in the description text
-                        for word in match.split(" "):
-                            # Calculate a similarity score
-                            similarity_score = difflib.SequenceMatcher(
-                                None, keyword.lower().replace("_", " "), word.lower()
-                            ).ratio()
-                            # And if that score is below a threshold, add another multiplier
-                            if similarity_score > 0.8:
-                                # print(f'{keyword} -> {word} = score: {similarity_score}')
-                                normalized_distance = normalized_distance - 0.1
-                        # elif word
-                # Create a list of scores
-                levenshtein_distances.append(normalized_distance)
-
-            # Sort and get the lowest scoring description
-            levenshtein_distances, descriptions = zip(
-                *sorted(zip(levenshtein_distances, attribute_matches))
-            )
+    # Extract the attribute descriptions from the text, unless the text was already indexed
+    if description_index is None:
+        description_index = build_attribute_description_index(documentation_text)
 
-            # Select the description with the lowest distance
-            description = descriptions[0]
+    attribute_matches = [
+        description for _, description in description_index.get(attribute, [])
+    ]
 
-            # print(levenshtein_distances)
-            # print(descriptions)
-        else:
-            # Take the first item found
-            description = attribute_matches[0]
-    elif len(attribute_matches) == 1:
-        description = attribute_matches[0]
-    else:
-        description = ""
+    return select_attribute_description(attribute_matches, block_hierarchy)
 
-    return description
+
+def calculate_edit_distance(s: str, t: str) -> int:
+    """
+    Calculate the Levenshtein distance between two strings with a bit-parallel algorithm.
+
+    Each column of the edit distance matrix is encoded as bit vectors, so a string is
+    processed one character at a time instead of one matrix cell at a time (Myers, 1999).
+
+    Args:
+        s: The first string.
+        t: The second string.
+
+    Returns:
+        The number of insertions, deletions, and substitutions needed to turn s into t.
+    """
+    # Use the shorter string as the pattern to keep the bit vectors small
+    if len(s) < len(t):
+        s, t = t, s
+
+    if not t:
+        return len(s)
+
+    # Bit masks of the positions of each character in the pattern
+    peq = {}
+    for i, char in enumerate(t):
+        peq[char] = peq.get(char, 0) | (1 << i)
+
+    mask = (1 << len(t)) - 1
+    last = 1 << (len(t) - 1)
+    pv = mask
+    mv = 0
+    distance = len(t)
+
+    for char in s:
+        eq = peq.get(char, 0)
+        xv = eq | mv
+        xh = ((((eq & pv) + pv) & mask) ^ pv) | eq
+        ph = mv | (~(xh | pv) & mask)
+        mh = pv & xh
+
+        if ph & last:
+            distance += 1
+        elif mh & last:
+            distance -= 1
+
+        ph = ((ph << 1) | 1) & mask
+        mh = (mh << 1) & mask
+        pv = mh | (~(xv | ph) & mask)
+        mv = ph & xv
+
+    return distance
+
+
+def calculate_normalized_edit_distance(s: str, t: str) -> float:
+    """
+    Calculate the normalized Levenshtein distance between two strings.
+
+    Returns the same value as calculate_levenshtein_distance, using the bit-parallel
+    calculate_edit_distance.
+    """
+    s = s.lower()
+    t = t.lower()
+    max_distance = max(len(s), len(t))
+
+    if max_distance == 0:
+        return 0.0
+
+    return calculate_edit_distance(s, t) / max_distance
+
+
+@lru_cache(maxsize=65536)
+def is_similar_word(keyword: str, word: str) -> bool:
+    """
+    Check whether a block keyword and a word of a description are similar.
+
+    Args:
+        keyword: The lower case keyword with underscores replaced by spaces.
+        word: The lower case word.
+
+    Returns:
+        True if the difflib similarity ratio is above 0.8.
+    """
+    matcher = difflib.SequenceMatcher(None, keyword, word)
+
+    # The quick ratios are upper bounds of the ratio and much cheaper to compute
+    if matcher.real_quick_ratio() <= 0.8 or matcher.quick_ratio() <= 0.8:
+        return False
+
+    return matcher.ratio() > 0.8
+
+
+def score_attribute_description(description: str, block_hierarchy: list, distances: dict = None) -> float:
+    """
+    Score how well a description matches the blocks an attribute is nested in. Lower is better.
+
+    Args:
+        description: The candidate description.
+        block_hierarchy: The names of the blocks the attribute is nested in.
+        distances: Optional; a dictionary used to reuse distances between calls.
+
+    Returns:
+        The score of the description.
+    """
+    normalized_block_text = " ".join(block_hierarchy).replace("_", " ")
+
+    if distances is None:
+        distances = {}
+
+    key = (description, normalized_block_text)
+    if key not in distances:
+        distances[key] = calculate_normalized_edit_distance(description, normalized_block_text)
+    normalized_distance = distances[key]
+
+    # If the current block name is in the description
+    if block_hierarchy[-1] in description:
+        # Add a multiplier if the exact block name is in the string
+        return normalized_distance - 0.1
+
+    words = [word.lower() for word in description.split(" ")]
+
+    # For each key word in the block list, go through each word in the description text
+    for keyword in block_hierarchy:
+        keyword = keyword.lower().replace("_", " ")
+
+        for word in words:
+            # And if the words are similar, add another multiplier
+            if is_similar_word(keyword, word):
+                normalized_distance = normalized_distance - 0.1
+
+    return normalized_distance
+
+
+def select_attribute_description(attribute_matches: list, block_hierarchy: list = None, distances: dict = None) -> str:
+    """
+    Select the description of an attribute from the descriptions found for its name.
+
+    Args:
+        attribute_matches: The descriptions found for the attribute name, in document order.
+        block_hierarchy: The names of the blocks the attribute is nested in.
+        distances: Optional; a dictionary used to reuse distances between calls.
+
+    Returns:
+        The description, or an empty string if there are no matches.
+    """
+    if not attribute_matches:
+        return ""
+
+    # If there is only one match, or nothing to rank the matches by, take the first one
+    if len(attribute_matches) == 1 or not block_hierarchy:
+        return attribute_matches[0]
+
+    # Rank the matches based on a normalized distance algorithm and take the lowest score
+    scores = [
+        score_attribute_description(match, block_hierarchy, distances)
+        for match in attribute_matches
+    ]
+
+    return min(zip(scores, attribute_matches))[1]
+
+
+# Descriptions selected by get_attribute_descriptions, keyed by resource and document hash.
+# Only the most recently used resources are kept, so scaffolding a whole provider does not
+# keep the descriptions of every resource in memory.
+ATTRIBUTE_DESCRIPTION_CACHE = OrderedDict()
+ATTRIBUTE_DESCRIPTION_CACHE_SIZE = 64
+_attribute_description_cache_lock = threading.Lock()
+
+
+def get_attribute_descriptions(
+    documentation_text: str,
+    attributes: list,
+    resource: str = None,
+    description_index: dict = None,
+) -> dict:
+    """
+    Select the descriptions of all attributes of a resource at once.
+
+    Distances between descriptions and block names are shared by every attribute, and the
+    results are memoized per resource and documentation hash for the most recently used
+    ATTRIBUTE_DESCRIPTION_CACHE_SIZE resources.
+
+    Args:
+        documentation_text: The documentation text.
+        attributes: A list of (attribute, block_hierarchy) tuples.
+        resource: Optional; a name for the resource used to memoize the results.
+        description_index: Optional; the index built by build_attribute_description_index.
+
+    Returns:
+        A dictionary mapping (attribute, tuple(block_hierarchy)) to the description.
+    """
+    cache_key = None
+    if resource is not None:
+        digest = hashlib.sha256((documentation_text or "").encode("utf-8")).hexdigest()
+        cache_key = (resource, digest)
+
+    descriptions = {}
+    if cache_key:
+        with _attribute_description_cache_lock:
+            if cache_key in ATTRIBUTE_DESCRIPTION_CACHE:
+                ATTRIBUTE_DESCRIPTION_CACHE.move_to_end(cache_key)
+                descriptions = ATTRIBUTE_DESCRIPTION_CACHE[cache_key]
+    missing = [
+        (attribute, tuple(block_hierarchy or []))
+        for attribute, block_hierarchy in attributes
+        if (attribute, tuple(block_hierarchy or [])) not in descriptions
+    ]
+
+    if missing:
+        if description_index is None:
+            description_index = build_attribute_description_index(documentation_text)
+
+        distances = {}
+        descriptions = dict(descriptions)
+
+        for attribute, block_hierarchy in missing:
+            attribute_matches = [
+                description for _, description in description_index.get(attribute, [])
+            ]
+            descriptions[(attribute, block_hierarchy)] = select_attribute_description(
+                attribute_matches, list(block_hierarchy), distances
+            )
+
+        if cache_key:
+            with _attribute_description_cache_lock:
+                ATTRIBUTE_DESCRIPTION_CACHE[cache_key] = descriptions
+                ATTRIBUTE_DESCRIPTION_CACHE.move_to_end(cache_key)
+                while len(ATTRIBUTE_DESCRIPTION_CACHE) > ATTRIBUTE_DESCRIPTION_CACHE_SIZE:
+                    ATTRIBUTE_DESCRIPTION_CACHE.popitem(last=False)
+
+    return descriptions
 
 
 # namespace = "hashicorp"
@@ -900,7 +1529,7 @@ def get_terraform_providers(namespace, limit=100, tier="official"):
     url = f"https://registry.terraform.io/v1/providers?namespace={namespace}&limit={limit}"
 
     # Send a GET request to the API
-    response = requests.get(url)
+    response = get_http_client().get(url)
 
     # Raise an exception if the request was unsuccessful
     response.raise_for_status()
@@ -955,42 +1584,41 @@ def list_items(
     return items
 
 
-def delete_provider_code(provider, filename="providers.tf"):
-    regex_pattern = rf'^provider\s+"{provider}"\s+{{[\s\S]*?^}}\n*'
+def delete_block_code(type, labels, filename):
+    """
+    Delete every block with a type and labels from a file, together with its leading comments.
 
+    Args:
+        type: The type of the block, for example 'resource'.
+        labels: The labels of the block, for example ['azurerm_resource_group', 'main'].
+        filename: The name of the file.
+    """
     with open(filename, "r") as f:
         string = f.read()
 
-    result = re.sub(pattern=regex_pattern, repl="", string=string, flags=re.MULTILINE)
+    blocks = [
+        block
+        for block in scan_blocks(string)
+        if block.type == type and block.labels == list(labels)
+    ]
+    result = remove_blocks(string, blocks)
 
     with open(filename, "w") as f:
         f.write(result)
 
 
-def delete_resource_code(provider, kind, name, filename="main.tf"):
-    kind = "_".join([provider, kind]) if not provider in kind else kind
-    regex_pattern = rf'(?:#.*\n)*?^resource\s+"{kind}"\s+"{name}"\s+{{[\s\S]*?^}}\n*'
-
-    with open(filename, "r") as f:
-        string = f.read()
+def delete_provider_code(provider, filename="providers.tf"):
+    delete_block_code("provider", [provider], filename)
 
-    result = re.sub(pattern=regex_pattern, repl="", string=string, flags=re.MULTILINE)
 
-    with open(filename, "w") as f:
-        f.write(result)
+def delete_resource_code(provider, kind, name, filename="main.tf"):
+    kind = "_".join([provider, kind]) if not provider in kind else kind
+    delete_block_code("resource", [kind, name], filename)
 
 
 def delete_data_source_code(provider, kind, name, filename="main.tf"):
     kind = "_".join([provider, kind]) if not provider in kind else kind
-    regex_pattern = rf'(?:#.*\n)*?^data\s+"{kind}"\s+"{name}"\s+{{[\s\S]*?^}}\n*'
-
-    with open(filename, "r") as f:
-        string = f.read()
-
-    result = re.sub(pattern=regex_pattern, repl="", string=string, flags=re.MULTILINE)
-
-    with open(filename, "w") as f:
-        f.write(result)
+    delete_block_code("data", [kind, name], filename)
 
 
 # def delete_variable_code(name, filename="variables.tf"):
@@ -1015,33 +1643,103 @@ def get_namespaces_and_providers():
         print("It appears you are not in a Terraform directory.")
         return None, None
 
-    # Run the `terraform providers` command
-    result = subprocess.run(["terraform", "providers"], capture_output=True, text=True)
-
-    # Check the return code
-    if result.returncode != 0:
-        print("Error running `terraform providers` command.")
-        return None, None
-
-    # Parse the command output
-    pattern = rf"provider\[registry\.terraform\.io/(.*?)/(.*?)\]\s?(\S+)?"
-    match = re.findall(pattern, result.stdout, re.MULTILINE)
-    if match:
+    # Read the providers from the lock file and required_providers blocks
+    requirements = get_provider_requirements()
+    if requirements:
         # Separate namespaces and providers and convert to sets to get unique values
-        namespaces = list(set(namespace for namespace, provider, version in match))
-        providers = list(set(provider for namespace, provider, version in match))
+        namespaces = list(set(requirement.namespace for requirement in requirements))
+        providers = list(set(requirement.provider for requirement in requirements))
 
         return namespaces, providers
 
+    return None, None
+
+
+def get_configuration_fingerprint(directory: str = ".") -> Optional[str]:
+    """
+    Create a fingerprint of the Terraform configuration in a directory.
+
+    The fingerprint covers the name, size, and modification time of every `*.tf` file
+    and of the provider lock file, so it changes whenever either of them is edited.
+
+    Args:
+        directory: The directory containing the Terraform configuration.
+
+    Returns:
+        The fingerprint as a hex string or None if the directory has no Terraform files.
+    """
+    filenames = sorted(
+        fname
+        for fname in os.listdir(directory)
+        if fname.endswith(".tf") or fname == LOCK_FILE
+    )
+
+    if not any(fname.endswith(".tf") for fname in filenames):
+        return None
+
+    digest = hashlib.sha256()
+    for fname in filenames:
+        stat = os.stat(os.path.join(directory, fname))
+        digest.update(f"{fname}:{stat.st_size}:{stat.st_mtime_ns}\n".encode("utf-8"))
+
+    return digest.hexdigest()
+
+
+def get_cached_namespaces_and_providers(filename: str = PROVIDERS_CACHE_FILE):
+    """
+    Get the namespaces and providers for the current configuration, using a cache.
+
+    The result of `get_namespaces_and_providers()` is stored together with the
+    configuration fingerprint, and reused for as long as the fingerprint matches.
+
+    Args:
+        filename: The name of the cache file.
+
+    Returns:
+        A tuple with the list of namespaces and the list of providers.
+    """
+    fingerprint = get_configuration_fingerprint()
+
+    if fingerprint is None:
+        return get_namespaces_and_providers()
+
+    if os.path.exists(filename):
+        try:
+            cache = read_json_file(filename)
+            if cache.get("fingerprint") == fingerprint:
+                return cache.get("namespaces"), cache.get("providers")
+        except (OSError, ValueError):
+            pass
+
+    namespaces, providers = get_namespaces_and_providers()
+
+    # Only cache successful lookups so a failed command is retried on the next run
+    if namespaces is not None:
+        try:
+            os.makedirs(os.path.dirname(filename), exist_ok=True)
+            write_json_file(
+                filename,
+                {
+                    "fingerprint": fingerprint,
+                    "namespaces": namespaces,
+                    "providers": providers,
+                },
+            )
+        except OSError:
+            pass
+
+    return namespaces, providers
+
 
 def get_provider_versions(namespace, provider):
     """
     Gets a list of versions for a given terraform provider such as aws, gcp, or azurerm.
     """
-    response = requests.get(
+    response = get_http_client().get(
         f"https://registry.terraform.io/v1/providers/{namespace}/{provider}/versions"
     )
-    data = json.loads(response.text)
+    response.raise_for_status()
+    data = response.json()
 
     return [x["version"] for x in data["versions"]]
 
@@ -1110,24 +1808,13 @@ def get_latest_version(versions, exclude_preleases=False):
 
 
 def get_provider_version(provider: str, namespace: str = "hashicorp") -> str:
-    # Run the `terraform providers` command
-    result = subprocess.run(["terraform", "providers"], capture_output=True, text=True)
-
-    # Check the return code
-    if result.returncode != 0:
-        print(
-            f'{colors("FAIL")}Error:{colors()} Cloud not run the terraform provider command.'
-        )
-        return None
-
-    # Parse the command output
-    pattern = rf"provider\[registry\.terraform\.io/hashicorp/azurerm\]\s?(\S+)?"
-    match = re.search(pattern, result.stdout)
-    version = match.group(1)
-
-    # If the provider version was found, return it
-    if version:
-        return version
+    # Read the providers from the lock file and required_providers blocks
+    for requirement in get_provider_requirements():
+        if requirement.namespace == namespace and requirement.provider == provider:
+            # If the provider version was found, return it
+            if requirement.version:
+                return requirement.version
+            break
 
     # Otherwise, try to get the latest version
     try:
@@ -1146,7 +1833,7 @@ def get_terraform_versions() -> list:
     Returns:
         A list of valid Terraform versions.
     """
-    response = requests.get("https://releases.hashicorp.com/terraform")
+    response = get_http_client().get("https://releases.hashicorp.com/terraform")
 
     pattern = r"terraform_((\d+)\.*(\d+)*\.*(\d+)*-?([\S]*))</a>"
     versions = re.findall(pattern, response.text)
@@ -1238,54 +1925,34 @@ def filter_blocks(
 
 
 def parse_variables(data):
-    # Regular expression patterns
-    type_pattern = r'((?:#.*\n)*?(^(.*?)\s+(?:"(.*?)"\s+)?\s?"(.*?)"\s+{)[\s\S]*?^}$)'
-    block_pattern = r"(.*?)\s*{"
-    attribute_pattern = r"\s*(.*?)\s*=\s*var.(.*?)$"
-
-    # Initialize containers
-    resource_info = {}
-    block_stack = []
-    output = []
-
-    # Search for types
-    type_matches = re.finditer(type_pattern, data, re.MULTILINE | re.DOTALL)
+    # Attributes that are set to a variable, such as `name = var.name`
+    attribute_pattern = re.compile(r"var\.(.*)")
 
-    for type_match in type_matches:
-        type_content = type_match.group(0)
+    output = []
 
+    for block in scan_blocks(data):
         resource_info = {
-            "type": type_match.group(3).strip(),
-            "provider": type_match.group(5).strip(),
-            "kind": type_match.group(4) if type_match.group(4) else "",
-            "resource_id": f'{type_match.group(3).strip()}{"." + type_match.group(4) if type_match.group(4) else ""}.{type_match.group(5).strip()}',
+            "type": block.type,
+            "provider": block.name,
+            "kind": block.kind if block.kind else "",
+            "resource_id": block.id,
         }
 
-        # Split the content by lines
-        lines = type_content.split("\n")
+        for block_hierarchy, attribute in iter_attributes(block):
+            attribute_match = attribute_pattern.fullmatch(attribute.value)
 
-        # Process lines
-        for line in lines:
-            block_match = re.search(block_pattern, line)
-            attribute_match = re.search(attribute_pattern, line, re.MULTILINE)
-            if block_match:  # This is a block
-                block_stack.append(block_match.group(1).strip())
-            elif attribute_match:  # This is an attribute
+            if attribute_match:
                 attribute_dict = {
-                    "attribute_id": ".".join(
-                        block_stack.copy()[1:] + [attribute_match.group(1)]
-                    ),
-                    "variable_id": ".".join(["variable", attribute_match.group(2)]),
-                    "block_hierarchy": block_stack.copy()[1:],
-                    "name": attribute_match.group(1),
-                    "value": attribute_match.group(2),
+                    "attribute_id": ".".join(block_hierarchy + [attribute.name]),
+                    "variable_id": ".".join(["variable", attribute_match.group(1)]),
+                    "block_hierarchy": block_hierarchy,
+                    "name": attribute.name,
+                    "value": attribute_match.group(1),
                 }
                 attribute_dict.update(
                     resource_info
                 )  # Add resource info to attribute dict
                 output.append(attribute_dict)
-            elif "}" in line and block_stack:  # The end of a block
-                block_stack.pop()
 
     # Return output
     return output
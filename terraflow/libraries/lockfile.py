@@ -0,0 +1,198 @@
+import os
+import re
+from typing import List, NamedTuple, Optional
+
+from .constants import LOCK_FILE
+
+
+class ProviderRequirement(NamedTuple):
+    namespace: str
+    provider: str
+    version: Optional[str]
+    constraints: Optional[str]
+
+
+LOCK_FILE_PROVIDER_PATTERN = re.compile(
+    r'^provider\s+"([^"]+)"\s*\{(.*?)^\}', re.MULTILINE | re.DOTALL
+)
+REQUIRED_PROVIDERS_PATTERN = re.compile(r"\brequired_providers\s*\{")
+REQUIRED_PROVIDER_ENTRY_PATTERN = re.compile(
+    r'^\s*([A-Za-z][\w-]*)\s*=\s*(\{[^{}]*\}|"[^"]*")', re.MULTILINE
+)
+EXACT_VERSION_PATTERN = re.compile(r"^=?\s*v?(\d+\.\d+\.\d+\S*)$")
+
+
+def _get_string_attribute(body: str, name: str) -> Optional[str]:
+    """
+    Get the value of a string attribute such as `version = "1.0.0"` from a block body.
+    """
+    match = re.search(rf'^\s*{name}\s*=\s*"([^"]*)"', body, re.MULTILINE)
+    return match.group(1) if match else None
+
+
+def parse_provider_source(source: str):
+    """
+    Split a provider source address into its namespace and provider type.
+
+    Args:
+        source: The source address, for example `hashicorp/azurerm` or
+            `registry.terraform.io/hashicorp/azurerm`.
+
+    Returns:
+        A tuple with the namespace and the provider type.
+    """
+    parts = source.strip().split("/")
+
+    if len(parts) == 1:
+        return "hashicorp", parts[0]
+
+    return parts[-2], parts[-1]
+
+
+def read_lock_file(filename: str = LOCK_FILE) -> List[ProviderRequirement]:
+    """
+    Read the provider selections from a `.terraform.lock.hcl` file.
+
+    Args:
+        filename: The name of the lock file.
+
+    Returns:
+        A list of provider requirements with the locked version and constraints.
+    """
+    if not os.path.exists(filename):
+        return []
+
+    with open(filename, "r") as f:
+        content = f.read()
+
+    requirements = []
+    for address, body in LOCK_FILE_PROVIDER_PATTERN.findall(content):
+        namespace, provider = parse_provider_source(address)
+        requirements.append(
+            ProviderRequirement(
+                namespace=namespace,
+                provider=provider,
+                version=_get_string_attribute(body, "version"),
+                constraints=_get_string_attribute(body, "constraints"),
+            )
+        )
+
+    return requirements
+
+
+def _find_block_body(content: str, start: int) -> str:
+    """
+    Return the body of the block whose opening brace is just before `start`.
+
+    Quoted strings and comments are skipped so braces inside them are not counted.
+    """
+    depth = 1
+    index = start
+    length = len(content)
+
+    while index < length:
+        char = content[index]
+
+        if char == '"':
+            index += 1
+            while index < length and content[index] != '"':
+                index += 2 if content[index] == "\\" else 1
+        elif char == "#" or content.startswith("//", index):
+            newline = content.find("\n", index)
+            index = length if newline == -1 else newline
+        elif char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth == 0:
+                return content[start:index]
+
+        index += 1
+
+    return content[start:]
+
+
+def parse_required_providers(content: str) -> List[ProviderRequirement]:
+    """
+    Parse the `required_providers` blocks in a piece of Terraform code.
+
+    Args:
+        content: The Terraform code.
+
+    Returns:
+        A list of provider requirements with their version constraints.
+    """
+    requirements = []
+
+    for match in REQUIRED_PROVIDERS_PATTERN.finditer(content):
+        body = _find_block_body(content, match.end())
+
+        for name, value in REQUIRED_PROVIDER_ENTRY_PATTERN.findall(body):
+            if value.startswith('"'):
+                # Legacy shorthand syntax, for example `azurerm = "~> 3.0"`
+                source = None
+                constraints = value.strip('"')
+            else:
+                source = _get_string_attribute(value.strip("{}"), "source")
+                constraints = _get_string_attribute(value.strip("{}"), "version")
+
+            namespace, provider = parse_provider_source(source if source else name)
+            requirements.append(
+                ProviderRequirement(
+                    namespace=namespace,
+                    provider=provider,
+                    version=None,
+                    constraints=constraints,
+                )
+            )
+
+    return requirements
+
+
+def read_required_providers(directory: str = ".") -> List[ProviderRequirement]:
+    """
+    Read the `required_providers` blocks from all Terraform files in a directory.
+
+    Args:
+        directory: The directory containing the Terraform configuration.
+
+    Returns:
+        A list of provider requirements with their version constraints.
+    """
+    requirements = []
+
+    for file_name in sorted(os.listdir(directory)):
+        if file_name.endswith(".tf"):
+            with open(os.path.join(directory, file_name), "r") as f:
+                requirements.extend(parse_required_providers(f.read()))
+
+    return requirements
+
+
+def get_provider_requirements(directory: str = ".") -> List[ProviderRequirement]:
+    """
+    Get every provider used by a configuration with its version and constraints.
+
+    Locked versions from `.terraform.lock.hcl` take precedence. Providers that are only
+    declared in `required_providers` are included with the version set to the constraint
+    when it pins an exact version, and None otherwise.
+
+    Args:
+        directory: The directory containing the Terraform configuration.
+
+    Returns:
+        A list of provider requirements, one per provider.
+    """
+    requirements = {}
+
+    for requirement in read_required_providers(directory):
+        key = (requirement.namespace, requirement.provider)
+        match = EXACT_VERSION_PATTERN.match(requirement.constraints or "")
+        requirements.setdefault(
+            key, requirement._replace(version=match.group(1) if match else None)
+        )
+
+    for requirement in read_lock_file(os.path.join(directory, LOCK_FILE)):
+        requirements[(requirement.namespace, requirement.provider)] = requirement
+
+    return list(requirements.values())
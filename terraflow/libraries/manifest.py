@@ -0,0 +1,269 @@
+"""
+Generate the code for many providers, resources, and data sources from one manifest.
+
+A manifest is a YAML file such as:
+
+    namespace: hashicorp
+    configurations:
+      minimal:
+        required_attributes_only: true
+        required_blocks_only: true
+    providers:
+      - provider: azurerm
+    resources:
+      - provider: azurerm
+        kind: resource_group
+        configuration: minimal
+      - provider: azurerm
+        kind: storage_account
+        name: logs
+        filename: storage.tf
+        configuration:
+          exclude_attributes: [tags]
+    data_sources:
+      - provider: azurerm
+        kind: client_config
+
+Configurations are either the name of an entry under `configurations` or the options
+themselves, using the fields of the Configuration dataclasses.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, fields
+
+from .configuration import (
+    Configuration,
+    DataSourceConfiguration,
+    ProviderConfiguration,
+    ResourceConfiguration,
+)
+from .helpers import read_yaml_file, write_terraform_to_file
+from .schema import Schema
+from .terraform import TerraformDataSource, TerraformProvider, TerraformResource
+
+# Sections of a manifest with the type of the components they list and the file their
+# code is written to by default
+MANIFEST_SECTIONS = {
+    "providers": ("provider", "providers.tf"),
+    "resources": ("resource", "main.tf"),
+    "data_sources": ("data", "data.tf"),
+}
+CONFIGURATION_CLASSES = {
+    "provider": ProviderConfiguration,
+    "resource": ResourceConfiguration,
+    "data": DataSourceConfiguration,
+}
+CONFIGURATION_FIELDS = {f.name for f in fields(Configuration)}
+
+
+@dataclass
+class ManifestItem:
+    """
+    A provider, resource, or data source listed in a manifest.
+    """
+
+    type: str
+    namespace: str
+    provider: str
+    kind: str = None
+    name: str = None
+    version: str = None
+    filename: str = None
+    configuration: Configuration = None
+
+    @property
+    def id(self) -> str:
+        if self.type == "provider":
+            return f"provider.{self.provider}"
+
+        return f"{self.type}.{self.provider}_{self.kind}.{self.name}"
+
+
+def _get_configuration(type: str, value, configurations: dict) -> Configuration:
+    """
+    Build the configuration of a manifest item from a configuration name or options.
+    """
+    if value is None:
+        value = {}
+    elif isinstance(value, str):
+        if value not in configurations:
+            raise ValueError(f'The configuration "{value}" is not defined in the manifest.')
+        value = configurations[value]
+
+    if not isinstance(value, dict):
+        raise ValueError(f"Invalid configuration: {value}")
+
+    unknown = set(value) - CONFIGURATION_FIELDS
+    if unknown:
+        raise ValueError(
+            f"Unknown configuration options: {', '.join(sorted(unknown))}. Valid options are: {', '.join(sorted(CONFIGURATION_FIELDS))}."
+        )
+
+    return CONFIGURATION_CLASSES[type](**value)
+
+
+def load_manifest(filename: str) -> list:
+    """
+    Read the providers, resources, and data sources listed in a manifest.
+
+    Args:
+        filename: The name of the manifest file.
+
+    Returns:
+        A list of ManifestItem objects in the order of the manifest.
+
+    Raises:
+        ValueError: If the manifest cannot be read or is invalid.
+    """
+    manifest = read_yaml_file(filename)
+
+    if not isinstance(manifest, dict):
+        raise ValueError(f'The manifest "{filename}" could not be read.')
+
+    namespace = manifest.get("namespace", "hashicorp")
+    configurations = manifest.get("configurations") or {}
+    items = []
+
+    for section, (type, default_filename) in MANIFEST_SECTIONS.items():
+        for entry in manifest.get(section) or []:
+            if not isinstance(entry, dict) or not entry.get("provider"):
+                raise ValueError(f"Every entry under {section} needs a provider: {entry}")
+            if type != "provider" and not entry.get("kind"):
+                raise ValueError(f"Every entry under {section} needs a kind: {entry}")
+
+            items.append(
+                ManifestItem(
+                    type=type,
+                    namespace=entry.get("namespace", namespace),
+                    provider=entry["provider"],
+                    kind=entry.get("kind"),
+                    name=None if type == "provider" else entry.get("name", "main"),
+                    version=entry.get("version"),
+                    filename=entry.get("filename", default_filename),
+                    configuration=_get_configuration(
+                        type, entry.get("configuration"), configurations
+                    ),
+                )
+            )
+
+    return items
+
+
+def build_component(schema: Schema, item: ManifestItem):
+    """
+    Generate the code for a manifest item.
+
+    Args:
+        schema: The schema shared by all items.
+        item: The manifest item.
+
+    Returns:
+        The TerraformProvider, TerraformResource, or TerraformDataSource.
+    """
+    if item.type == "provider":
+        return TerraformProvider(
+            schema=schema,
+            namespace=item.namespace,
+            provider=item.provider,
+            provider_version=item.version,
+            configuration=item.configuration,
+        )
+    elif item.type == "resource":
+        return TerraformResource(
+            schema=schema,
+            namespace=item.namespace,
+            provider=item.provider,
+            kind=item.kind,
+            provider_version=item.version,
+            name=item.name,
+            configuration=item.configuration,
+        )
+    else:
+        return TerraformDataSource(
+            schema=schema,
+            namespace=item.namespace,
+            provider=item.provider,
+            provider_version=item.version,
+            kind=item.kind,
+            name=item.name,
+            configuration=item.configuration,
+        )
+
+
+def generate_manifest(
+    items: list, schema: Schema = None, max_workers: int = 8, callback=None
+) -> dict:
+    """
+    Generate the code for all manifest items and write it with one write per file.
+
+    The schema is loaded once and every provider in the manifest is added to it up front.
+    The items are then generated by a pool of workers, which overlaps the documentation
+    downloads, and the code is merged into each target file in the order of the manifest.
+
+    Args:
+        items: The ManifestItem objects to generate.
+        schema: Optional; the schema to use. Defaults to the schema of the configuration.
+        max_workers: The maximum number of items to generate at the same time.
+        callback: Optional; called with (item, error) after each item, where error is None
+            for items that were generated.
+
+    Returns:
+        A dictionary with the ids written to each file under "files", the files whose
+        code did not change under "unchanged", and a list of (id, error) tuples under
+        "failed". Items with the same id as an earlier item in the same file fail, and
+        so do items whose version differs from the version of the loaded provider schema.
+    """
+    schema = schema if schema else Schema()
+    schema.add_providers(
+        [(item.namespace, item.provider, item.version) for item in items],
+        max_workers=max_workers,
+    )
+
+    def build(item):
+        try:
+            # A provider has one schema, so a different version would be generated from
+            # the wrong schema
+            loaded_version = item.version and schema.get_loaded_provider_version(
+                item.namespace, item.provider
+            )
+            if loaded_version and loaded_version != item.version:
+                raise ValueError(
+                    f"{item.namespace}/{item.provider} {item.version} was requested, but the schema is for version {loaded_version}."
+                )
+
+            code, error = build_component(schema, item).code, None
+        except Exception as e:
+            code, error = None, e
+
+        if callback:
+            callback(item, error)
+
+        return code, error
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(build, items))
+
+    codes = {}
+    failed = []
+
+    for item, (code, error) in zip(items, results):
+        if error is None and item.id in codes.get(item.filename, {}):
+            # The first item with an id wins, later ones would replace its code
+            failed.append(
+                (item.id, ValueError(f'"{item.id}" is listed more than once for {item.filename}.'))
+            )
+        elif error is None:
+            codes.setdefault(item.filename, {})[item.id] = code
+        else:
+            failed.append((item.id, error))
+
+    unchanged = [
+        filename
+        for filename, components in codes.items()
+        if not write_terraform_to_file(filename=filename, new_code="\n".join(components.values()))
+    ]
+
+    return {
+        "files": {filename: list(components) for filename, components in codes.items()},
+        "unchanged": unchanged,
+        "failed": failed,
+    }
@@ -2,17 +2,18 @@
 Constant values used across the CLI.
 """
 from enum import Enum
+from functools import lru_cache
 import os
 import click
 
-from .helpers import get_namespaces_and_providers
-
-import os
+from .helpers import get_cached_namespaces_and_providers
+from .constants import DOCUMENTATION_SOURCES, SCHEMA_STORAGE_TYPES
 
 #TODO: Add support for using configuration files for defaults
 
+@lru_cache(maxsize=None)
 def get_default_options():
-    namespaces, providers = get_namespaces_and_providers()
+    namespaces, providers = get_cached_namespaces_and_providers()
 
     namespace_default = None
     provider_default = None
@@ -27,13 +28,42 @@ def get_default_options():
 
     return namespace_default, provider_default
 
-namespace_default, provider_default = get_default_options()
+
+def _is_resilient_parsing():
+    """
+    Check whether click is only parsing the command line, for example during shell completion.
+    """
+    ctx = click.get_current_context(silent=True)
+    return ctx is not None and ctx.resilient_parsing
+
+
+def get_namespace_default():
+    """
+    Resolve the default namespace when a command is invoked without --namespace.
+    """
+    if _is_resilient_parsing():
+        return None
+
+    namespace_default, _ = get_default_options()
+    return namespace_default if namespace_default else 'hashicorp'
+
+
+def get_provider_default():
+    """
+    Resolve the default provider when a command is invoked without --provider.
+    """
+    if _is_resilient_parsing():
+        return None
+
+    _, provider_default = get_default_options()
+    return provider_default
+
 
 # Dictionary of different CLI options
 options = {
     "refresh": click.option(
         "--refresh",
-        type=str,
+        type=bool,
         default=False,
         is_flag=True,
         multiple=False,
@@ -43,17 +73,17 @@ options = {
     "namespace": click.option(
         "--namespace",
         type=str,
-        default=namespace_default if namespace_default else 'hashicorp',
+        default=get_namespace_default,
         multiple=False,
-        required=False if namespace_default else True,
+        required=False,
         help="The namespace of the Terraform provider.",
     ),
     "provider": click.option(
         "--provider",
         type=str,
-        default=provider_default,
+        default=get_provider_default,
         multiple=False,
-        required=False if provider_default else True,
+        required=True,
         help="The name of the Terraform provider.",
     ),
     "kind": click.option(
@@ -221,7 +251,100 @@ options = {
         multiple=False,
         required=False,
         help="The default value for the object.",
-    )
+    ),
+    "version": click.option(
+        "--version",
+        type=str,
+        default=None,
+        multiple=False,
+        required=False,
+        help="The version of the Terraform provider.  Defaults to the version used by the configuration.",
+    ),
+    "workers": click.option(
+        "--workers",
+        type=int,
+        default=8,
+        multiple=False,
+        required=False,
+        help="The maximum number of downloads to run at the same time.",
+    ),
+    "generate_workers": click.option(
+        "--workers",
+        type=int,
+        default=8,
+        multiple=False,
+        required=False,
+        help="The maximum number of components to generate at the same time.",
+    ),
+    "documentation_path": click.option(
+        "--path",
+        type=click.Path(exists=True),
+        default=None,
+        multiple=False,
+        required=True,
+        help="A local checkout or release tarball of the provider repository.",
+    ),
+    "documentation_source": click.option(
+        "--source",
+        type=click.Choice(DOCUMENTATION_SOURCES),
+        default="registry",
+        multiple=False,
+        required=False,
+        help="Where to download the documentation from.  The registry is read in bulk, GitHub one page at a time.",
+    ),
+    "schema_storage": click.option(
+        "--schema-storage",
+        type=click.Choice(SCHEMA_STORAGE_TYPES),
+        default="shards",
+        envvar="TERRAFLOW_SCHEMA_STORAGE",
+        multiple=False,
+        required=False,
+        help="How the provider schema is cached.  Shards are shared between projects, the index keeps one file per project.",
+    ),
+    "scaffold_directory": click.option(
+        "--out",
+        type=click.Path(file_okay=False),
+        default=None,
+        multiple=False,
+        required=True,
+        help="The directory to write the code to.  Existing providers.tf, main.tf, and data.tf files are replaced.",
+    ),
+    "processes": click.option(
+        "--processes",
+        type=int,
+        default=None,
+        multiple=False,
+        required=False,
+        help="The number of processes used to generate code.  Defaults to the number of CPUs.",
+    ),
+    "manifest_filename": click.option(
+        "--file",
+        "-f",
+        type=click.Path(exists=True, dir_okay=False),
+        default=".terraflow.yaml",
+        multiple=False,
+        required=False,
+        help="The manifest that lists the providers, resources, and data sources to generate.",
+    ),
+    "recursive": click.option(
+        "--recursive",
+        "-r",
+        type=bool,
+        default=False,
+        is_flag=True,
+        multiple=False,
+        required=False,
+        help="Include the nested modules.  Directories named .terraform and paths in .terraflowignore and .gitignore files are skipped.",
+    ),
+    "refresh_documentation": click.option(
+        "--refresh",
+        type=bool,
+        default=False,
+        is_flag=True,
+        multiple=False,
+        required=False,
+        help="Download documentation that is already cached.",
+    ),
 }
 
 
@@ -304,4 +427,16 @@ def variable_options(func):
     func = options["default"](func)
     func = options["terraform_filename"](func)
 
-    return func
\ No newline at end of file
+    return func
+
+
+def documentation_options(func):
+    """
+    Description
+    """
+    func = options["version"](func)
+    func = options["workers"](func)
+    func = options["documentation_source"](func)
+    func = options["refresh_documentation"](func)
+
+    return func
@@ -0,0 +1,195 @@
+"""
+Generate the code for every resource and data source of a provider.
+
+Scaffolds are used to review what changes between provider versions, so they cover the
+whole catalog of a provider. The target is to generate the full azurerm catalog, about
+1,000 resources and data sources, in under a minute on 8 cores, which is
+SCAFFOLD_TARGET_RATE components per second. `benchmarks/provider_scaffold.py` measures
+the rate on the current machine.
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from .configuration import DataSourceConfiguration, ResourceConfiguration
+from .constants import TERRAFORM_REGISTRY_BASE
+from .doc_sources import OfflineDocumentationSource
+from .schema import Schema
+from .terraform import TerraformDataSource, TerraformProvider, TerraformResource
+
+# Components per second needed to generate the azurerm catalog in under a minute
+SCAFFOLD_TARGET_RATE = 1000 / 60
+# The file the code of each type of component is written to
+SCAFFOLD_FILENAMES = {
+    "provider": "providers.tf",
+    "resource": "main.tf",
+    "data": "data.tf",
+}
+
+# Settings shared by every component a worker generates, set by _initialize_worker
+_worker_settings = {}
+
+
+def _initialize_worker(namespace, provider, version, offline):
+    _worker_settings.update(
+        namespace=namespace,
+        provider=provider,
+        version=version,
+        documentation_source=OfflineDocumentationSource() if offline else None,
+    )
+
+
+def _build_component(task):
+    """
+    Generate the code for one component in a worker.
+
+    The task carries the schema of the component, so workers never read the schema cache
+    or the configuration.
+
+    Args:
+        task: A (type, name, schema) tuple, where name is the full resource or data source name.
+
+    Returns:
+        A (type, name, code, error) tuple. The code is None if an error occurred.
+    """
+    type, name, component_schema = task
+    namespace = _worker_settings["namespace"]
+    provider = _worker_settings["provider"]
+    kind = name[len(provider) + 1:] if name else None
+
+    scope = {"resource": "resource_schemas", "data": "data_source_schemas"}.get(type)
+    provider_schema = (
+        {"provider": component_schema}
+        if type == "provider"
+        else {scope: {name: component_schema}}
+    )
+    schema = Schema.from_mapping(
+        {"provider_schemas": {f"{TERRAFORM_REGISTRY_BASE}/{namespace}/{provider}": provider_schema}}
+    )
+
+    arguments = dict(
+        schema=schema,
+        namespace=namespace,
+        provider=provider,
+        provider_version=_worker_settings["version"],
+        documentation_source=_worker_settings["documentation_source"],
+    )
+
+    try:
+        if type == "provider":
+            component = TerraformProvider(**arguments)
+        elif type == "resource":
+            component = TerraformResource(
+                kind=kind, configuration=ResourceConfiguration(), **arguments
+            )
+        else:
+            component = TerraformDataSource(
+                kind=kind, configuration=DataSourceConfiguration(), **arguments
+            )
+    except Exception as e:
+        return type, name, None, f"{e.__class__.__name__}: {e}"
+
+    return type, name, component.code, None
+
+
+def _iter_scaffold_tasks(schema: Schema, namespace: str, provider: str):
+    """
+    Yield a (type, name, schema) task for the provider and each of its resources and data sources.
+    """
+    names = schema.manifest["provider_schemas"][
+        f"{TERRAFORM_REGISTRY_BASE}/{namespace}/{provider}"
+    ]
+
+    yield "provider", None, schema.get_provider_schema(namespace, provider)
+
+    for name in sorted(names.get("resource_schemas", [])):
+        yield "resource", name, schema.get_resource_schema(namespace, provider, name)
+
+    for name in sorted(names.get("data_source_schemas", [])):
+        yield "data", name, schema.get_data_schema(namespace, provider, name)
+
+
+def scaffold_provider(
+    schema: Schema,
+    namespace: str,
+    provider: str,
+    version: str,
+    directory: str,
+    max_workers: int = None,
+    offline: bool = True,
+    callback=None,
+) -> dict:
+    """
+    Write the code for a provider and all of its resources and data sources to a directory.
+
+    The components are generated by a pool of processes. Each task carries the schema of
+    its component and the code is streamed to providers.tf, main.tf, and data.tf in the
+    directory in the order of the schema as the results arrive. Existing files are replaced.
+
+    Args:
+        schema: The schema, which must include the provider.
+        namespace: The namespace of the provider.
+        provider: The name of the provider.
+        version: The version of the provider, used for the documentation.
+        directory: The directory to write the code to.
+        max_workers: Optional; the number of processes. Defaults to the number of CPUs.
+            With one process the code is generated in the current process.
+        offline: Only use the documentation that is already cached.
+        callback: Optional; called with (type, name, error) after each component.
+
+    Returns:
+        A dictionary with the number of components "generated", the (type, name, error)
+        tuples that "failed", the "elapsed" seconds, and the "rate" in components per second.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    tasks = list(_iter_scaffold_tasks(schema, namespace, provider))
+    settings = (namespace, provider, version, offline)
+
+    os.makedirs(directory, exist_ok=True)
+    files = {}
+    generated = 0
+    failed = []
+    start = time.perf_counter()
+
+    if max_workers == 1:
+        executor = None
+        _initialize_worker(*settings)
+        results = map(_build_component, tasks)
+    else:
+        executor = ProcessPoolExecutor(
+            max_workers=max_workers, initializer=_initialize_worker, initargs=settings
+        )
+        results = executor.map(
+            _build_component, tasks, chunksize=max(1, len(tasks) // (max_workers * 8))
+        )
+
+    try:
+        for type, name, code, error in results:
+            if error is None:
+                if type not in files:
+                    files[type] = open(
+                        os.path.join(directory, SCAFFOLD_FILENAMES[type]), "w"
+                    )
+                else:
+                    files[type].write("\n")
+                files[type].write(code)
+                generated += 1
+            else:
+                failed.append((type, name, error))
+
+            if callback:
+                callback(type, name, error)
+    finally:
+        if executor:
+            executor.shutdown(cancel_futures=True)
+        for f in files.values():
+            f.close()
+
+    elapsed = time.perf_counter() - start
+
+    return {
+        "generated": generated,
+        "failed": failed,
+        "elapsed": elapsed,
+        "rate": generated / elapsed if elapsed else 0.0,
+    }
@@ -1,76 +1,400 @@
 import os
 import json
+import hashlib
+import tempfile
 import subprocess
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 
 from .constants import *
 from .helpers import *
+from .schema_store import (
+    IndexedSchemaStore,
+    ShardedSchemaStore,
+    build_schema,
+    iter_schema_stream,
+)
+from .lockfile import get_provider_requirements
+from .toolchain import get_toolchain_info
+
+
+def stream_schema(cwd: str = None, env: dict = None):
+    """
+    Run `terraform providers schema -json` and yield each schema as it is read from the pipe.
+
+    Args:
+        cwd: The directory of the Terraform configuration.
+        env: The environment variables for terraform.
+    """
+    process = subprocess.Popen(
+        ["terraform", "providers", "schema", "-json"],
+        stdout=subprocess.PIPE,
+        text=True,
+        encoding="utf-8",
+        cwd=cwd,
+        env=env,
+    )
+
+    try:
+        yield from iter_schema_stream(process.stdout)
+    finally:
+        process.stdout.close()
+        returncode = process.wait()
+
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, process.args)
+
+
+def fetch_provider_schema(namespace: str, provider: str, version: str) -> None:
+    """
+    Fetch the schema of a provider version into the global schema cache.
+
+    The schema is read from a temporary workspace that only declares the provider, so the
+    provider does not need to be part of the current configuration. Provider binaries are
+    shared between workspaces through the plugin cache, unless TF_PLUGIN_CACHE_DIR is set.
+
+    Args:
+        namespace: The namespace of the provider.
+        provider: The name of the provider.
+        version: The version of the provider.
+    """
+    env = dict(os.environ)
+    if not env.get("TF_PLUGIN_CACHE_DIR"):
+        env["TF_PLUGIN_CACHE_DIR"] = GLOBAL_PLUGIN_DIR
+    os.makedirs(env["TF_PLUGIN_CACHE_DIR"], exist_ok=True)
+
+    with tempfile.TemporaryDirectory(prefix="terraflow-") as workspace:
+        write_text_file(
+            os.path.join(workspace, "main.tf"),
+            "terraform {\n"
+            "  required_providers {\n"
+            f"    {provider} = {{\n"
+            f'      source  = "{namespace}/{provider}"\n'
+            f'      version = "{version}"\n'
+            "    }\n"
+            "  }\n"
+            "}\n",
+        )
+
+        subprocess.run(
+            ["terraform", "init", "-input=false", "-backend=false"],
+            cwd=workspace,
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+
+        # Only the provider itself has a known version, so it is the only schema that
+        # is written to the global cache
+        store = ShardedSchemaStore(
+            directory=os.path.join(workspace, "schema"), global_directory=GLOBAL_SCHEMA_DIR
+        )
+        store.write_items(
+            stream_schema(cwd=workspace, env=env),
+            versions={f"{TERRAFORM_REGISTRY_BASE}/{namespace}/{provider}": version},
+        )
+
+
+def fetch_provider_schemas(providers: list, max_workers: int = 4) -> list:
+    """
+    Fetch the schemas of several provider versions into the global schema cache in parallel.
+
+    Args:
+        providers: A list of (namespace, provider, version) tuples.
+        max_workers: The maximum number of providers to fetch at the same time.
+
+    Returns:
+        A list of the (namespace, provider, version) tuples that were fetched successfully.
+    """
+    def fetch(item):
+        namespace, provider, version = item
+        try:
+            fetch_provider_schema(namespace=namespace, provider=provider, version=version)
+            return True
+        except Exception as e:
+            print(f'\n{colors("FAIL")}Error:{colors()} Could not fetch the schema for {namespace}/{provider} {version}: {e}\n')
+            return False
+
+    if not providers:
+        return []
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(providers))) as executor:
+        results = list(executor.map(fetch, providers))
+
+    return [item for item, fetched in zip(providers, results) if fetched]
 
 
 class Schema:
-    def __init__(self, filename: str = '.terraflow/schema.json', cache: bool = True, refresh: bool = False):
+    def __init__(
+        self,
+        directory: str = SCHEMA_DIR,
+        filename: str = SCHEMA_FILE,
+        storage: str = "shards",
+        cache: bool = True,
+        refresh: bool = False,
+    ):
+        self.directory = directory
         self.filename = filename
+        self.storage = storage
         self.cache = cache
         self.refresh = refresh
+        self.provider_versions = {}
+        self.store = self._get_store()
         self.json = self.get_schema()
 
+    @classmethod
+    def from_mapping(cls, schema):
+        """
+        Build a Schema from provider schemas that were already loaded.
+
+        The configuration and the schema cache are not read, which makes this suitable for
+        worker processes that receive the schemas they need from the parent process.
+
+        Args:
+            schema: A mapping shaped like the output of `terraform providers schema -json`.
+
+        Returns:
+            The Schema.
+        """
+        instance = cls.__new__(cls)
+        instance.directory = None
+        instance.filename = None
+        instance.storage = None
+        instance.cache = False
+        instance.refresh = False
+        instance.provider_versions = {}
+        instance.store = None
+        instance.json = schema
+
+        return instance
+
+    def _get_store(self):
+        if self.storage == "shards":
+            return ShardedSchemaStore(directory=self.directory, global_directory=GLOBAL_SCHEMA_DIR)
+        elif self.storage == "index":
+            return IndexedSchemaStore(filename=self.filename)
+        else:
+            raise ValueError(f"Invalid storage. Must be one of {SCHEMA_STORAGE_TYPES}.")
+
+    @property
+    def manifest(self):
+        """
+        The names of all providers, resources, and data sources in the schema.
+        """
+        return self.json if isinstance(self.json, dict) else self.store.manifest
+
     def get_schema(self):
         if not os.path.exists(TERRAFLOW_DIR):
             os.makedirs(TERRAFLOW_DIR)
 
-        if self.filename and os.path.exists(self.filename) and not self.refresh:
-            schema = read_json_file(self.filename)
+        if self.cache and not self.refresh and self.is_cache_valid():
             print(f'\n{colors("OK_BLUE")}Info:{colors()} Reading provider schema from cache.\n')
-        else:
-            schema = self.fetch_schema()
-            self.cache_schema(schema=schema)
-            print(f'\n{colors("OK_GREEN")}Success:{colors()} Schema downloaded successfully.\n')
+        elif self.cache and not self.refresh and self.store.link(
+            self.get_provider_versions(), key=self.get_cache_key()
+        ):
+            print(f'\n{colors("OK_BLUE")}Info:{colors()} Reading provider schema from the global cache.\n')
+        elif not self.cache:
+            try:
+                return self.fetch_schema()
+            except subprocess.CalledProcessError as e:
+                self._print_fetch_error(e)
+                raise SystemExit(1)
+        elif not self.cache_schema():
+            # The schema has been streamed into the cache, so fetching it again would
+            # only repeat the same terraform commands
+            raise SystemExit(1)
+
+        return self.store.as_mapping()
+
+    def _print_fetch_error(self, error):
+        print(f'\n{colors("FAIL")}Error:{colors()} The provider schema could not be read from terraform. {error} Make sure `terraform init` succeeds for this configuration.\n')
+
+    def get_cache_key(self) -> str:
+        """
+        Build the cache key from the provider lock file and the terraform version.
+        """
+        digest = hashlib.sha256()
+
+        if os.path.exists(LOCK_FILE):
+            with open(LOCK_FILE, "rb") as f:
+                digest.update(f.read())
 
-        return schema
+        digest.update(get_toolchain_info().terraform_version.encode("utf-8"))
+
+        return digest.hexdigest()
+
+    def get_provider_versions(self) -> dict:
+        """
+        Get the version of every provider in the configuration, keyed by provider address.
+
+        The versions decide which entries of the global schema cache are used.
+        """
+        return {
+            f"{TERRAFORM_REGISTRY_BASE}/{requirement.namespace}/{requirement.provider}": requirement.version
+            for requirement in get_provider_requirements()
+        }
+
+    def is_cache_valid(self) -> bool:
+        """
+        Check whether the cached schema was fetched for the current lock file and terraform version.
+        """
+        return self.store.exists() and self.store.key == self.get_cache_key()
+
+    def _stream_schema(self):
+        return stream_schema()
+
+    def fetch_schema(self, sink=build_schema):
+        """
+        Fetch the provider schemas from terraform and pass them to a sink.
+
+        Args:
+            sink: A callable that consumes an iterable of (address, scope, name, schema) tuples.
+                Defaults to building the whole schema in memory.
+        """
+        # The schema can be read without an init when the providers are already installed
+        try:
+            return sink(self._stream_schema())
+        except subprocess.CalledProcessError:
+            pass
 
-    def fetch_schema(self):
         try:
             p = subprocess.run(["terraform", "init"], capture_output=True, text=True)
-            return json.loads(subprocess.check_output(["terraform", "providers", "schema", "-json"]).decode("utf-8"))
+            return sink(self._stream_schema())
         except subprocess.CalledProcessError:
             print(
                 f'\n{colors(color="WARNING")}Warning:{colors()} The provider versions for this configuration have changed. Running an upgrade.\n'
             )
             p = subprocess.run(["terraform", "init", "-upgrade"], capture_output=True, text=True)
-            return json.loads(subprocess.check_output(["terraform", "providers", "schema", "-json"]).decode("utf-8"))
+            return sink(self._stream_schema())
 
     def cache_schema(self, schema=None):
-        _, ext = os.path.splitext(self.filename)
-        if ext.lower() != ".json":
-            print(f'\n{colors("FAIL")}Error:{colors()} {self.filename} is not a JSON file.\n')
-            return
-
-        dirname = os.path.dirname(self.filename)
-        if not os.path.exists(dirname):
-            os.makedirs(dirname)
-
         try:
             if schema is None:
-                schema = self.get_schema(filename=self.filename, refresh=True)
-            write_json_file(self.filename, schema)
+                # Write each schema to the cache as it is streamed from terraform. The key
+                # and versions are read on each attempt, after any init that may have updated
+                # the lock file.
+                self.fetch_schema(
+                    sink=lambda items: self.store.write_items(
+                        items,
+                        key=self.get_cache_key(),
+                        versions=self.get_provider_versions(),
+                        overwrite=self.refresh,
+                    )
+                )
+            else:
+                self.store.write(schema, key=self.get_cache_key())
             print(f'\n{colors("OK_GREEN")}Success:{colors()} Schema downloaded successfully.\n')
+            return True
+        except subprocess.CalledProcessError as e:
+            self._print_fetch_error(e)
+            return False
         except Exception as e:
             print(f'\n{colors("FAIL")}Error:{colors()} An error occurred while caching the schema: {traceback.format_exc()}\n')
+            return False
+
+    def add_providers(self, providers: list, max_workers: int = 4) -> None:
+        """
+        Add the schemas of providers that are not part of the configuration.
+
+        Provider versions missing from the global schema cache are fetched in parallel in
+        temporary workspaces. With the default storage, the providers are also added to the
+        local cache so later runs do not need to look them up again.
+
+        Args:
+            providers: A list of (namespace, provider, version) tuples. Providers without a
+                version use the version from the configuration or the latest version.
+            max_workers: The maximum number of providers to fetch at the same time.
+        """
+        versions = {}
+        missing = []
+
+        for namespace, provider, version in providers:
+            address = f"{TERRAFORM_REGISTRY_BASE}/{namespace}/{provider}"
+            if address in self.json["provider_schemas"] or address in versions:
+                continue
+
+            version = version or get_toolchain_info().get_provider_version(
+                provider=provider, namespace=namespace
+            )
+            if not version:
+                continue
+
+            if not os.path.exists(os.path.join(GLOBAL_SCHEMA_DIR, namespace, provider, version)):
+                missing.append((namespace, provider, version))
+            versions[address] = version
+
+        if missing:
+            print(f'\n{colors("OK_BLUE")}Info:{colors()} Downloading the schema for {", ".join(f"{namespace}/{provider} {version}" for namespace, provider, version in missing)}.\n')
+            fetched = fetch_provider_schemas(missing, max_workers=max_workers)
+
+            for namespace, provider, version in set(missing) - set(fetched):
+                del versions[f"{TERRAFORM_REGISTRY_BASE}/{namespace}/{provider}"]
+
+        if not versions:
+            return
+
+        self.provider_versions.update(versions)
+
+        if self.cache and self.storage == "shards" and not isinstance(self.json, dict):
+            self.store.link(versions, merge=True)
+            self.json = self.store.as_mapping()
+        else:
+            store = ShardedSchemaStore(directory=None, global_directory=GLOBAL_SCHEMA_DIR)
+            store.link(versions)
+            self.json = {
+                "provider_schemas": {
+                    **self.json["provider_schemas"],
+                    **store.as_mapping()["provider_schemas"],
+                }
+            }
+
+    def get_loaded_provider_version(self, namespace: str, provider: str) -> str:
+        """
+        Get the version of a provider whose schema is loaded, without using the network.
+
+        Args:
+            namespace: The namespace of the provider.
+            provider: The name of the provider.
+
+        Returns:
+            The version the provider was added with, the locked version for providers of
+            the configuration, or None if it is not known.
+        """
+        address = f"{TERRAFORM_REGISTRY_BASE}/{namespace}/{provider}"
+
+        if address in self.provider_versions:
+            return self.provider_versions[address]
+
+        return get_toolchain_info().get_locked_provider_version(
+            provider=provider, namespace=namespace
+        )
+
+    def _get_provider_schemas(self, namespace, provider):
+        """
+        Get the schemas of a provider, adding the provider if it is not part of the configuration.
+        """
+        address = f"{TERRAFORM_REGISTRY_BASE}/{namespace}/{provider}"
+
+        if address not in self.json["provider_schemas"]:
+            self.add_providers([(namespace, provider, None)])
+
+        return self.json["provider_schemas"][address]
 
     def get_provider_schema(self, namespace, provider):
-        return self.json["provider_schemas"][f"{TERRAFORM_REGISTRY_BASE}/{namespace}/{provider}"]["provider"]
+        return self._get_provider_schemas(namespace, provider)["provider"]
 
     def get_resource_schema(self, namespace, provider, resource):
         if resource and provider not in resource:
             resource = f"{provider}_{resource}"
 
-        return self.json["provider_schemas"][f"{TERRAFORM_REGISTRY_BASE}/{namespace}/{provider}"]["resource_schemas"][resource]
+        return self._get_provider_schemas(namespace, provider)["resource_schemas"][resource]
 
     def get_data_schema(self, namespace, provider, data_source):
         if data_source and provider not in data_source:
             data_source = f"{provider}_{data_source}"
 
-        return self.json["provider_schemas"][f"{TERRAFORM_REGISTRY_BASE}/{namespace}/{provider}"]["data_source_schemas"][data_source]
+        return self._get_provider_schemas(namespace, provider)["data_source_schemas"][data_source]
 
     def get_attribute_schema(self, resource_schema, blocks=None, attribute=None):
         try:
@@ -0,0 +1,646 @@
+import os
+import re
+import json
+import mmap
+import shutil
+from collections.abc import Mapping
+
+from .constants import GLOBAL_SCHEMA_DIR, SCHEMA_DIR, SCHEMA_FILE
+from .helpers import atomic_write, write_file_atomically
+
+SCHEMA_SCOPES = ["resource_schemas", "data_source_schemas"]
+
+# Fields of the provider schema that are used for code generation and metadata
+ATTRIBUTE_FIELDS = ["type", "required", "optional", "computed"]
+BLOCK_TYPE_FIELDS = ["nesting_mode", "min_items", "max_items"]
+
+
+def slim_schema(schema: dict) -> dict:
+    """
+    Project a provider, resource, or data source schema onto the fields terraflow uses.
+
+    Descriptions, deprecation flags, and other fields that are never read during code
+    generation are dropped, which keeps the cached shards small.
+
+    Args:
+        schema: A schema containing a `block` key.
+
+    Returns:
+        The slimmed schema.
+    """
+    block = schema.get("block", {})
+    slim_block = {}
+
+    attributes = block.get("attributes")
+    if attributes:
+        slim_block["attributes"] = {
+            name: {k: v for k, v in attribute.items() if k in ATTRIBUTE_FIELDS}
+            for name, attribute in attributes.items()
+        }
+
+    block_types = block.get("block_types")
+    if block_types:
+        slim_block["block_types"] = {}
+        for name, block_type in block_types.items():
+            slim_block_type = {
+                k: v for k, v in block_type.items() if k in BLOCK_TYPE_FIELDS
+            }
+            slim_block_type.update(slim_schema(block_type))
+            slim_block["block_types"][name] = slim_block_type
+
+    return {"block": slim_block}
+
+
+# Matches strings, a lone quote for a string that continues in the next chunk, and the
+# structural characters that are needed to follow the nesting of the document
+STREAM_TOKEN_PATTERN = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"|"|[{}\[\],]')
+
+
+def _get_schema_item_path(keys: list):
+    """
+    Classify a JSON container by the keys of the containers it is nested in.
+
+    Returns "descend" for containers that hold schemas, the (address, scope, name) of the
+    item for schemas that should be yielded, and None for anything that can be skipped.
+    """
+    if not keys or keys == ["provider_schemas"]:
+        return "descend"
+
+    if keys[0] != "provider_schemas":
+        return None
+
+    if len(keys) == 2:
+        return "descend"
+    elif len(keys) == 3 and keys[2] == "provider":
+        return keys[1], "provider", None
+    elif len(keys) == 3 and keys[2] in SCHEMA_SCOPES:
+        return "descend"
+    elif len(keys) == 4 and keys[2] in SCHEMA_SCOPES:
+        return keys[1], keys[2], keys[3]
+
+    return None
+
+
+def iter_schema_stream(stream, chunk_size: int = 1 << 20):
+    """
+    Incrementally read a `terraform providers schema -json` document from a text stream.
+
+    Only the nesting down to each provider, resource, and data source schema is tokenized
+    in Python. Each schema is then decoded on its own, so memory stays bounded by the
+    largest single schema instead of the whole document.
+
+    Args:
+        stream: A text stream, such as the stdout pipe of the terraform subprocess.
+        chunk_size: The number of characters to read from the stream at a time.
+
+    Yields:
+        Tuples of (address, scope, name, schema), where scope is "provider" (with the name
+        set to None), "resource_schemas", or "data_source_schemas".
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    pos = 0
+    eof = False
+    need_more = False
+
+    # One [container, key] entry per open container on the path to the current position
+    stack = []
+    expect_key = False
+
+    while True:
+        match = None if need_more else STREAM_TOKEN_PATTERN.search(buffer, pos)
+
+        if match is None or match.group() == '"':
+            if eof:
+                if need_more or match is not None or stack:
+                    raise ValueError("The provider schema document ended unexpectedly.")
+                return
+
+            # Keep the unprocessed tail of the buffer and read the next chunk
+            pos = pos if match is None else match.start()
+            chunk = stream.read(chunk_size)
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            eof = not chunk
+            need_more = False
+            continue
+
+        token = match.group()
+
+        if token in "{[":
+            keys = [key for _, key in stack]
+            item = _get_schema_item_path(keys)
+
+            if item == "descend":
+                stack.append([token, None])
+                expect_key = token == "{"
+                pos = match.end()
+                continue
+
+            # Decode or skip the whole value at once, reading more if it is incomplete
+            try:
+                value, end = decoder.raw_decode(buffer, match.start())
+            except json.JSONDecodeError:
+                pos = match.start()
+                need_more = True
+                continue
+
+            pos = end
+            if item is not None:
+                yield item + (value,)
+        elif token in "}]":
+            stack.pop()
+            expect_key = False
+            pos = match.end()
+        elif token == ",":
+            expect_key = bool(stack) and stack[-1][0] == "{"
+            pos = match.end()
+        else:
+            if expect_key:
+                stack[-1][1] = json.loads(token)
+                expect_key = False
+            pos = match.end()
+
+        # Drop the processed part of the buffer once it grows beyond a chunk
+        if pos > chunk_size:
+            buffer = buffer[pos:]
+            pos = 0
+
+
+def iter_schema_items(schema: dict):
+    """
+    Iterate over a decoded `terraform providers schema -json` document.
+
+    Yields the same (address, scope, name, schema) tuples as `iter_schema_stream`.
+    """
+    for address, provider_schema in schema.get("provider_schemas", {}).items():
+        yield address, "provider", None, provider_schema.get("provider", {})
+
+        for scope in SCHEMA_SCOPES:
+            for name, item_schema in provider_schema.get(scope, {}).items():
+                yield address, scope, name, item_schema
+
+
+def build_schema(items) -> dict:
+    """
+    Build a decoded schema document from (address, scope, name, schema) tuples.
+    """
+    schema = {"provider_schemas": {}}
+
+    for address, scope, name, item_schema in items:
+        provider_schema = schema["provider_schemas"].setdefault(address, {})
+        if scope == "provider":
+            provider_schema["provider"] = item_schema
+        else:
+            provider_schema.setdefault(scope, {})[name] = item_schema
+
+    return schema
+
+
+class LazyMapping(Mapping):
+    """
+    Read-only mapping over a known set of keys that loads each value on first access.
+    """
+
+    def __init__(self, keys, loader):
+        self._keys = list(keys)
+        self._key_set = set(self._keys)
+        self._loader = loader
+        self._values = {}
+
+    def __getitem__(self, key):
+        if key not in self._values:
+            if key not in self._key_set:
+                raise KeyError(key)
+            self._values[key] = self._loader(key)
+
+        return self._values[key]
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, key):
+        return key in self._key_set
+
+
+class SchemaStore:
+    """
+    Base class for on-disk schema caches.
+
+    Subclasses implement `exists`, `manifest`, `read_provider`, `read_schema`, and
+    `write_items`. Stores can be used as context managers, which closes them on exit.
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self) -> None:
+        """
+        Release any open files. The store can still be used afterwards.
+        """
+
+    def link(self, versions: dict, key: str = None) -> bool:
+        """
+        Build the cache from schemas shared by other projects. Stores without a shared
+        cache return False so the schema is fetched instead.
+        """
+        return False
+
+    @property
+    def key(self) -> str:
+        """
+        The cache key the schema was written with.
+        """
+        return self.manifest.get("key")
+
+    def write(self, schema: dict, key: str = None) -> None:
+        """
+        Replace the cache with a decoded `terraform providers schema -json` document.
+        """
+        self.write_items(iter_schema_items(schema), key=key)
+
+    def as_mapping(self) -> Mapping:
+        """
+        Return a view of the cache shaped like the output of `terraform providers schema -json`.
+
+        Schemas are only read when the corresponding key is accessed.
+        """
+        provider_schemas = self.manifest["provider_schemas"]
+
+        def load_provider(address):
+            def load_scope(scope):
+                if scope == "provider":
+                    return self.read_provider(address)
+
+                return LazyMapping(
+                    provider_schemas[address].get(scope, []),
+                    lambda name: self.read_schema(address, scope, name),
+                )
+
+            return LazyMapping(["provider"] + SCHEMA_SCOPES, load_scope)
+
+        return LazyMapping(
+            ["provider_schemas"],
+            lambda _: LazyMapping(provider_schemas, load_provider),
+        )
+
+
+class ShardedSchemaStore(SchemaStore):
+    """
+    On-disk schema cache with one small JSON file per provider, resource, and data source.
+
+    Each provider is stored in its own directory:
+
+        <provider dir>/manifest.json
+        <provider dir>/provider.json
+        <provider dir>/resource_schemas/<name>.json
+        <provider dir>/data_source_schemas/<name>.json
+
+    Providers with a known version are stored in the user-level cache at
+    `<global_directory>/<namespace>/<provider>/<version>`, which is shared by every project
+    pinned to that version. Other providers are stored in `<directory>/<namespace>/<provider>`.
+
+    The manifest in `<directory>/manifest.json` lists the shard directory and the names of
+    every resource and data source of each provider, so listing commands never need to
+    open a shard. Without a directory, the manifest is only kept in memory and only the
+    user-level cache can be used.
+    """
+
+    def __init__(self, directory: str = SCHEMA_DIR, global_directory: str = GLOBAL_SCHEMA_DIR):
+        self.directory = directory
+        self.global_directory = global_directory
+        self._manifest = None
+
+    @property
+    def manifest_filename(self) -> str:
+        return os.path.join(self.directory, "manifest.json")
+
+    def exists(self) -> bool:
+        if self.directory is None:
+            return self._manifest is not None
+
+        return os.path.exists(self.manifest_filename)
+
+    @property
+    def manifest(self) -> dict:
+        if self._manifest is None:
+            with open(self.manifest_filename, "r") as f:
+                self._manifest = json.load(f)
+
+        return self._manifest
+
+    def _get_provider_dir(self, address: str, version: str = None) -> str:
+        # The address has the form registry.terraform.io/<namespace>/<provider>
+        namespace, provider = address.split("/")[-2:]
+
+        if version and self.global_directory:
+            return os.path.join(self.global_directory, namespace, provider, version)
+
+        return os.path.join(self.directory, namespace, provider)
+
+    def _read_shard(self, *parts) -> dict:
+        with open(os.path.join(*parts), "r") as f:
+            return json.load(f)
+
+    def _write_shard(self, data: dict, *parts) -> None:
+        filename = os.path.join(*parts)
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        with open(filename, "w") as f:
+            json.dump(data, f, separators=(",", ":"))
+
+    def _read_provider_manifest(self, provider_dir: str) -> dict:
+        """
+        Read the names of the resources and data sources in a provider directory.
+
+        Returns None if the provider has not been cached.
+        """
+        try:
+            return self._read_shard(provider_dir, "manifest.json")
+        except (OSError, ValueError):
+            return None
+
+    def _write_manifest(self, manifest: dict) -> None:
+        if self.directory is not None:
+            os.makedirs(self.directory, exist_ok=True)
+            write_file_atomically(
+                self.manifest_filename, json.dumps(manifest, separators=(",", ":"))
+            )
+
+        self._manifest = manifest
+
+    def read_provider(self, address: str) -> dict:
+        return self._read_shard(
+            self.manifest["provider_schemas"][address]["path"], "provider.json"
+        )
+
+    def read_schema(self, address: str, scope: str, name: str) -> dict:
+        return self._read_shard(
+            self.manifest["provider_schemas"][address]["path"], scope, f"{name}.json"
+        )
+
+    def link(self, versions: dict, key: str = None, merge: bool = False) -> bool:
+        """
+        Build the cache from the user-level cache without fetching any schemas.
+
+        Args:
+            versions: A dictionary of provider addresses and their versions.
+            key: The cache key to record in the manifest.
+            merge: Add the providers to the existing manifest and keep its key.
+
+        Returns:
+            True if every provider was found in the user-level cache, False otherwise.
+        """
+        if not self.global_directory or not versions or not all(versions.values()):
+            return False
+
+        if merge and self.exists():
+            manifest = {
+                "key": self.key,
+                "provider_schemas": dict(self.manifest["provider_schemas"]),
+            }
+        else:
+            manifest = {"key": key, "provider_schemas": {}}
+
+        for address, version in versions.items():
+            provider_dir = self._get_provider_dir(address, version)
+            provider_manifest = self._read_provider_manifest(provider_dir)
+
+            if provider_manifest is None:
+                return False
+
+            manifest["provider_schemas"][address] = dict(provider_manifest, path=provider_dir)
+
+        self._write_manifest(manifest)
+        return True
+
+    def write_items(self, items, key: str = None, versions: dict = None, overwrite: bool = False) -> None:
+        """
+        Replace the cache with shards built from (address, scope, name, schema) tuples.
+
+        Each schema is written as soon as it arrives. The shards of each provider are written
+        to a temporary directory that is moved into place once it is complete, so an
+        interrupted write never leaves a partial provider behind. Providers that are already
+        in the user-level cache are skipped unless `overwrite` is set.
+
+        Args:
+            items: An iterable of (address, scope, name, schema) tuples.
+            key: The cache key to record in the manifest.
+            versions: A dictionary of provider addresses and their versions.
+            overwrite: Replace providers that are already in the user-level cache.
+        """
+        versions = versions or {}
+        manifest = {"key": key, "provider_schemas": {}}
+        staging_dirs = {}
+
+        try:
+            for address, scope, name, item_schema in items:
+                if address not in manifest["provider_schemas"]:
+                    version = versions.get(address)
+                    provider_dir = self._get_provider_dir(address, version)
+                    provider_manifest = None
+
+                    if version and not overwrite:
+                        provider_manifest = self._read_provider_manifest(provider_dir)
+
+                    if provider_manifest is None:
+                        staging_dir = f"{provider_dir}.tmp-{os.getpid()}"
+                        if os.path.exists(staging_dir):
+                            shutil.rmtree(staging_dir)
+
+                        staging_dirs[address] = staging_dir
+                        provider_manifest = {scope: [] for scope in SCHEMA_SCOPES}
+
+                    manifest["provider_schemas"][address] = dict(
+                        provider_manifest, path=provider_dir
+                    )
+
+                # The provider is already in the user-level cache
+                if address not in staging_dirs:
+                    continue
+
+                if scope == "provider":
+                    self._write_shard(
+                        slim_schema(item_schema), staging_dirs[address], "provider.json"
+                    )
+                else:
+                    manifest["provider_schemas"][address][scope].append(name)
+                    self._write_shard(
+                        slim_schema(item_schema), staging_dirs[address], scope, f"{name}.json"
+                    )
+
+            for address, staging_dir in staging_dirs.items():
+                provider_manifest = manifest["provider_schemas"][address]
+                for scope in SCHEMA_SCOPES:
+                    provider_manifest[scope].sort()
+
+                self._write_shard(
+                    {scope: provider_manifest[scope] for scope in SCHEMA_SCOPES},
+                    staging_dir,
+                    "manifest.json",
+                )
+        except BaseException:
+            for staging_dir in staging_dirs.values():
+                shutil.rmtree(staging_dir, ignore_errors=True)
+            raise
+
+        for address, staging_dir in staging_dirs.items():
+            provider_dir = manifest["provider_schemas"][address]["path"]
+
+            if os.path.exists(provider_dir):
+                shutil.rmtree(provider_dir)
+            os.replace(staging_dir, provider_dir)
+
+        self._write_manifest(manifest)
+
+
+class IndexedSchemaStore(SchemaStore):
+    """
+    Schema cache that keeps the full schema in one file with a byte offset index.
+
+    The index maps every provider, resource, and data source schema to its byte range in
+    the schema file. Lookups memory-map the file and decode only the requested range, so
+    processes that touch a handful of resources never parse or hold the whole schema.
+    """
+
+    def __init__(self, filename: str = SCHEMA_FILE):
+        self.filename = filename
+        self._manifest = None
+        self._index = None
+        self._mmap = None
+
+    @property
+    def index_filename(self) -> str:
+        return f"{os.path.splitext(self.filename)[0]}.index.json"
+
+    def exists(self) -> bool:
+        if not (os.path.exists(self.filename) and os.path.exists(self.index_filename)):
+            return False
+
+        # Guard against a schema file that was replaced without rebuilding the index
+        return os.path.getsize(self.filename) == self._read_index()["size"]
+
+    def _read_index(self) -> dict:
+        if self._index is None:
+            with open(self.index_filename, "r") as f:
+                self._index = json.load(f)
+
+        return self._index
+
+    @property
+    def manifest(self) -> dict:
+        if self._manifest is None:
+            self._manifest = self._read_index()["manifest"]
+
+        return self._manifest
+
+    def _read_range(self, key: str) -> dict:
+        if self._mmap is None:
+            with open(self.filename, "rb") as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        start, end = self._read_index()["offsets"][key]
+        return json.loads(self._mmap[start:end])
+
+    def close(self) -> None:
+        """
+        Unmap the schema file. It is mapped again on the next read.
+        """
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def read_provider(self, address: str) -> dict:
+        return self._read_range(f"provider_schemas/{address}/provider")
+
+    def read_schema(self, address: str, scope: str, name: str) -> dict:
+        return self._read_range(f"provider_schemas/{address}/{scope}/{name}")
+
+    def write_items(self, items, key: str = None, versions: dict = None, overwrite: bool = False) -> None:
+        """
+        Replace the cache with (address, scope, name, schema) tuples.
+
+        The schema file is written piece by piece as the items arrive, so the byte range
+        of every schema is known without parsing the file again. Items must be grouped by
+        provider and scope, which is the order terraform produces them in. The schema file
+        belongs to a single project, so provider versions are not used.
+        """
+        manifest = {"key": key, "provider_schemas": {}}
+        offsets = {}
+
+        # The old schema file must not stay mapped once it is replaced
+        self.close()
+
+        with atomic_write(self.filename, "wb") as f:
+
+            def write(text):
+                f.write(text.encode("utf-8"))
+
+            write('{"format_version":"1.0","provider_schemas":{')
+
+            current_address = None
+            current_scope = None
+
+            for address, scope, name, item_schema in items:
+                if address != current_address:
+                    if current_scope not in (None, "provider"):
+                        write("}")
+                    if current_address is not None:
+                        write("},")
+
+                    write(json.dumps(address) + ":{")
+                    manifest["provider_schemas"][address] = {
+                        scope: [] for scope in SCHEMA_SCOPES
+                    }
+                    current_address = address
+                    current_scope = None
+
+                if scope != current_scope:
+                    if current_scope not in (None, "provider"):
+                        write("}")
+                    if current_scope is not None:
+                        write(",")
+
+                    write(json.dumps(scope) + ":")
+                    if scope != "provider":
+                        write("{")
+                    current_scope = scope
+                elif scope != "provider":
+                    write(",")
+
+                if scope == "provider":
+                    offset_key = f"provider_schemas/{address}/provider"
+                else:
+                    offset_key = f"provider_schemas/{address}/{scope}/{name}"
+                    manifest["provider_schemas"][address][scope].append(name)
+                    write(json.dumps(name) + ":")
+
+                start = f.tell()
+                write(json.dumps(item_schema, separators=(",", ":")))
+                offsets[offset_key] = [start, f.tell()]
+
+            if current_scope not in (None, "provider"):
+                write("}")
+            if current_address is not None:
+                write("}")
+
+            write("}}")
+            size = f.tell()
+
+        for provider_manifest in manifest["provider_schemas"].values():
+            for scope in SCHEMA_SCOPES:
+                provider_manifest[scope].sort()
+
+        # The index is replaced atomically too, so readers never see a partial index
+        write_file_atomically(
+            self.index_filename,
+            json.dumps({"size": size, "manifest": manifest, "offsets": offsets}),
+        )
+
+        self._manifest = manifest
+        self._index = None
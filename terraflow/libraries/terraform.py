@@ -1,12 +1,17 @@
 from dataclasses import asdict
-import re
 import os
+import json
+import time
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
 
 # from terraflow.libraries.schema import get_schema, get_provider_schema, get_resource_schema, get_data_schema
 from terraflow.libraries.schema import Schema
 from terraflow.libraries.helpers import (
-    get_provider_version,
-    get_terraform_version,
+    find_terraform_files,
+    get_module_path,
+    read_json_file,
+    write_file_atomically,
     filter_attributes,
     filter_blocks,
 )
@@ -14,7 +19,7 @@ from terraflow.libraries.formatting import (
     format_attribute,
     format_block_header,
     format_resource_header,
-    format_terraform_code,
+    CodeWriter,
 )
 from terraflow.libraries.configuration import (
     Configuration,
@@ -25,112 +30,320 @@ from terraflow.libraries.configuration import (
     OutputConfiguration,
 )
 from terraflow.libraries.docs import TerraformDocumentation
-from terraflow.libraries.constants import VALID_TYPES
+from terraflow.libraries.toolchain import get_toolchain_info
+from terraflow.libraries.hcl import scan_blocks
+from terraflow.libraries.constants import CODE_INDEX_FILE, VALID_TYPES
+
+
+def _parse_components(file_name: str, content: bytes) -> list:
+    """
+    Extract the components with a name from the content of a file.
+
+    This is a module-level function so files can be parsed in worker processes.
+    """
+    components = []
+    module = get_module_path(file_name)
+
+    for block in scan_blocks(content.decode("utf-8")):
+        if not block.labels:
+            continue
+
+        components.append(
+            {
+                "id": block.id,
+                "type": block.type,
+                "kind": block.kind,
+                "name": block.name,
+                "module": module,
+                "filename": file_name,
+                "start": block.start,
+                "end": block.end,
+            }
+        )
+
+    return components
+
+
+def _parse_file(task):
+    return _parse_components(*task)
+
+
+class _Component(dict):
+    """
+    A component whose code is read from its file the first time `component["code"]` is used.
+    """
+
+    def __init__(self, loader, values: dict):
+        super().__init__(values)
+        self._loader = loader
+
+    def __missing__(self, key):
+        if key != "code":
+            raise KeyError(key)
+
+        self["code"] = self._loader._read_text(self["filename"])[self["start"]:self["end"]]
+        return self["code"]
 
 
 class CodeLoader:
     """
     Class responsible for loading and parsing Terraform code files.
+
+    The components of each file are kept in a persistent index together with the
+    modification time, size, and hash of the file, so only files that changed since the
+    last load are read and parsed again. The index only stores the offsets of each
+    component; its code is read from the file when it is first used. Lookups go through
+    dictionaries keyed by id, type, kind, name, and module.
+
+    By default only the root module in the current directory is loaded. In recursive mode
+    the nested modules are loaded too and every component records the path of its module,
+    such as 'modules/network'. Ids are unique per module.
     """
 
-    def __init__(self, file_extensions: list = [".tf"]):
+    # Increase when the format of the index or of the components changes
+    INDEX_VERSION = 3
+    # Files modified this close to the time they were indexed are hashed again on the next
+    # load, since a change within the resolution of the clock keeps the same modification time
+    RACY_INTERVAL_NS = 2_000_000_000
+    # Files are parsed by a pool of processes when at least this many changed
+    PARALLEL_PARSE_THRESHOLD = 64
+
+    def __init__(
+        self,
+        file_extensions: list = [".tf"],
+        index_filename: str = CODE_INDEX_FILE,
+        recursive: bool = False,
+        max_workers: int = None,
+    ):
         self.file_extensions = file_extensions
-        self.code = ""
+        self.index_filename = index_filename
+        self.recursive = recursive
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._code = None
+        self._texts = {}
         self.components = self._extract_components()
+        self._build_lookups()
 
-    def _read_file(self, file_name: str) -> str:
+    @property
+    def code(self) -> str:
         """
-        Read a file and return its content as a string.
+        The code of all loaded files, each followed by a newline.
         """
-        with open(file_name, "r") as file:
-            content = file.read() + "\n"
-        self.code += content
-        return content
+        if self._code is None:
+            self._code = "".join(self._read_text(file_name) + "\n" for file_name in self._files)
+        return self._code
 
-    def _extract_components(self):
-        # Store each component and its corresponding details
-        components = []
+    def _read_text(self, file_name: str) -> str:
+        """
+        Read the text of a loaded file once.
+        """
+        if file_name not in self._texts:
+            self._texts[file_name] = self._read_file(file_name).decode("utf-8")
+        return self._texts[file_name]
+
+    def _read_file(self, file_name: str) -> bytes:
+        """
+        Read a file and return its content as bytes.
+        """
+        with open(file_name, "rb") as file:
+            return file.read()
+
+    def _read_index(self) -> dict:
+        """
+        Read the entries of the persistent index, or an empty index if it is missing or stale.
+        """
+        try:
+            data = read_json_file(self.index_filename)
+        except (OSError, ValueError):
+            return {}
+
+        if not isinstance(data, dict) or data.get("version") != self.INDEX_VERSION:
+            return {}
+
+        return data.get("files", {})
+
+    def _write_index(self, files: dict) -> None:
+        try:
+            os.makedirs(os.path.dirname(self.index_filename) or ".", exist_ok=True)
+            write_file_atomically(
+                self.index_filename, json.dumps({"version": self.INDEX_VERSION, "files": files})
+            )
+        except OSError:
+            pass
 
-        # Loop through all files with the provided extensions in the current directory
-        for file_name in os.listdir(os.getcwd()):
-            if any(file_name.endswith(extension) for extension in self.file_extensions):
-                content = self._read_file(file_name)
+    def _is_current(self, entry: dict, stat) -> bool:
+        """
+        Whether the index entry of a file can be used without reading the file.
+        """
+        return (
+            entry is not None
+            and entry["mtime"] == stat.st_mtime_ns
+            and entry["size"] == stat.st_size
+            and entry["indexed"] - entry["mtime"] > self.RACY_INTERVAL_NS
+        )
 
-                # Extract all Terraform components
-                pattern = (
-                    rf'((?:#.*\n)*?^(.*?)\s+(?:"(.*?)"\s+)?\s?"(.*?)"\s+{{[\s\S]*?^}}$)'
+    def _parse_files(self, tasks: list) -> list:
+        """
+        Parse (file_name, content) tasks, in a pool of processes if there are many of them.
+        """
+        if len(tasks) < self.PARALLEL_PARSE_THRESHOLD or self.max_workers == 1:
+            return [_parse_components(*task) for task in tasks]
+
+        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(
+                executor.map(
+                    _parse_file,
+                    tasks,
+                    chunksize=max(1, len(tasks) // (self.max_workers * 4)),
                 )
-                matches = re.findall(pattern, content, re.MULTILINE)
-
-                for match in matches:
-                    component = {
-                        "id": f'{match[1]}.{match[2] + "." if match[2] else ""}{match[3]}',
-                        "code": match[0],
-                        "type": match[1],
-                        "kind": match[2] if match[2] else None,
-                        "name": match[3],
-                        "filename": file_name,
-                    }
-                    components.append(component)
-
-        return components
-
-    def get_components(self, type: str = None, kind: str = None, name: str = None):
+            )
+
+    def _extract_components(self):
+        index = self._read_index()
+        self._files = find_terraform_files(self.file_extensions, recursive=self.recursive)
+
+        files = {}
+        tasks = []
+        changed = False
+
+        for file_name in self._files:
+            entry = index.get(file_name)
+            stat = os.stat(file_name)
+
+            if self._is_current(entry, stat):
+                files[file_name] = entry
+                continue
+
+            content = self._read_file(file_name)
+            digest = hashlib.sha256(content).hexdigest()
+            files[file_name] = {
+                "mtime": stat.st_mtime_ns,
+                "size": stat.st_size,
+                "hash": digest,
+                "indexed": time.time_ns(),
+                "components": entry["components"] if entry and entry["hash"] == digest else None,
+            }
+            if files[file_name]["components"] is None:
+                tasks.append((file_name, content))
+            changed = True
+
+        for (file_name, content), components in zip(tasks, self._parse_files(tasks)):
+            files[file_name]["components"] = components
+            self._texts[file_name] = content.decode("utf-8")
+
+        # The nested modules are kept in the index when only the root module is loaded,
+        # unless their files were deleted
+        if not self.recursive:
+            for file_name, entry in index.items():
+                if get_module_path(file_name) != "." and os.path.isfile(file_name):
+                    files.setdefault(file_name, entry)
+
+        if changed or set(files) != set(index):
+            self._write_index(files)
+
+        return [
+            _Component(self, component)
+            for file_name in self._files
+            for component in files[file_name]["components"]
+        ]
+
+    def _build_lookups(self):
+        """
+        Index the components by module and id, and by type, kind, name, and module.
+        """
+        self._by_id = {}
+        self._by_field = {"type": {}, "kind": {}, "name": {}, "module": {}}
+
+        for component in self.components:
+            # Duplicate ids resolve to the first component in the order of the files
+            self._by_id.setdefault((component["module"], component["id"]), component)
+
+            for field, lookup in self._by_field.items():
+                lookup.setdefault(component[field], []).append(component)
+
+    def get_components(
+        self, type: str = None, kind: str = None, name: str = None, module: str = None
+    ):
         """
-        Return a list of components that match the provided type, kind, and/or name.
+        Return a list of components that match the provided type, kind, name, and/or module.
 
         Args:
             type (str, optional): The type of the component (e.g., 'resource', 'variable'). Defaults to None.
             kind (str, optional): The kind of the component (e.g., 'azurerm_resource_group'). Defaults to None.
             name (str, optional): The name of the component. Defaults to None.
+            module (str, optional): The path of the module (e.g., '.', 'modules/network'). Defaults to None.
 
         Returns:
             List[Dict]: A list of components matching the provided criteria.
         """
-        filtered_components = self.components
-
-        if type is not None:
-            filtered_components = [
-                comp for comp in filtered_components if comp["type"] == type
-            ]
-
-        if kind is not None:
-            filtered_components = [
-                comp for comp in filtered_components if comp["kind"] == kind
-            ]
-
-        if name is not None:
-            filtered_components = [
-                comp for comp in filtered_components if comp["name"] == name
-            ]
+        criteria = {
+            field: value
+            for field, value in [("type", type), ("kind", kind), ("name", name), ("module", module)]
+            if value is not None
+        }
+
+        if not criteria:
+            return list(self.components)
+
+        # Start from the smallest matching list and check the other criteria on it
+        candidates = min(
+            (self._by_field[field].get(value, []) for field, value in criteria.items()),
+            key=len,
+        )
 
-        return filtered_components
+        return [
+            component
+            for component in candidates
+            if all(component[field] == value for field, value in criteria.items())
+        ]
 
-    def get_component_id_list(self):
+    def get_component_id_list(self, module: str = None):
         """
         Return a list of component ids.
 
+        Args:
+            module (str, optional): Only list the components of this module. Defaults to all modules.
+
         Returns:
             List[str]: A list of component ids.
         """
-        return [component["id"] for component in self.components]
+        return [component["id"] for component in self.get_components(module=module)]
 
     # TODO: Determine if it makes more sense to get components by id or by type, kind, and name
-    def get_component_by_id(self, id):
+    def get_component_by_id(self, id, module: str = "."):
         """
         Return a specific component by its id.
 
         Args:
             id (str): The id of the component.
+            module (str, optional): The path of the module. Defaults to the root module.
 
         Returns:
             Dict: The component that matches the provided id or None if no match is found.
         """
-        for component in self.components:
-            if component["id"] == id:
-                return component
+        return self._by_id.get((module, id))
 
-        return None
+    def get_module_tree(self) -> dict:
+        """
+        Return the loaded modules as a tree.
+
+        Returns:
+            Dict: The root module, where each module is a dictionary with its "path", its
+            "components", and its nested "modules" by directory name.
+        """
+        tree = {"path": ".", "components": [], "modules": {}}
+
+        for module in sorted(self._by_field["module"]):
+            node = tree
+            if module != ".":
+                for part in module.split("/"):
+                    path = part if node["path"] == "." else f"{node['path']}/{part}"
+                    node = node["modules"].setdefault(
+                        part, {"path": path, "components": [], "modules": {}}
+                    )
+            node["components"] = self._by_field["module"][module]
+
+        return tree
 
 
 class TerraformBase:
@@ -148,15 +361,18 @@ class TerraformBase:
         name: str = None,
         kind: str = None,
         configuration: Configuration = None,
+        documentation_source=None,
     ):
+        toolchain = get_toolchain_info()
+
         self.schema = schema
-        self.terraform_version = get_terraform_version()
+        self.terraform_version = toolchain.terraform_version
         self.namespace = namespace
         self.provider = provider
         self.provider_version = (
             provider_version
             if provider_version
-            else get_provider_version(self.provider, self.namespace)
+            else toolchain.get_provider_version(self.provider, self.namespace)
         )
         self.kind = kind
         self.type = type
@@ -171,6 +387,7 @@ class TerraformBase:
             version=self.provider_version,
             kind=self.kind,
             type=self.type,
+            source=documentation_source,
         )
 
 
@@ -179,12 +396,12 @@ class TerraformCodeMixin:
     Class responsible for generating Terraform code.
     """
 
-    def _write_body_code(self, schema: dict, docs=None, block_hierarchy: list = None):
+    def _write_body_code(
+        self, schema: dict, writer: CodeWriter, block_hierarchy: list = None
+    ) -> None:
         """
         Writes the main body of the Terraform code using provided schema.
         """
-        code = ""
-
         if block_hierarchy is None:
             block_hierarchy = []
 
@@ -211,14 +428,16 @@ class TerraformCodeMixin:
             id = ".".join(block_hierarchy + [attribute])
 
             # Write line
-            code += format_attribute(
-                attribute=attribute,
-                attribute_schema=attribute_schema,
-                attribute_description=self.documentation.metadata.get(id, {}).get(
-                    "description", None
-                ),
-                block_hierarchy=block_hierarchy,
-                configuration=self.configuration,
+            writer.write(
+                format_attribute(
+                    attribute=attribute,
+                    attribute_schema=attribute_schema,
+                    attribute_description=self.documentation.metadata.get(id, {}).get(
+                        "description", None
+                    ),
+                    block_hierarchy=block_hierarchy,
+                    configuration=self.configuration,
+                )
             )
 
         # Loop through blocks
@@ -230,22 +449,27 @@ class TerraformCodeMixin:
                 block=block,
                 block_hierarchy=updated_block_hierarchy,
             )
-            code += header
             # Recursive call to handle nested blocks
-            code += self._write_body_code(
-                schema=block_schema,
-                docs=self.documentation.metadata,
-                block_hierarchy=updated_block_hierarchy,
-            )
-            code += footer
-
-        return code
+            with writer.block(header, footer):
+                self._write_body_code(
+                    schema=block_schema,
+                    writer=writer,
+                    block_hierarchy=updated_block_hierarchy,
+                )
 
-    def _write_code(self, schema: dict):
+    def _write_code(self, schema: dict, stream=None) -> str:
         """
         Generates the terraform code for a specific type.
+
+        Args:
+            schema: The schema of the provider, resource, or data source.
+            stream: Optional; a file-like object the code is written to instead of
+                being returned.
+
+        Returns:
+            The formatted code, or an empty string if it was written to the stream.
         """
-        code = ""
+        writer = CodeWriter(stream=stream)
 
         header, footer = format_resource_header(
             type=self.type,
@@ -261,14 +485,10 @@ class TerraformCodeMixin:
         )
 
         # Write code
-        code += header
-        code += self._write_body_code(schema)
-        code += footer
+        with writer.block(header, footer):
+            self._write_body_code(schema, writer)
 
-        # Format code
-        code = format_terraform_code(code)
-
-        return code
+        return writer.getvalue()
 
 
 class TerraformProvider(TerraformBase, TerraformCodeMixin):
@@ -282,6 +502,7 @@ class TerraformProvider(TerraformBase, TerraformCodeMixin):
         name: str = None,
         kind: str = None,
         configuration: ProviderConfiguration = None,
+        documentation_source=None,
     ):
         super().__init__(
             schema,
@@ -292,6 +513,7 @@ class TerraformProvider(TerraformBase, TerraformCodeMixin):
             name,
             kind,
             configuration,
+            documentation_source,
         )
 
         provider_schema = self.schema.get_provider_schema(
@@ -313,6 +535,7 @@ class TerraformResource(TerraformBase, TerraformCodeMixin):
         type: str = "resource",
         name: str = "main",
         configuration: ResourceConfiguration = None,
+        documentation_source=None,
     ):
         super().__init__(
             schema,
@@ -323,6 +546,7 @@ class TerraformResource(TerraformBase, TerraformCodeMixin):
             name,
             kind,
             configuration,
+            documentation_source,
         )
 
         resource_schema = self.schema.get_resource_schema(
@@ -345,6 +569,7 @@ class TerraformDataSource(TerraformBase, TerraformCodeMixin):
         type: str = "data",
         name: str = "main",
         configuration: DataSourceConfiguration = None,
+        documentation_source=None,
     ):
         super().__init__(
             schema,
@@ -355,6 +580,7 @@ class TerraformDataSource(TerraformBase, TerraformCodeMixin):
             name,
             kind,
             configuration,
+            documentation_source,
         )
 
         data_source_schema = self.schema.get_data_schema(
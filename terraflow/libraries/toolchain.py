@@ -0,0 +1,177 @@
+import os
+import shutil
+import hashlib
+import threading
+from functools import lru_cache
+
+from .constants import LOCK_FILE, TOOLCHAIN_CACHE_FILE
+from .lockfile import get_provider_requirements, read_lock_file
+from .helpers import (
+    get_provider_version,
+    get_terraform_version,
+    read_json_file,
+    write_json_file,
+)
+
+
+class ToolchainInfo:
+    """
+    Resolves the Terraform and provider versions for a configuration once per process.
+
+    The terraform version and the provider versions from the lock file are persisted to
+    `.terraflow/toolchain.json` together with a key built from the provider lock file and
+    the terraform binary, so later runs reuse them until either of those changes. Exact
+    versions pinned in `required_providers` are not part of the key, so they are only kept
+    for the current process.
+    """
+
+    def __init__(self, filename: str = TOOLCHAIN_CACHE_FILE, lock_file: str = LOCK_FILE):
+        self.filename = filename
+        self.lock_file = lock_file
+        self.key = self._get_cache_key()
+        self._lock = threading.Lock()
+        self._data = self._read_cache()
+        self._pinned_versions = {}
+        self._latest_versions = {}
+
+    def _get_cache_key(self) -> str:
+        """
+        Build the cache key from the lock file contents and the terraform binary.
+        """
+        digest = hashlib.sha256()
+
+        if os.path.exists(self.lock_file):
+            with open(self.lock_file, "rb") as f:
+                digest.update(f.read())
+
+        binary = shutil.which("terraform")
+        if binary:
+            stat = os.stat(binary)
+            digest.update(f"{binary}:{stat.st_size}:{stat.st_mtime_ns}".encode("utf-8"))
+
+        return digest.hexdigest()
+
+    def _read_cache(self) -> dict:
+        """
+        Read the persisted values, discarding them if the cache key no longer matches.
+        """
+        empty = {"key": self.key, "terraform_version": None, "providers": {}}
+
+        if not os.path.exists(self.filename):
+            return empty
+
+        try:
+            data = read_json_file(self.filename)
+        except (OSError, ValueError):
+            return empty
+
+        if data.get("key") != self.key:
+            return empty
+
+        return data
+
+    def _write_cache(self) -> None:
+        try:
+            os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+            write_json_file(self.filename, self._data)
+        except OSError:
+            pass
+
+    @property
+    def terraform_version(self) -> str:
+        """
+        The version of the terraform binary on the PATH.
+        """
+        with self._lock:
+            if self._data["terraform_version"] is None:
+                self._data["terraform_version"] = get_terraform_version()
+                self._write_cache()
+
+            return self._data["terraform_version"]
+
+    def get_locked_provider_version(self, provider: str, namespace: str = "hashicorp") -> str:
+        """
+        Get the version of a provider from the lock file or an exact version constraint,
+        without using the network.
+
+        Args:
+            provider: The name of the provider.
+            namespace: The namespace of the provider.
+
+        Returns:
+            The provider version or None if the provider is not locked.
+        """
+        address = f"{namespace}/{provider}"
+
+        with self._lock:
+            if address in self._data["providers"]:
+                return self._data["providers"][address]
+
+            for requirement in read_lock_file(self.lock_file):
+                if (requirement.namespace, requirement.provider) == (namespace, provider):
+                    if requirement.version:
+                        self._data["providers"][address] = requirement.version
+                        self._write_cache()
+                        return requirement.version
+                    break
+
+            # Exact pins can change without the lock file changing, so they are read again
+            # by every process
+            if address not in self._pinned_versions:
+                directory = os.path.dirname(self.lock_file) or "."
+
+                for requirement in get_provider_requirements(directory):
+                    if (requirement.namespace, requirement.provider) == (namespace, provider):
+                        if not requirement.version:
+                            return None
+
+                        self._pinned_versions[address] = requirement.version
+                        break
+                else:
+                    return None
+
+            return self._pinned_versions[address]
+
+    def get_provider_version(self, provider: str, namespace: str = "hashicorp") -> str:
+        """
+        Get the version of a provider used by the configuration.
+
+        Providers that are not locked use the latest version in the registry. Only locked
+        versions are persisted, since the latest version changes without the lock file
+        changing.
+
+        Args:
+            provider: The name of the provider.
+            namespace: The namespace of the provider.
+
+        Returns:
+            The provider version or None if it could not be determined.
+        """
+        version = self.get_locked_provider_version(provider=provider, namespace=namespace)
+
+        if version is None:
+            address = f"{namespace}/{provider}"
+
+            with self._lock:
+                # Failed lookups are not kept so they are retried
+                if address not in self._latest_versions:
+                    latest_version = get_provider_version(provider=provider, namespace=namespace)
+                    if latest_version is None:
+                        return None
+                    self._latest_versions[address] = latest_version
+
+                version = self._latest_versions[address]
+
+        return version
+
+
+@lru_cache(maxsize=None)
+def _get_toolchain_info(directory: str) -> ToolchainInfo:
+    return ToolchainInfo()
+
+
+def get_toolchain_info() -> ToolchainInfo:
+    """
+    Return the shared ToolchainInfo for the current working directory.
+    """
+    return _get_toolchain_info(os.getcwd())
@@ -0,0 +1,140 @@
+import os
+import sys
+
+import pytest
+from click.testing import CliRunner
+
+from terraflow import terraflow
+from terraflow.libraries import options, toolchain
+from terraflow.libraries.docs import get_documentation_filepath
+
+LOCK_FILE_CONTENT = """provider "registry.terraform.io/hashicorp/azurerm" {
+  version = "3.45.0"
+}
+"""
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    """
+    A configuration with a lock file, where looking up a version in the registry fails the test.
+    """
+    def get_provider_version(provider, namespace):
+        raise AssertionError(f"The registry was asked for the version of {namespace}/{provider}")
+
+    monkeypatch.setattr(toolchain, "get_provider_version", get_provider_version)
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / ".terraform.lock.hcl").write_text(LOCK_FILE_CONTENT)
+    (tmp_path / "main.tf").write_text("")
+
+    docs_dir = tmp_path / "provider" / "website" / "docs"
+    docs_dir.mkdir(parents=True)
+    (docs_dir / "index.html.markdown").write_text("# Provider\n")
+
+    return tmp_path
+
+
+def test_docs_import_uses_locked_version(workspace):
+    result = CliRunner().invoke(
+        terraflow,
+        ["docs", "import", "--namespace", "hashicorp", "--provider", "azurerm", "--path", "provider"],
+    )
+
+    assert result.exit_code == 0, result.output
+    assert "Imported 1 documentation pages for hashicorp/azurerm 3.45.0" in result.output
+    assert os.path.exists(get_documentation_filepath("hashicorp", "azurerm", "3.45.0", "provider"))
+
+
+def test_docs_import_requires_version_for_unlocked_providers(workspace):
+    arguments = ["docs", "import", "--namespace", "integrations", "--provider", "github", "--path", "provider"]
+
+    result = CliRunner().invoke(terraflow, arguments)
+    assert result.exit_code == 0, result.output
+    assert 'The provider "integrations/github" is not in the lock file. Use --version' in result.output
+
+    result = CliRunner().invoke(terraflow, arguments + ["--version", "5.1.0"])
+    assert "Imported 1 documentation pages for integrations/github 5.1.0" in result.output
+
+
+def test_docs_prefetch_reports_unknown_version(workspace, monkeypatch):
+    monkeypatch.setattr(toolchain, "get_provider_version", lambda provider, namespace: None)
+
+    result = CliRunner().invoke(
+        terraflow, ["docs", "prefetch", "--namespace", "integrations", "--provider", "github"]
+    )
+
+    assert result.exit_code == 0, result.output
+    assert 'The version of the provider "integrations/github" could not be determined' in result.output
+
+
+@pytest.fixture
+def lookups(workspace, monkeypatch):
+    """
+    Record the calls to terraform and the lookups of the default namespace and provider.
+    """
+    calls = []
+    terraform = workspace / "bin" / "terraform"
+    terraform.parent.mkdir()
+    terraform.write_text(f'#!/bin/sh\necho "$@" >> "{workspace / "calls"}"\n')
+    terraform.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{terraform.parent}:{os.environ['PATH']}")
+
+    def get_cached_namespaces_and_providers():
+        calls.append("defaults")
+        return get_namespaces_and_providers()
+
+    get_namespaces_and_providers = options.get_cached_namespaces_and_providers
+    monkeypatch.setattr(options, "get_cached_namespaces_and_providers", get_cached_namespaces_and_providers)
+    options.get_default_options.cache_clear()
+    def get_lookups():
+        log = workspace / "calls"
+        return calls + (log.read_text().splitlines() if log.exists() else [])
+
+    yield get_lookups
+    options.get_default_options.cache_clear()
+
+
+@pytest.mark.parametrize(
+    "arguments",
+    [
+        ["--help"],
+        ["resource", "create", "--help"],
+        ["docs", "import", "--help"],
+        ["docs", "import", "--namespace", "hashicorp", "--provider", "azurerm", "--version", "3.45.0", "--path", "provider"],
+    ],
+)
+def test_defaults_are_not_resolved_when_not_needed(lookups, arguments):
+    result = CliRunner().invoke(terraflow, arguments)
+
+    assert result.exit_code == 0, result.output
+    assert lookups() == []
+
+
+def test_defaults_are_resolved_when_options_are_omitted(lookups):
+    result = CliRunner().invoke(terraflow, ["docs", "import", "--path", "provider"])
+
+    assert result.exit_code == 0, result.output
+    assert "Imported 1 documentation pages for hashicorp/azurerm 3.45.0" in result.output
+    assert lookups() == ["defaults"]
+
+
+@pytest.mark.parametrize(
+    "arguments, environment, storage",
+    [
+        ([], {}, "shards"),
+        (["--schema-storage", "index"], {}, "index"),
+        ([], {"TERRAFLOW_SCHEMA_STORAGE": "index"}, "index"),
+    ],
+)
+def test_schema_storage_option(workspace, monkeypatch, arguments, environment, storage):
+    storages = []
+
+    def load(storage="shards", **kwargs):
+        storages.append(storage)
+        raise SystemExit(1)
+
+    monkeypatch.setattr(sys.modules["terraflow"], "Schema", load)
+
+    result = CliRunner().invoke(terraflow, arguments + ["provider", "get"], env=environment)
+    assert result.exit_code == 1, result.output
+    assert storages == [storage]
@@ -0,0 +1,119 @@
+import os
+
+from terraflow.libraries.helpers import read_json_file
+from terraflow.libraries import terraform
+from terraflow.libraries.terraform import CodeLoader
+
+MAIN = '''resource "azurerm_resource_group" "main" {
+  name = var.name
+}
+
+resource "azurerm_resource_group" "other" {
+  name = "other"
+}
+'''
+VARIABLES = '''variable "name" {
+  type = string
+}
+'''
+
+
+def write(filename, text, mtime_ns=None):
+    with open(filename, "w") as f:
+        f.write(text)
+    if mtime_ns is not None:
+        os.utime(filename, ns=(mtime_ns, mtime_ns))
+
+
+def test_code_loader_lookups(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write("main.tf", MAIN)
+    write("variables.tf", VARIABLES)
+
+    loader = CodeLoader()
+
+    component = loader.get_component_by_id("resource.azurerm_resource_group.main")
+    assert component["filename"] == "main.tf"
+    assert MAIN[component["start"]:component["end"]] == component["code"]
+    assert loader.get_component_by_id("resource.azurerm_resource_group.missing") is None
+    assert [c["name"] for c in loader.get_components(kind="azurerm_resource_group")] == ["main", "other"]
+    assert [c["id"] for c in loader.get_components(type="variable", name="name")] == ["variable.name"]
+    assert loader.get_components(type="variable", name="main") == []
+    assert len(loader.get_components()) == 3
+    assert loader.code == MAIN + "\n" + VARIABLES + "\n"
+
+
+def test_code_loader_reparses_only_changed_files(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write("main.tf", MAIN, mtime_ns=1_000_000_000)
+    write("variables.tf", VARIABLES, mtime_ns=1_000_000_000)
+
+    CodeLoader()
+    index = read_json_file(os.path.join(".terraflow", "code_index.json"))
+    assert all("code" not in c for entry in index["files"].values() for c in entry["components"])
+
+    parsed = []
+    monkeypatch.setattr(
+        terraform,
+        "_parse_components",
+        lambda file_name, content: parsed.append(file_name) or [],
+    )
+
+    # Unchanged files are not parsed again
+    loader = CodeLoader()
+    assert parsed == []
+    assert loader.get_component_by_id("variable.name")["filename"] == "variables.tf"
+    assert loader.get_component_by_id("variable.name")["code"] == VARIABLES.rstrip()
+
+    # Touched files with the same content are hashed but not parsed
+    write("variables.tf", VARIABLES, mtime_ns=2_000_000_000)
+    CodeLoader()
+    assert parsed == []
+
+    write("main.tf", MAIN.replace("other", "renamed"), mtime_ns=3_000_000_000)
+    loader = CodeLoader()
+    assert parsed == ["main.tf"]
+    assert loader.get_components(type="resource") == []
+
+    os.remove("variables.tf")
+    assert CodeLoader().get_components() == []
+    assert list(read_json_file(os.path.join(".terraflow", "code_index.json"))["files"]) == ["main.tf"]
+
+
+def test_code_loader_recursive(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write("main.tf", MAIN)
+    for directory in ["modules/network", "modules/network/subnet", ".terraform/modules/remote", "build"]:
+        os.makedirs(directory)
+        write(os.path.join(directory, "main.tf"), MAIN)
+    write(os.path.join("modules", "network", "variables.tf"), VARIABLES)
+    write(".gitignore", "build/\n")
+    write(os.path.join("modules", ".terraflowignore"), "network/subnet\n")
+
+    assert [c["module"] for c in CodeLoader().get_components()] == [".", "."]
+
+    loader = CodeLoader(recursive=True)
+    assert sorted(loader.get_module_tree()["modules"]["modules"]["modules"]) == ["network"]
+    assert loader.get_component_id_list(module="modules/network") == [
+        "resource.azurerm_resource_group.main",
+        "resource.azurerm_resource_group.other",
+        "variable.name",
+    ]
+    assert loader.get_component_by_id("variable.name") is None
+    component = loader.get_component_by_id("variable.name", module="modules/network")
+    assert component["filename"] == os.path.join("modules", "network", "variables.tf")
+
+    # Deleted nested files are removed from the index when only the root module is loaded
+    os.remove(os.path.join("modules", "network", "variables.tf"))
+    CodeLoader()
+    assert sorted(read_json_file(os.path.join(".terraflow", "code_index.json"))["files"]) == [
+        "main.tf",
+        os.path.join("modules", "network", "main.tf"),
+    ]
+
+    # Parsing in worker processes gives the same components
+    monkeypatch.setattr(CodeLoader, "PARALLEL_PARSE_THRESHOLD", 1)
+    os.remove(os.path.join(".terraflow", "code_index.json"))
+    assert CodeLoader(recursive=True, max_workers=2).components == [
+        c for c in loader.components if c["filename"] != os.path.join("modules", "network", "variables.tf")
+    ]
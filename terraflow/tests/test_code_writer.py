@@ -0,0 +1,54 @@
+import io
+
+from terraflow.libraries.formatting import CodeWriter, format_terraform_code
+
+
+def write_example(writer):
+    with writer.block('# A comment\nresource "azurerm_resource_group" "main" {\n', "}\n"):
+        writer.write("name = var.name # The {name}\n")
+        writer.write("tags = {\nenvironment = var.environment\n}\n")
+
+        with writer.block("\n# This block is optional\ntimeouts {\n", "}\n"):
+            writer.write("create = var.timeouts_create\n")
+
+
+def test_code_writer():
+    writer = CodeWriter()
+    write_example(writer)
+
+    assert writer.getvalue() == (
+        "# A comment\n"
+        'resource "azurerm_resource_group" "main" {\n'
+        "  name = var.name # The {name}\n"
+        "  tags = {\n"
+        "    environment = var.environment\n"
+        "  }\n"
+        "\n"
+        "  # This block is optional\n"
+        "  timeouts {\n"
+        "    create = var.timeouts_create\n"
+        "  }\n"
+        "}\n"
+    )
+    assert writer.level == 0
+
+
+def test_code_writer_stream():
+    stream = io.StringIO()
+    write_example(CodeWriter(stream=stream))
+
+    writer = CodeWriter()
+    write_example(writer)
+
+    assert stream.getvalue() == writer.getvalue()
+
+
+def test_code_writer_matches_format_terraform_code():
+    code = 'provider "azurerm" {\nfeatures {\nskip = true\n}\n}\n'
+
+    writer = CodeWriter()
+    with writer.block('provider "azurerm" {\n', "}\n"):
+        with writer.block("features {\n", "}\n"):
+            writer.write("skip = true\n")
+
+    assert writer.getvalue() == format_terraform_code(code)
@@ -0,0 +1,106 @@
+import random
+
+from terraflow.libraries.helpers import (
+    ATTRIBUTE_DESCRIPTION_CACHE,
+    ATTRIBUTE_DESCRIPTION_CACHE_SIZE,
+    build_attribute_description_index,
+    calculate_levenshtein_distance,
+    calculate_normalized_edit_distance,
+    get_attribute_descriptions,
+    get_resource_attribute_description,
+)
+
+DOCUMENTATION_TEXT = """# azurerm_kubernetes_cluster
+## Arguments Reference
+`name` - (Required) The name of the Managed Kubernetes Cluster.
+`default_node_pool` - (Required) A `default_node_pool` block as defined below.
+`identity` -
+`type` - (Optional) The type of Managed Identity.
+A `default_node_pool` block supports the following:
+`name` - (Required) The name which should be used for the default Kubernetes Node Pool.
+## Attributes Reference
+`id` - The Kubernetes Managed Cluster ID.
+"""
+
+
+def test_build_attribute_description_index():
+    index = build_attribute_description_index(DOCUMENTATION_TEXT)
+
+    assert index["name"] == [
+        ("Arguments Reference", "The name of the Managed Kubernetes Cluster."),
+        (
+            "Arguments Reference",
+            "The name which should be used for the default Kubernetes Node Pool.",
+        ),
+    ]
+    assert index["id"] == [("Attributes Reference", "The Kubernetes Managed Cluster ID.")]
+    # An empty description runs onto the next line, like the per-attribute regex did
+    assert index["identity"] == [
+        ("Arguments Reference", "`type` - (Optional) The type of Managed Identity.")
+    ]
+    assert index["type"] == [("Arguments Reference", "The type of Managed Identity.")]
+
+
+def test_get_resource_attribute_description_from_index():
+    index = build_attribute_description_index(DOCUMENTATION_TEXT)
+
+    for attribute, block_hierarchy in [
+        ("name", None),
+        ("name", ["default_node_pool"]),
+        ("id", None),
+        ("missing", None),
+    ]:
+        assert get_resource_attribute_description(
+            DOCUMENTATION_TEXT, attribute, block_hierarchy, description_index=index
+        ) == get_resource_attribute_description(DOCUMENTATION_TEXT, attribute, block_hierarchy)
+
+    assert (
+        get_resource_attribute_description(
+            DOCUMENTATION_TEXT, "name", ["default_node_pool"], description_index=index
+        )
+        == "The name which should be used for the default Kubernetes Node Pool."
+    )
+
+
+def test_calculate_normalized_edit_distance():
+    rng = random.Random(0)
+    pairs = [("", ""), ("", "abc"), ("Kitten", "sitting"), ("a" * 130, "b" + "a" * 140)]
+    pairs += [
+        tuple("".join(rng.choices("abcAB _", k=rng.randint(0, 80))) for _ in range(2))
+        for _ in range(500)
+    ]
+
+    for s, t in pairs:
+        assert calculate_normalized_edit_distance(s, t) == calculate_levenshtein_distance(s, t)
+
+
+def test_get_attribute_descriptions():
+    ATTRIBUTE_DESCRIPTION_CACHE.clear()
+    attributes = [("name", []), ("name", ["default_node_pool"]), ("id", [])]
+
+    descriptions = get_attribute_descriptions(
+        DOCUMENTATION_TEXT, attributes, resource="azurerm_kubernetes_cluster"
+    )
+
+    for attribute, block_hierarchy in attributes:
+        assert descriptions[(attribute, tuple(block_hierarchy))] == (
+            get_resource_attribute_description(DOCUMENTATION_TEXT, attribute, block_hierarchy)
+        )
+
+    # The results are memoized per resource and documentation text
+    assert get_attribute_descriptions(
+        DOCUMENTATION_TEXT, attributes, resource="azurerm_kubernetes_cluster"
+    ) is descriptions
+
+
+def test_attribute_description_cache_is_bounded():
+    ATTRIBUTE_DESCRIPTION_CACHE.clear()
+    attributes = [("name", [])]
+
+    first = get_attribute_descriptions(DOCUMENTATION_TEXT, attributes, resource="resource_0")
+    for i in range(1, ATTRIBUTE_DESCRIPTION_CACHE_SIZE * 2):
+        get_attribute_descriptions(DOCUMENTATION_TEXT, attributes, resource=f"resource_{i}")
+        # Recently used resources are kept
+        assert get_attribute_descriptions(DOCUMENTATION_TEXT, attributes, resource="resource_0") is first
+
+    assert len(ATTRIBUTE_DESCRIPTION_CACHE) == ATTRIBUTE_DESCRIPTION_CACHE_SIZE
@@ -0,0 +1,346 @@
+import os
+import json
+import tarfile
+import threading
+import warnings
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from terraflow.libraries import doc_sources
+from terraflow.libraries.doc_sources import (
+    LocalDocumentationSource,
+    RegistryDocumentationSource,
+)
+from terraflow.libraries.docs import (
+    DocumentationSections,
+    TerraformDocumentation,
+    get_documentation_filepath,
+    get_metadata_filepath,
+    import_documentation,
+    prefetch_documentation,
+)
+
+RESOURCE_GROUP_DOC = """---
+subcategory: "Base"
+layout: "azurerm"
+page_title: "Azure Resource Manager: azurerm_resource_group"
+---
+
+# azurerm_resource_group
+
+## Arguments Reference
+
+* `location` - (Required) The Azure Region where the Resource Group should exist.
+
+* `tags` - (Optional) A mapping of tags.
+"""
+
+
+class FakeSchema:
+    manifest = {
+        "provider_schemas": {
+            "registry.terraform.io/hashicorp/azurerm": {
+                "resource_schemas": ["azurerm_resource_group", "azurerm_subnet"],
+                "data_source_schemas": ["azurerm_client_config"],
+            }
+        }
+    }
+
+
+def test_prefetch_documentation(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    urls = []
+
+    def scrape_website(url, tag=None):
+        urls.append(url)
+        return None if url.endswith("/r/subnet.html.markdown") else f"# {url}"
+
+    monkeypatch.setattr(doc_sources, "scrape_website", scrape_website)
+
+    results = prefetch_documentation(FakeSchema(), "hashicorp", "azurerm", "3.45.0")
+    assert results == {"cached": 0, "downloaded": 3, "failed": 1}
+    assert os.path.exists(
+        get_documentation_filepath("hashicorp", "azurerm", "3.45.0", "data", "client_config")
+    )
+
+    # Only the page that failed is downloaded again
+    urls.clear()
+    results = prefetch_documentation(FakeSchema(), "hashicorp", "azurerm", "3.45.0")
+    assert results == {"cached": 3, "downloaded": 0, "failed": 1}
+    assert urls == [
+        "https://github.com/hashicorp/terraform-provider-azurerm/blob/v3.45.0/website/docs/r/subnet.html.markdown"
+    ]
+
+
+def test_local_documentation_source(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    docs_dir = tmp_path / "terraform-provider-azurerm-3.45.0" / "website" / "docs"
+    (docs_dir / "r").mkdir(parents=True)
+    (docs_dir / "d").mkdir()
+    (docs_dir / "index.html.markdown").write_text("# Azure Provider\n")
+    (docs_dir / "r" / "resource_group.html.markdown").write_text(RESOURCE_GROUP_DOC)
+    (docs_dir / "d" / "client_config.html.markdown").write_text("# azurerm_client_config\n")
+
+    tarball = tmp_path / "azurerm.tar.gz"
+    with tarfile.open(tarball, "w:gz") as archive:
+        archive.add(tmp_path / "terraform-provider-azurerm-3.45.0", "terraform-provider-azurerm-3.45.0")
+
+    for path in [tmp_path / "terraform-provider-azurerm-3.45.0", tarball]:
+        source = LocalDocumentationSource(str(path))
+
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            documents = list(source.iter_documents("hashicorp", "azurerm", "3.45.0"))
+        assert not [w for w in caught if issubclass(w.category, ResourceWarning)]
+        assert sorted((type, kind) for type, kind, _ in documents) == [
+            ("data", "client_config"),
+            ("provider", None),
+            ("resource", "resource_group"),
+        ]
+
+        text = source.get_text("hashicorp", "azurerm", "3.45.0", "resource", "resource_group")
+        assert text.startswith("# azurerm_resource_group")
+        assert "\n`location` - (Required) The Azure Region" in text
+
+    results = import_documentation(source, "hashicorp", "azurerm", "3.45.0")
+    assert results == {"cached": 0, "imported": 3, "failed": 0}
+    assert os.path.exists(get_documentation_filepath("hashicorp", "azurerm", "3.45.0", "provider"))
+
+
+def test_local_documentation_source_prefers_legacy_layout(tmp_path):
+    repository = tmp_path / "terraform-provider-azurerm-3.45.0"
+    (repository / "docs" / "resources").mkdir(parents=True)
+    (repository / "website" / "docs" / "r").mkdir(parents=True)
+    (repository / "docs" / "resources" / "x.md").write_text("# registry\n")
+    (repository / "website" / "docs" / "r" / "x.html.markdown").write_text("# legacy\n")
+
+    # The registry page comes first in the archive
+    tarball = tmp_path / "azurerm.tar.gz"
+    with tarfile.open(tarball, "w:gz") as archive:
+        archive.add(repository / "docs", "repository/docs")
+        archive.add(repository / "website", "repository/website")
+
+    for path in [repository, tarball]:
+        source = LocalDocumentationSource(str(path))
+        text = source.get_text("hashicorp", "azurerm", "3.45.0", "resource", "x")
+        assert text == "# legacy\n"
+
+
+REGISTRY_DOCS = {
+    "1": ("overview", "index", "# Azure Provider\n"),
+    "2": ("resources", "resource_group", RESOURCE_GROUP_DOC),
+    "3": ("resources", "subnet", "# azurerm_subnet\n"),
+    "4": ("resources", "virtual_network", "# azurerm_virtual_network\n"),
+    "5": ("data-sources", "client_config", "# azurerm_client_config\n"),
+    "6": ("guides", "features_block", "# Features Block\n"),
+}
+
+
+class RegistryHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+
+        if url.path == "/v2/providers/hashicorp/azurerm":
+            body = {
+                "included": [
+                    {"type": "provider-versions", "id": "10", "attributes": {"version": "3.44.0"}},
+                    {"type": "provider-versions", "id": "11", "attributes": {"version": "3.45.0"}},
+                ]
+            }
+        elif url.path == "/v2/provider-docs" and query["filter[provider-version]"] == "11":
+            entries = [
+                {"id": id, "attributes": {"category": category, "slug": slug}}
+                for id, (category, slug, _) in REGISTRY_DOCS.items()
+                if category == query["filter[category]"]
+                and slug == query.get("filter[slug]", slug)
+            ]
+            size = int(query["page[size]"])
+            start = (int(query["page[number]"]) - 1) * size
+            body = {"data": entries[start : start + size]}
+        elif url.path.startswith("/v2/provider-docs/"):
+            _, _, content = REGISTRY_DOCS[url.path.rsplit("/", 1)[-1]]
+            body = {"data": {"attributes": {"content": content}}}
+        else:
+            self.send_response(404)
+            self.end_headers()
+            return
+
+        self.server.requests.append(url.path)
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+@pytest.fixture
+def registry():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), RegistryHandler)
+    server.requests = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_registry_documentation_source(tmp_path, monkeypatch, registry):
+    monkeypatch.chdir(tmp_path)
+
+    source = RegistryDocumentationSource(
+        base_url=f"http://127.0.0.1:{registry.server_port}", page_size=1
+    )
+
+    text = source.get_text("hashicorp", "azurerm", "3.45.0", "resource", "resource_group")
+    assert text.startswith("# azurerm_resource_group")
+    assert "\n`location` - (Required)" in text
+    assert source.get_text("hashicorp", "azurerm", "3.45.0", "resource", "missing") is None
+
+    # The subnet page is cached, so its contents are not downloaded
+    cached = get_documentation_filepath("hashicorp", "azurerm", "3.45.0", "resource", "subnet")
+    os.makedirs(os.path.dirname(cached))
+    open(cached, "w").close()
+    registry.requests.clear()
+
+    results = import_documentation(source, "hashicorp", "azurerm", "3.45.0")
+    assert results == {"cached": 1, "imported": 4, "failed": 0}
+    assert "/v2/provider-docs/3" not in registry.requests
+    with open(get_documentation_filepath("hashicorp", "azurerm", "3.45.0", "data", "client_config")) as f:
+        assert f.read() == "# azurerm_client_config\n"
+
+
+VIRTUAL_MACHINE_DOC = """# azurerm_linux_virtual_machine
+## Arguments Reference
+`name` - (Required) The name of the Linux Virtual Machine.
+`os_disk` - (Required) A `os_disk` block as defined below.
+`identity` - (Optional) An `identity` block as defined below.
+A `diff_disk_settings` block supports the following:
+`option` - (Required) Specifies the Ephemeral Disk Settings for the OS Disk.
+An `identity` block supports the following:
+`type` - (Required) Specifies the type of Managed Service Identity.
+An `os_disk` block supports the following:
+`caching` - (Required) The Type of Caching which should be used for the Internal OS Disk.
+`diff_disk_settings` - (Optional) A `diff_disk_settings` block as defined above.
+`name` - (Optional) The name which should be used for the Internal OS Disk.
+## Attributes Reference
+`id` - The ID of the Linux Virtual Machine.
+An `identity` block exports the following:
+`principal_id` - The ID of the System Managed Service Identity.
+## Timeouts
+`create` - (Defaults to 45 minutes) Used when creating the Linux Virtual Machine.
+"""
+
+
+def test_documentation_sections():
+    sections = DocumentationSections(VIRTUAL_MACHINE_DOC)
+
+    assert sections.get_description("name", []) == "The name of the Linux Virtual Machine."
+    assert sections.get_description("id", []) == "The ID of the Linux Virtual Machine."
+    assert (
+        sections.get_description("name", ["os_disk"])
+        == "The name which should be used for the Internal OS Disk."
+    )
+    # Nested blocks are resolved through the attribute that references them
+    assert (
+        sections.get_description("option", ["os_disk", "diff_disk_settings"])
+        == "Specifies the Ephemeral Disk Settings for the OS Disk."
+    )
+    # Arguments and exported attributes of a block are merged
+    assert sections.get_description("type", ["identity"]) == (
+        "Specifies the type of Managed Service Identity."
+    )
+    assert sections.get_description("principal_id", ["identity"]) == (
+        "The ID of the System Managed Service Identity."
+    )
+    assert sections.get_description("create", ["timeouts"]) == (
+        "Used when creating the Linux Virtual Machine."
+    )
+    assert sections.get_description("missing", ["os_disk"]) is None
+    assert sections.get_description("name", ["unknown_block"]) is None
+
+
+class CountingSchema:
+    extra_attributes = {}
+
+    def get_resource_schema(self, namespace, provider, kind):
+        return {
+            "block": {
+                "attributes": {
+                    "name": {"type": "string", "required": True},
+                    "id": {"type": "string", "computed": True},
+                    **self.extra_attributes,
+                },
+                "block_types": {
+                    "os_disk": {
+                        "block": {"attributes": {"caching": {"type": "string", "required": True}}}
+                    }
+                },
+            }
+        }
+
+
+def test_attribute_metadata_cache(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    filepath = get_documentation_filepath(
+        "hashicorp", "azurerm", "3.45.0", "resource", "linux_virtual_machine"
+    )
+    os.makedirs(os.path.dirname(filepath))
+    with open(filepath, "w") as f:
+        f.write(VIRTUAL_MACHINE_DOC)
+
+    def load(schema):
+        return TerraformDocumentation(
+            schema, "hashicorp", "azurerm", "3.45.0", "linux_virtual_machine", "resource"
+        )
+
+    computed = []
+    get_attribute_metadata = TerraformDocumentation._get_attribute_metadata
+
+    def count(self, schema, *args, **kwargs):
+        if not args and not kwargs:
+            computed.append(self.kind)
+        return get_attribute_metadata(self, schema, *args, **kwargs)
+
+    monkeypatch.setattr(TerraformDocumentation, "_get_attribute_metadata", count)
+
+    schema = CountingSchema()
+    metadata = load(schema).metadata
+
+    assert metadata["os_disk.caching"]["description"] == (
+        "The Type of Caching which should be used for the Internal OS Disk."
+    )
+    assert metadata["id"]["output"] and not metadata["id"]["input"]
+    assert os.path.exists(
+        get_metadata_filepath("hashicorp", "azurerm", "3.45.0", "resource", "linux_virtual_machine")
+    )
+
+    # Later runs load the metadata without computing it
+    assert load(schema).metadata == metadata
+    assert len(computed) == 1
+
+    # Changed documentation invalidates the metadata
+    with open(filepath, "a") as f:
+        f.write("`name` - (Required) Changed.\n")
+    load(schema)
+    assert len(computed) == 2
+
+    # So does a changed schema with the same documentation
+    schema.extra_attributes = {"zone": {"type": "string", "optional": True}}
+    assert "zone" in load(schema).metadata
+    assert len(computed) == 3
+
+    # Even when only the type of an attribute changes
+    schema.extra_attributes = {"zone": {"type": "number", "optional": True}}
+    metadata = load(schema).metadata
+    assert len(computed) == 4
+    assert metadata["zone"]["metadata"]["type"] == "number"
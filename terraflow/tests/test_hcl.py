@@ -0,0 +1,151 @@
+import os
+
+from terraflow.libraries.hcl import (
+    canonical_hash,
+    find_block,
+    find_variable_references,
+    iter_attributes,
+    remove_blocks,
+    scan_blocks,
+    tokenize,
+)
+from terraflow.libraries.helpers import parse_variables, read_text_file, remove_unused_variables
+
+CODE = '''# Terraform docs: https://example.com
+# A resource group
+resource "azurerm_resource_group" "main" {
+  name     = "rg-${var.app}-${lower("}")}" # A "quoted" { brace
+  location = var.location
+  script   = <<-EOT
+    if [ -n "$X" ]; then {
+  EOT
+  /* } */
+
+  # This block is optional
+  dynamic "setting" {
+    for_each = var.settings
+    content {
+      value = setting.value
+    }
+  }
+  tags = {
+    environment = "test"
+  }
+    }
+
+# A comment separated by a blank line
+
+locals {
+  unused = "${var.commented}" # var.comment_only
+}
+
+variable "app" {
+  type = string
+}
+'''
+
+
+def test_tokenize():
+    tokens = list(tokenize('name = "a ${b["}"]} c" # d\n'))
+
+    assert [(token.type, token.value) for token in tokens] == [
+        ("identifier", "name"),
+        ("punctuation", "="),
+        ("string", '"a ${b["}"]} c"'),
+        ("comment", "# d"),
+        ("newline", "\n"),
+    ]
+
+
+def test_scan_blocks():
+    resource, locals, variable = scan_blocks(CODE)
+
+    assert resource.id == "resource.azurerm_resource_group.main"
+    assert (resource.type, resource.kind, resource.name) == (
+        "resource",
+        "azurerm_resource_group",
+        "main",
+    )
+    assert resource.start == 0
+    assert CODE[resource.header_start:].startswith("resource ")
+    assert resource.code.endswith("tags = {\n    environment = \"test\"\n  }\n    }")
+    assert resource.code == CODE[resource.start:resource.end]
+
+    assert [attribute.name for attribute in resource.attributes] == [
+        "name",
+        "location",
+        "script",
+        "tags",
+    ]
+    assert resource.attributes[0].value == '"rg-${var.app}-${lower("}")}"'
+    assert [block.id for block in resource.blocks] == ["dynamic.setting"]
+    assert [
+        (hierarchy, attribute.name) for hierarchy, attribute in iter_attributes(resource)
+    ] == [
+        ([], "name"),
+        ([], "location"),
+        ([], "script"),
+        ([], "tags"),
+        (["dynamic"], "for_each"),
+        (["dynamic", "content"], "value"),
+    ]
+
+    # Comments separated by a blank line do not belong to the block
+    assert locals.id == "locals" and locals.name is None
+    assert locals.code.startswith("locals {")
+
+    assert find_block([resource, locals, variable], "variable", ["app"]) is variable
+
+
+def test_remove_blocks():
+    blocks = scan_blocks(CODE)
+    code = remove_blocks(CODE, [blocks[0], blocks[2]])
+
+    assert code == (
+        "# A comment separated by a blank line\n"
+        "\n"
+        "locals {\n"
+        '  unused = "${var.commented}" # var.comment_only\n'
+        "}\n"
+        "\n"
+    )
+
+
+def test_find_variable_references():
+    assert find_variable_references(CODE) == {"app", "location", "settings", "commented"}
+
+
+def test_parse_variables():
+    variables = parse_variables(CODE)
+
+    assert [(variable["attribute_id"], variable["value"]) for variable in variables] == [
+        ("location", "location"),
+        ("dynamic.for_each", "settings"),
+    ]
+    assert variables[1]["block_hierarchy"] == ["dynamic"]
+    assert variables[1]["resource_id"] == "resource.azurerm_resource_group.main"
+
+
+def test_remove_unused_variables_per_module(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("modules/app")
+    variables = 'variable "used" {}\n\nvariable "unused" {}\n'
+    for directory in [".", "modules/app"]:
+        with open(os.path.join(directory, "variables.tf"), "w") as f:
+            f.write(variables)
+    with open("main.tf", "w") as f:
+        f.write('locals {\n  value = var.used\n}\n')
+
+    remove_unused_variables(recursive=True)
+
+    assert read_text_file("variables.tf") == 'variable "used" {}\n\n'
+    assert read_text_file(os.path.join("modules", "app", "variables.tf")) == ""
+
+
+def test_canonical_hash_ignores_formatting():
+    code = 'resource "a" "b" {\n  name = var.name # The name\n  location = "x y"\n}\n'
+    formatted = '\nresource "a"   "b" {\n\n  name     = var.name # The name  \n  location = "x y"\n}'
+
+    assert canonical_hash(code) == canonical_hash(formatted)
+    assert canonical_hash(code) != canonical_hash(code.replace('"x y"', '"x  y"'))
+    assert canonical_hash(code) != canonical_hash(code.replace("name = var.name", "name = var.name\n  tags = {}"))
@@ -0,0 +1,88 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from terraflow.libraries import helpers
+from terraflow.libraries.helpers import HttpClient
+
+
+class Handler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.server.requests.append((self.path, self.headers.get("If-None-Match")))
+
+        if self.path == "/flaky" and self.server.failures > 0:
+            self.server.failures -= 1
+            status, body, headers = 503, b"", {}
+        elif self.path == "/limited" and self.server.failures > 0:
+            self.server.failures -= 1
+            status, body, headers = 429, b"", {"Retry-After": "3600"}
+        elif self.headers.get("If-None-Match") == '"v1"':
+            status, body, headers = 304, b"", {"ETag": '"v1"'}
+        else:
+            status, body, headers = 200, b"hello", {"ETag": '"v1"', "Content-Type": "text/plain"}
+
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.requests = []
+    server.failures = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_revalidates_cached_responses(tmp_path, server):
+    client = HttpClient(cache_dir=str(tmp_path), backoff=0)
+    url = f"http://127.0.0.1:{server.server_port}/page"
+
+    assert client.get(url).text == "hello"
+
+    # The second request is conditional and the 304 is served from the cache
+    response = HttpClient(cache_dir=str(tmp_path), backoff=0).get(url)
+    assert response.status_code == 200
+    assert response.text == "hello"
+    assert server.requests == [("/page", None), ("/page", '"v1"')]
+
+
+def test_retries_failed_requests(tmp_path, server):
+    client = HttpClient(cache_dir=str(tmp_path), retries=2, backoff=0)
+    url = f"http://127.0.0.1:{server.server_port}/flaky"
+
+    server.failures = 2
+    assert client.get(url, cache=False).status_code == 200
+
+    server.failures = 3
+    assert client.get(url, cache=False).status_code == 503
+
+
+def test_retry_after_is_capped_and_does_not_block_the_host(tmp_path, server, monkeypatch):
+    client = HttpClient(cache_dir=str(tmp_path), retries=1, max_backoff=2, max_per_host=1)
+    url = f"http://127.0.0.1:{server.server_port}/limited"
+    delays = []
+
+    def sleep(delay):
+        # Other requests to the host can run while this one waits
+        semaphore = client._get_semaphore(url)
+        assert semaphore.acquire(blocking=False)
+        semaphore.release()
+        delays.append(delay)
+
+    monkeypatch.setattr(helpers.time, "sleep", sleep)
+
+    server.failures = 1
+    assert client.get(url, cache=False).status_code == 200
+    assert delays == [2]
@@ -0,0 +1,77 @@
+from terraflow.libraries.lockfile import (
+    ProviderRequirement,
+    get_provider_requirements,
+    parse_required_providers,
+    read_lock_file,
+)
+
+LOCK_FILE_CONTENT = """# This file is maintained automatically by "terraform init".
+# Manual edits may be lost in future updates.
+
+provider "registry.terraform.io/hashicorp/azurerm" {
+  version     = "3.45.0"
+  constraints = "~> 3.0"
+  hashes = [
+    "h1:abc=",
+    "zh:def",
+  ]
+}
+
+provider "registry.terraform.io/integrations/github" {
+  version = "5.1.0"
+  hashes = [
+    "h1:ghi=",
+  ]
+}
+"""
+
+VERSIONS_CONTENT = """terraform {
+  required_providers {
+    azurerm = {
+      source  = "hashicorp/azurerm",
+      version = "~> 3.0"
+    }
+    # A comment with a { brace
+    aws = {
+      source  = "hashicorp/aws"
+      version = "= 5.8.0"
+    }
+    random = "~> 3.1"
+  }
+}
+"""
+
+
+def test_read_lock_file(tmp_path):
+    lock_file = tmp_path / ".terraform.lock.hcl"
+    lock_file.write_text(LOCK_FILE_CONTENT)
+
+    assert read_lock_file(str(lock_file)) == [
+        ProviderRequirement("hashicorp", "azurerm", "3.45.0", "~> 3.0"),
+        ProviderRequirement("integrations", "github", "5.1.0", None),
+    ]
+
+
+def test_parse_required_providers():
+    assert parse_required_providers(VERSIONS_CONTENT) == [
+        ProviderRequirement("hashicorp", "azurerm", None, "~> 3.0"),
+        ProviderRequirement("hashicorp", "aws", None, "= 5.8.0"),
+        ProviderRequirement("hashicorp", "random", None, "~> 3.1"),
+    ]
+
+
+def test_get_provider_requirements(tmp_path):
+    (tmp_path / ".terraform.lock.hcl").write_text(LOCK_FILE_CONTENT)
+    (tmp_path / "versions.tf").write_text(VERSIONS_CONTENT)
+
+    requirements = {
+        (requirement.namespace, requirement.provider): requirement
+        for requirement in get_provider_requirements(str(tmp_path))
+    }
+
+    # Locked versions take precedence over required_providers
+    assert requirements[("hashicorp", "azurerm")].version == "3.45.0"
+    # Exact constraints are used when a provider is not locked
+    assert requirements[("hashicorp", "aws")].version == "5.8.0"
+    assert requirements[("hashicorp", "random")].version is None
+    assert requirements[("integrations", "github")].version == "5.1.0"
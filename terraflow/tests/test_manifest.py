@@ -0,0 +1,146 @@
+import pytest
+
+from terraflow.libraries.configuration import (
+    DataSourceConfiguration,
+    ProviderConfiguration,
+    ResourceConfiguration,
+)
+from terraflow.libraries import manifest
+from terraflow.libraries.manifest import ManifestItem, generate_manifest, load_manifest
+from terraflow.libraries.schema import Schema
+
+MANIFEST = """
+configurations:
+  minimal:
+    required_attributes_only: true
+providers:
+  - provider: azurerm
+resources:
+  - provider: azurerm
+    kind: resource_group
+    configuration: minimal
+  - namespace: integrations
+    provider: github
+    kind: repository
+    name: docs
+    version: 5.0.0
+    filename: github.tf
+    configuration:
+      exclude_attributes: [topics]
+data_sources:
+  - provider: azurerm
+    kind: client_config
+"""
+
+
+def test_load_manifest(tmp_path):
+    filename = tmp_path / "manifest.yaml"
+    filename.write_text(MANIFEST)
+
+    provider, resource_group, repository, client_config = load_manifest(str(filename))
+
+    assert provider.id == "provider.azurerm"
+    assert provider.filename == "providers.tf"
+    assert provider.configuration == ProviderConfiguration()
+
+    assert resource_group.id == "resource.azurerm_resource_group.main"
+    assert resource_group.namespace == "hashicorp"
+    assert resource_group.filename == "main.tf"
+    assert resource_group.configuration == ResourceConfiguration(required_attributes_only=True)
+
+    assert repository.id == "resource.github_repository.docs"
+    assert repository.namespace == "integrations"
+    assert repository.version == "5.0.0"
+    assert repository.filename == "github.tf"
+    assert repository.configuration.exclude_attributes == ["topics"]
+
+    assert client_config.id == "data.azurerm_client_config.main"
+    assert client_config.filename == "data.tf"
+    assert client_config.configuration == DataSourceConfiguration()
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "resources:\n  - provider: azurerm\n",
+        "resources:\n  - kind: resource_group\n",
+        "resources:\n  - {provider: azurerm, kind: resource_group, configuration: missing}\n",
+        "resources:\n  - {provider: azurerm, kind: resource_group, configuration: {colour: red}}\n",
+        "- not a mapping\n",
+    ],
+)
+def test_load_manifest_invalid(tmp_path, text):
+    filename = tmp_path / "manifest.yaml"
+    filename.write_text(text)
+
+    with pytest.raises(ValueError):
+        load_manifest(str(filename))
+
+
+def test_generate_manifest_reports_duplicate_ids(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    class Component:
+        def __init__(self, schema, item):
+            self.code = f'resource "azurerm_{item.kind}" "{item.name}" {{}}\n'
+
+    monkeypatch.setattr(manifest, "build_component", Component)
+    schema = Schema.from_mapping(
+        {"provider_schemas": {"registry.terraform.io/hashicorp/azurerm": {}}}
+    )
+    items = [
+        ManifestItem("resource", "hashicorp", "azurerm", kind=kind, name="main", filename=filename)
+        for kind, filename in [
+            ("resource_group", "main.tf"),
+            ("resource_group", "main.tf"),
+            ("resource_group", "other.tf"),
+        ]
+    ]
+
+    results = generate_manifest(items, schema=schema, max_workers=2)
+
+    assert results["files"] == {
+        "main.tf": ["resource.azurerm_resource_group.main"],
+        "other.tf": ["resource.azurerm_resource_group.main"],
+    }
+    assert [(id, type(error)) for id, error in results["failed"]] == [
+        ("resource.azurerm_resource_group.main", ValueError)
+    ]
+
+
+def test_generate_manifest_reports_version_mismatch(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / ".terraform.lock.hcl").write_text(
+        'provider "registry.terraform.io/hashicorp/azurerm" {\n  version = "3.45.0"\n}\n'
+    )
+
+    class Component:
+        def __init__(self, schema, item):
+            self.code = f'resource "azurerm_{item.kind}" "{item.name}" {{}}\n'
+
+    monkeypatch.setattr(manifest, "build_component", Component)
+    schema = Schema.from_mapping(
+        {"provider_schemas": {"registry.terraform.io/hashicorp/azurerm": {}}}
+    )
+    items = [
+        ManifestItem(
+            "resource", "hashicorp", "azurerm", kind=kind, name="main", version=version, filename="main.tf"
+        )
+        for kind, version in [
+            ("resource_group", "3.45.0"),
+            ("virtual_network", "3.50.0"),
+            ("subnet", None),
+        ]
+    ]
+
+    results = generate_manifest(items, schema=schema, max_workers=2)
+
+    assert results["files"] == {
+        "main.tf": ["resource.azurerm_resource_group.main", "resource.azurerm_subnet.main"]
+    }
+    assert [(id, str(error)) for id, error in results["failed"]] == [
+        (
+            "resource.azurerm_virtual_network.main",
+            "hashicorp/azurerm 3.50.0 was requested, but the schema is for version 3.45.0.",
+        )
+    ]
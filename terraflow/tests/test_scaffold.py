@@ -0,0 +1,74 @@
+import pytest
+
+from terraflow.libraries.constants import TERRAFORM_REGISTRY_BASE
+from terraflow.libraries.scaffold import scaffold_provider
+from terraflow.libraries.schema import Schema
+
+BLOCK = {
+    "block": {
+        "attributes": {
+            "name": {"type": "string", "required": True},
+            "id": {"type": "string", "computed": True},
+        },
+        "block_types": {
+            "timeouts": {
+                "nesting_mode": "single",
+                "block": {"attributes": {"create": {"type": "string", "optional": True}}},
+            }
+        },
+    }
+}
+
+
+def get_schema():
+    return Schema.from_mapping(
+        {
+            "provider_schemas": {
+                f"{TERRAFORM_REGISTRY_BASE}/hashicorp/azurerm": {
+                    "provider": {"block": {"attributes": {"features": {"type": "string", "required": True}}}},
+                    "resource_schemas": {
+                        "azurerm_resource_group": BLOCK,
+                        "azurerm_broken": {"block": {"attributes": {"name": {"type": 5, "required": True}}}},
+                        "azurerm_key_vault": BLOCK,
+                    },
+                    "data_source_schemas": {"azurerm_client_config": BLOCK},
+                }
+            }
+        }
+    )
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_scaffold_provider(tmp_path, monkeypatch, max_workers):
+    monkeypatch.chdir(tmp_path)
+    called = []
+
+    results = scaffold_provider(
+        schema=get_schema(),
+        namespace="hashicorp",
+        provider="azurerm",
+        version="3.45.0",
+        directory=str(tmp_path / "scaffold"),
+        max_workers=max_workers,
+        callback=lambda type, name, error: called.append(name),
+    )
+
+    assert results["generated"] == 4
+    assert [(type, name) for type, name, error in results["failed"]] == [
+        ("resource", "azurerm_broken")
+    ]
+    assert called == [
+        None,
+        "azurerm_broken",
+        "azurerm_key_vault",
+        "azurerm_resource_group",
+        "azurerm_client_config",
+    ]
+
+    main = (tmp_path / "scaffold" / "main.tf").read_text()
+    assert main.index('resource "azurerm_key_vault" "main" {') < main.index(
+        'resource "azurerm_resource_group" "main" {'
+    )
+    assert "  name = var.name\n" in main
+    assert 'data "azurerm_client_config" "main" {' in (tmp_path / "scaffold" / "data.tf").read_text()
+    assert 'provider "azurerm" {' in (tmp_path / "scaffold" / "providers.tf").read_text()
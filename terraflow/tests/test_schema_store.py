@@ -0,0 +1,368 @@
+import io
+import json
+import os
+
+import pytest
+
+from terraflow.libraries.schema_store import (
+    IndexedSchemaStore,
+    ShardedSchemaStore,
+    build_schema,
+    iter_schema_items,
+    iter_schema_stream,
+    slim_schema,
+)
+
+ADDRESS = "registry.terraform.io/hashicorp/azurerm"
+
+SCHEMA = {
+    "format_version": "1.0",
+    "provider_schemas": {
+        ADDRESS: {
+            "provider": {
+                "version": 0,
+                "block": {
+                    "attributes": {
+                        "features": {"type": "string", "optional": True},
+                    },
+                },
+            },
+            "resource_schemas": {
+                "azurerm_resource_group": {
+                    "version": 0,
+                    "block": {
+                        "attributes": {
+                            "name": {
+                                "type": "string",
+                                "required": True,
+                                "description": "The name.",
+                                "description_kind": "plain",
+                            },
+                        },
+                        "block_types": {
+                            "timeouts": {
+                                "nesting_mode": "single",
+                                "block": {
+                                    "attributes": {
+                                        "create": {"type": "string", "optional": True},
+                                    },
+                                    "description_kind": "plain",
+                                },
+                            },
+                        },
+                        "description_kind": "plain",
+                    },
+                },
+            },
+            "data_source_schemas": {
+                "azurerm_client_config": {
+                    "version": 0,
+                    "block": {
+                        "attributes": {
+                            "tenant_id": {"type": "string", "computed": True},
+                        },
+                    },
+                },
+            },
+        },
+    },
+}
+
+
+def test_slim_schema():
+    resource_schema = SCHEMA["provider_schemas"][ADDRESS]["resource_schemas"][
+        "azurerm_resource_group"
+    ]
+
+    assert slim_schema(resource_schema) == {
+        "block": {
+            "attributes": {"name": {"type": "string", "required": True}},
+            "block_types": {
+                "timeouts": {
+                    "nesting_mode": "single",
+                    "block": {
+                        "attributes": {"create": {"type": "string", "optional": True}}
+                    },
+                },
+            },
+        },
+    }
+
+
+def test_sharded_schema_store(tmp_path):
+    store = ShardedSchemaStore(directory=str(tmp_path / "schema"), global_directory=None)
+    store.write(SCHEMA, key="abc")
+
+    provider_dir = tmp_path / "schema" / "hashicorp" / "azurerm"
+    assert (provider_dir / "provider.json").exists()
+    assert store.manifest == {
+        "key": "abc",
+        "provider_schemas": {
+            ADDRESS: {
+                "path": str(provider_dir),
+                "resource_schemas": ["azurerm_resource_group"],
+                "data_source_schemas": ["azurerm_client_config"],
+            }
+        }
+    }
+
+    schema = ShardedSchemaStore(directory=str(tmp_path / "schema")).as_mapping()
+    provider_schema = schema["provider_schemas"][ADDRESS]
+
+    assert list(provider_schema["resource_schemas"]) == ["azurerm_resource_group"]
+    assert provider_schema["data_source_schemas"]["azurerm_client_config"] == {
+        "block": {"attributes": {"tenant_id": {"type": "string", "computed": True}}}
+    }
+    assert "azurerm_missing" not in provider_schema["resource_schemas"]
+
+
+def test_sharded_schema_store_global_cache(tmp_path):
+    global_directory = str(tmp_path / "global")
+    versions = {ADDRESS: "3.45.0"}
+
+    first = ShardedSchemaStore(directory=str(tmp_path / "a"), global_directory=global_directory)
+    second = ShardedSchemaStore(directory=str(tmp_path / "b"), global_directory=global_directory)
+
+    # Nothing has been cached for this version yet
+    assert not second.link(versions, key="b")
+
+    first.write_items(iter_schema_items(SCHEMA), key="a", versions=versions)
+    provider_dir = tmp_path / "global" / "hashicorp" / "azurerm" / "3.45.0"
+    assert (provider_dir / "resource_schemas" / "azurerm_resource_group.json").exists()
+    assert not (tmp_path / "a" / "hashicorp").exists()
+
+    # Another project pinned to the same version reuses the entry
+    assert second.link(versions, key="b")
+    assert second.key == "b"
+    assert second.manifest["provider_schemas"][ADDRESS]["path"] == str(provider_dir)
+    assert list(second.as_mapping()["provider_schemas"][ADDRESS]["resource_schemas"]) == [
+        "azurerm_resource_group"
+    ]
+
+    # Unversioned providers cannot be shared
+    assert not second.link({ADDRESS: None})
+
+    # Merging keeps the key of the existing manifest
+    first.write_items(iter_schema_items(SCHEMA), versions={ADDRESS: "3.44.0"})
+    assert not second.link({"registry.terraform.io/hashicorp/random": "3.5.1"}, merge=True)
+    assert second.link({ADDRESS: "3.44.0"}, merge=True)
+    assert second.key == "b"
+    assert second.manifest["provider_schemas"][ADDRESS]["path"].endswith("3.44.0")
+
+
+def test_indexed_schema_store(tmp_path):
+    filename = str(tmp_path / "schema.json")
+    IndexedSchemaStore(filename=filename).write(SCHEMA, key="abc")
+    assert sorted(os.listdir(tmp_path)) == ["schema.index.json", "schema.json"]
+
+    # The schema file stays a complete, valid JSON document
+    with open(filename, "r") as f:
+        assert json.load(f) == SCHEMA
+
+    store = IndexedSchemaStore(filename=filename)
+    assert store.exists()
+    assert store.key == "abc"
+
+    schema = store.as_mapping()
+    provider_schema = schema["provider_schemas"][ADDRESS]
+
+    assert provider_schema["provider"] == SCHEMA["provider_schemas"][ADDRESS]["provider"]
+    assert (
+        provider_schema["resource_schemas"]["azurerm_resource_group"]
+        == SCHEMA["provider_schemas"][ADDRESS]["resource_schemas"]["azurerm_resource_group"]
+    )
+    assert list(provider_schema["data_source_schemas"]) == ["azurerm_client_config"]
+    store.close()
+
+
+def test_indexed_schema_store_is_closed(tmp_path):
+    filename = str(tmp_path / "schema.json")
+
+    with IndexedSchemaStore(filename=filename) as store:
+        store.write(SCHEMA, key="abc")
+        assert store.read_provider(ADDRESS) == SCHEMA["provider_schemas"][ADDRESS]["provider"]
+        mapping = store._mmap
+
+        # Rewriting the cache unmaps the old schema file before replacing it
+        store.write(SCHEMA, key="def")
+        assert mapping.closed
+        assert store.key == "def"
+        assert store.read_provider(ADDRESS) == SCHEMA["provider_schemas"][ADDRESS]["provider"]
+
+    assert store._mmap is None
+
+
+@pytest.mark.parametrize("chunk_size", [16, 1 << 20])
+def test_iter_schema_stream(chunk_size):
+    document = json.loads(json.dumps(SCHEMA))
+    provider_schema = document["provider_schemas"][ADDRESS]
+    # Braces and quotes inside strings must not affect the nesting
+    provider_schema["resource_schemas"]["azurerm_resource_group"]["block"][
+        "description"
+    ] = 'A "quoted" {brace} [bracket], \\ backslash'
+    # Unknown sections are skipped
+    provider_schema["functions"] = {"parse": {"parameters": [{"name": "}"}]}}
+
+    stream = io.StringIO(json.dumps(document, indent=2))
+    items = list(iter_schema_stream(stream, chunk_size=chunk_size))
+
+    assert build_schema(items) == build_schema(iter_schema_items(document))
+
+
+def test_iter_schema_stream_truncated():
+    text = json.dumps(SCHEMA)
+
+    with pytest.raises(ValueError):
+        list(iter_schema_stream(io.StringIO(text[: len(text) // 2])))
+
+
+@pytest.mark.parametrize("cache", [True, False])
+def test_schema_fetch_failure_runs_terraform_once(tmp_path, monkeypatch, cache):
+    from terraflow.libraries.schema import Schema
+
+    calls = tmp_path / "calls"
+    terraform = tmp_path / "bin" / "terraform"
+    terraform.parent.mkdir()
+    terraform.write_text(
+        "#!/bin/sh\n"
+        f'echo "$@" >> "{calls}"\n'
+        '[ "$1" = "version" ] && { echo \'{"terraform_version": "1.5.0"}\'; exit 0; }\n'
+        "exit 1\n"
+    )
+    terraform.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{terraform.parent}:{os.environ['PATH']}")
+    monkeypatch.chdir(tmp_path)
+
+    with pytest.raises(SystemExit):
+        Schema(cache=cache)
+
+    assert [line for line in calls.read_text().splitlines() if line != "version"] == [
+        "providers schema -json",
+        "init",
+        "providers schema -json",
+        "init -upgrade",
+        "providers schema -json",
+    ]
+
+
+def test_schema_cache_is_reused_until_the_lock_file_changes(tmp_path, monkeypatch):
+    from terraflow.libraries import schema
+    from terraflow.libraries.schema import Schema
+
+    calls = tmp_path / "calls"
+    schema_file = tmp_path / "schema.json"
+    schema_file.write_text(json.dumps(SCHEMA))
+    terraform = tmp_path / "bin" / "terraform"
+    terraform.parent.mkdir()
+    terraform.write_text(
+        "#!/bin/sh\n"
+        f'echo "$@" >> "{calls}"\n'
+        '[ "$1" = "version" ] && { echo "Terraform v1.5.0"; exit 0; }\n'
+        f'[ "$1" = "providers" ] && cat "{schema_file}"\n'
+        "exit 0\n"
+    )
+    terraform.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{terraform.parent}:{os.environ['PATH']}")
+    monkeypatch.setattr(schema, "GLOBAL_SCHEMA_DIR", str(tmp_path / "global"))
+    monkeypatch.chdir(tmp_path)
+
+    lock_file = tmp_path / ".terraform.lock.hcl"
+    lock_file.write_text(
+        f'provider "{ADDRESS}" {{\n  version     = "3.45.0"\n  constraints = "~> 3.0"\n}}\n'
+    )
+
+    def terraform_calls():
+        lines = calls.read_text().splitlines() if calls.exists() else []
+        calls.write_text("")
+        return [line for line in lines if line != "version"]
+
+    Schema()
+    assert terraform_calls() == ["providers schema -json"]
+    assert (tmp_path / "global" / "hashicorp" / "azurerm" / "3.45.0").is_dir()
+
+    # The same lock file and terraform version read the cache without running terraform
+    assert "azurerm_resource_group" in Schema().json["provider_schemas"][ADDRESS]["resource_schemas"]
+    assert terraform_calls() == []
+
+    lock_file.write_text(lock_file.read_text().replace("3.45.0", "3.46.0"))
+    Schema()
+    assert terraform_calls() == ["providers schema -json"]
+
+
+def test_add_providers_fetches_missing_versions_in_temporary_workspaces(tmp_path, monkeypatch):
+    from terraflow.libraries import schema
+    from terraflow.libraries.schema import Schema
+
+    calls = tmp_path / "calls"
+    main_files = tmp_path / "main_files"
+    (tmp_path / "azurerm.json").write_text(json.dumps(SCHEMA))
+    (tmp_path / "random.json").write_text(
+        json.dumps(SCHEMA).replace("hashicorp/azurerm", "hashicorp/random").replace("azurerm_", "random_")
+    )
+    terraform = tmp_path / "bin" / "terraform"
+    terraform.parent.mkdir()
+    terraform.write_text(
+        "#!/bin/sh\n"
+        f'echo "$(pwd -P)|$@" >> "{calls}"\n'
+        'case "$1" in\n'
+        '  version) echo "Terraform v1.5.0" ;;\n'
+        f'  init) [ -f main.tf ] && cat main.tf >> "{main_files}"; grep -qs broken main.tf && exit 1 ;;\n'
+        f'  providers) if grep -qs hashicorp/random main.tf; then cat "{tmp_path}/random.json"; '
+        f'else cat "{tmp_path}/azurerm.json"; fi ;;\n'
+        "esac\n"
+        "exit 0\n"
+    )
+    terraform.chmod(0o755)
+    global_dir = tmp_path / "global"
+    monkeypatch.setenv("PATH", f"{terraform.parent}:{os.environ['PATH']}")
+    monkeypatch.setenv("TF_PLUGIN_CACHE_DIR", str(tmp_path / "plugins"))
+    monkeypatch.setattr(schema, "GLOBAL_SCHEMA_DIR", str(global_dir))
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / ".terraform.lock.hcl").write_text(
+        f'provider "{ADDRESS}" {{\n  version     = "3.45.0"\n  constraints = "~> 3.0"\n}}\n'
+    )
+
+    configuration = Schema()
+    configuration.add_providers([("hashicorp", "random", "3.0.0"), ("hashicorp", "broken", "1.0.0")])
+
+    # Both providers were fetched outside of the configuration
+    workspace_calls = [
+        line.split("|") for line in calls.read_text().splitlines()
+        if not line.startswith(f"{os.path.realpath(tmp_path)}|")
+    ]
+    assert sorted(command for _, command in workspace_calls) == [
+        "init -input=false -backend=false",
+        "init -input=false -backend=false",
+        "providers schema -json",
+    ]
+    assert all(os.path.basename(cwd).startswith("terraflow-") for cwd, _ in workspace_calls)
+
+    main_tf = main_files.read_text()
+    assert (
+        "terraform {\n"
+        "  required_providers {\n"
+        "    random = {\n"
+        '      source  = "hashicorp/random"\n'
+        '      version = "3.0.0"\n'
+        "    }\n"
+        "  }\n"
+        "}\n"
+    ) in main_tf
+    assert 'source  = "hashicorp/broken"' in main_tf
+
+    # The fetched version is stored in the user-level cache
+    provider_dir = global_dir / "hashicorp" / "random" / "3.0.0"
+    assert (provider_dir / "provider.json").is_file()
+    assert (provider_dir / "resource_schemas" / "random_resource_group.json").is_file()
+    assert json.loads((provider_dir / "manifest.json").read_text())["resource_schemas"] == [
+        "random_resource_group"
+    ]
+
+    # The provider that could not be fetched is left out entirely
+    assert not (global_dir / "hashicorp" / "broken").exists()
+    assert sorted(configuration.store.manifest["provider_schemas"]) == [
+        ADDRESS,
+        "registry.terraform.io/hashicorp/random",
+    ]
+    assert "registry.terraform.io/hashicorp/broken" not in configuration.json["provider_schemas"]
+    assert configuration.get_resource_schema("hashicorp", "random", "resource_group")
@@ -0,0 +1,116 @@
+import os
+
+import pytest
+
+from terraflow.libraries import toolchain
+from terraflow.libraries.helpers import read_json_file
+from terraflow.libraries.toolchain import ToolchainInfo
+
+LOCK_FILE_CONTENT = """provider "registry.terraform.io/hashicorp/azurerm" {
+  version     = "3.45.0"
+  constraints = "~> 3.0"
+}
+"""
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    """
+    A configuration with a lock file and a fake terraform binary that logs its calls.
+    """
+    terraform = tmp_path / "bin" / "terraform"
+    terraform.parent.mkdir()
+    terraform.write_text(
+        "#!/bin/sh\n"
+        f'echo "$@" >> "{tmp_path / "calls"}"\n'
+        'echo "Terraform v1.5.0"\n'
+    )
+    terraform.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{terraform.parent}:{os.environ['PATH']}")
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / ".terraform.lock.hcl").write_text(LOCK_FILE_CONTENT)
+
+    return tmp_path
+
+
+def calls(workspace):
+    path = workspace / "calls"
+    return path.read_text().splitlines() if path.exists() else []
+
+
+def test_toolchain_info_is_persisted(workspace):
+    assert ToolchainInfo().terraform_version == "1.5.0"
+    assert ToolchainInfo().get_provider_version("azurerm") == "3.45.0"
+
+    info = ToolchainInfo()
+    assert info.terraform_version == "1.5.0"
+    assert info.get_provider_version("azurerm") == "3.45.0"
+    assert calls(workspace) == ["version"]
+
+
+def test_toolchain_info_invalidated_by_lock_file(workspace):
+    ToolchainInfo().get_provider_version("azurerm")
+    (workspace / ".terraform.lock.hcl").write_text(LOCK_FILE_CONTENT.replace("3.45.0", "3.50.0"))
+
+    info = ToolchainInfo()
+    assert info.get_provider_version("azurerm") == "3.50.0"
+    info.terraform_version
+    assert calls(workspace) == ["version"]
+
+
+def test_toolchain_info_invalidated_by_terraform_binary(workspace):
+    assert ToolchainInfo().terraform_version == "1.5.0"
+
+    terraform = workspace / "bin" / "terraform"
+    terraform.write_text(terraform.read_text().replace("v1.5.0", "v1.6.2"))
+    os.utime(terraform, ns=(1_000_000_000, 1_000_000_000))
+
+    assert ToolchainInfo().terraform_version == "1.6.2"
+    assert calls(workspace) == ["version", "version"]
+
+
+def test_toolchain_info_does_not_persist_latest_versions(workspace, monkeypatch):
+    lookups = []
+    monkeypatch.setattr(
+        toolchain,
+        "get_provider_version",
+        lambda provider, namespace: lookups.append(provider) or "5.0.0",
+    )
+
+    info = ToolchainInfo()
+    assert info.get_provider_version("azurerm") == "3.45.0"
+    assert info.get_provider_version("github", namespace="integrations") == "5.0.0"
+    assert info.get_provider_version("github", namespace="integrations") == "5.0.0"
+    assert info.get_locked_provider_version("github", namespace="integrations") is None
+    assert lookups == ["github"]
+    assert read_json_file(os.path.join(".terraflow", "toolchain.json"))["providers"] == {
+        "hashicorp/azurerm": "3.45.0"
+    }
+
+    assert ToolchainInfo().get_provider_version("github", namespace="integrations") == "5.0.0"
+    assert lookups == ["github", "github"]
+
+
+def test_toolchain_info_does_not_persist_pinned_versions(workspace):
+    main_tf = workspace / "main.tf"
+    main_tf.write_text(
+        "terraform {\n"
+        "  required_providers {\n"
+        "    random = {\n"
+        '      source  = "hashicorp/random"\n'
+        '      version = "3.5.0"\n'
+        "    }\n"
+        "  }\n"
+        "}\n"
+    )
+
+    info = ToolchainInfo()
+    assert info.get_locked_provider_version("random") == "3.5.0"
+    assert info.get_locked_provider_version("azurerm") == "3.45.0"
+    assert read_json_file(os.path.join(".terraflow", "toolchain.json"))["providers"] == {
+        "hashicorp/azurerm": "3.45.0"
+    }
+
+    # The lock file is unchanged, so only the configuration decides the new pin
+    main_tf.write_text(main_tf.read_text().replace("3.5.0", "3.6.0"))
+    assert ToolchainInfo().get_locked_provider_version("random") == "3.6.0"
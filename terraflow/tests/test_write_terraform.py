@@ -0,0 +1,108 @@
+import os
+
+import pytest
+
+from terraflow.libraries.helpers import atomic_write, read_text_file, write_terraform_to_file
+
+EXISTING = '''terraform {
+  required_version = ">= 1.0"
+}
+
+# Shared settings
+locals {
+  prefix = "app"
+}
+
+resource "azurerm_resource_group" "main" {
+  name = "old"
+}
+
+# A note between blocks
+
+resource "azurerm_resource_group" "other" {
+  name = "other"
+}
+'''
+
+
+def test_write_terraform_splices_existing_blocks(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with open("main.tf", "w") as f:
+        f.write(EXISTING)
+    os.chmod("main.tf", 0o640)
+
+    write_terraform_to_file(
+        "main.tf",
+        'resource "azurerm_resource_group" "main" {\n  name = "new"\n}\n\n'
+        'data "azurerm_client_config" "current" {}\n',
+    )
+
+    assert read_text_file("main.tf") == (
+        EXISTING.replace('name = "old"', 'name = "new"')
+        + '\ndata "azurerm_client_config" "current" {}\n'
+    )
+    assert os.stat("main.tf").st_mode & 0o777 == 0o640
+    assert os.listdir(".") == ["main.tf"]
+
+
+def test_write_terraform_creates_file(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    code = 'variable "name" {\n  type = string\n}'
+
+    write_terraform_to_file("variables.tf", code)
+    write_terraform_to_file("variables.tf", code.replace("string", "number"))
+
+    assert read_text_file("variables.tf") == code.replace("string", "number") + "\n"
+
+
+def test_write_terraform_skips_unchanged_code(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with open("main.tf", "w") as f:
+        f.write(EXISTING.replace('name = "old"', 'name     = "old"'))
+    os.utime("main.tf", ns=(1_000_000_000, 1_000_000_000))
+
+    changed = write_terraform_to_file(
+        "main.tf", 'resource "azurerm_resource_group" "main" {\n  name = "old"\n}\n'
+    )
+
+    assert not changed
+    assert os.stat("main.tf").st_mtime_ns == 1_000_000_000
+    assert write_terraform_to_file(
+        "main.tf", 'resource "azurerm_resource_group" "main" {\n  name = "new"\n}\n'
+    )
+
+
+def test_write_terraform_does_not_duplicate_unlabeled_blocks(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with open("main.tf", "w") as f:
+        f.write(EXISTING)
+
+    # Identical locals and a terraform block with new settings
+    assert write_terraform_to_file(
+        "main.tf",
+        '# Shared settings\nlocals {\n  prefix   = "app"\n}\n\nterraform {\n  required_version = ">= 1.5"\n}\n',
+    )
+    assert read_text_file("main.tf") == EXISTING.replace(">= 1.0", ">= 1.5")
+
+    assert not write_terraform_to_file("main.tf", 'locals {\n  prefix = "app"\n}\n')
+    assert write_terraform_to_file("main.tf", 'locals {\n  suffix = "dev"\n}\n')
+    assert read_text_file("main.tf").count("locals {") == 2
+
+
+def test_atomic_write_keeps_the_file_on_error(tmp_path):
+    filename = tmp_path / "main.tf"
+    filename.write_text("old")
+
+    with pytest.raises(RuntimeError):
+        with atomic_write(str(filename)) as f:
+            f.write("new")
+            raise RuntimeError()
+
+    assert filename.read_text() == "old"
+    assert os.listdir(tmp_path) == ["main.tf"]
+
+    with atomic_write(str(filename), "wb") as f:
+        f.write(b"new")
+
+    assert filename.read_text() == "new"
+    assert os.listdir(tmp_path) == ["main.tf"]